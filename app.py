@@ -1,9 +1,13 @@
+import time
+_APP_IMPORT_START = time.perf_counter()
+
 import streamlit as st
 import asyncio
 import sys
 import os
 import contextlib
 import io
+import logging
 from dotenv import load_dotenv
 
 # --- Configuration & Setup ---
@@ -18,9 +22,29 @@ sys.path.append(ROOT_DIR)
 load_dotenv(os.path.join(BACKEND_DIR, '.env'))
 
 # Import Backend Modules
-from backend.agent import verify_claim
-from backend.ingest import ingest_data
+# Only light modules here; the agent, embedding model and ingestion code are loaded on demand
+# (see _load_backend) so Streamlit reruns stay fast.
 from backend.models import VerificationResult
+from startup import timed, startup_report, STARTUP_TIMINGS
+import telemetry
+
+# Backend progress goes through logging (one configuration per process; reruns are no-ops)
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s: %(message)s")
+
+STARTUP_TIMINGS.setdefault("app imports", time.perf_counter() - _APP_IMPORT_START)
+
+@st.cache_resource(show_spinner=False)
+def _load_backend():
+    """Imports the agent once per server process and starts warming up the local store."""
+    with timed("import agent"):
+        from backend.agent import verify_claim_stream
+    # Same module instance the agent uses (backend/ is on sys.path)
+    import retriever
+    retriever.warm_up(background=True)
+    # Prometheus scrape endpoint for this Streamlit process
+    if os.getenv("METRICS_PORT"):
+        telemetry.start_metrics_server()
+    return verify_claim_stream
 
 # Page Layout Configuration
 st.set_page_config(
@@ -129,16 +153,38 @@ def render_sidebar():
         if st.button("🔄 Run Full Ingestion", use_container_width=True, help="Re-ingest ~20k records into ChromaDB"):
             _handle_ingestion()
 
+        with st.expander("⏱️ Startup Timing"):
+            st.caption("Seconds spent importing / initializing each component (first use).")
+            st.json(startup_report())
+
+        with st.expander("📈 Pipeline Metrics"):
+            st.caption("Stage latencies and counters since the server started (also served at /metrics when METRICS_PORT is set).")
+            st.json(telemetry.snapshot())
+
+@contextlib.contextmanager
+def _capture_logs(buffer: io.StringIO):
+    """Copies backend log records into buffer while the block runs."""
+    handler = logging.StreamHandler(buffer)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    try:
+        yield
+    finally:
+        root.removeHandler(handler)
+
 def _handle_ingestion():
     """Handles the ingestion process and UI feedback."""
     status = st.empty()
     status.info("⏳ Ingesting data... Please wait.")
     
     try:
-        # Capture stdout to display logs in UI
+        # Capture backend logs to display them in the UI
         logs_buffer = io.StringIO()
-        with contextlib.redirect_stdout(logs_buffer):
+        with _capture_logs(logs_buffer):
             with st.spinner("Processing records..."):
+                with timed("import ingest"):
+                    from backend.ingest import ingest_data
                 ingest_data()
         
         status.success("✅ Ingestion Complete!")
@@ -164,13 +210,37 @@ def render_main_interface():
 
 def _handle_verification(claim: str):
     """Orchestrates the verification process and result rendering."""
-    with st.spinner("Analyzing... (Checking Local DB → Web)"):
-        try:
-            # Run async agent
-            result = asyncio.run(verify_claim(claim))
-            _display_result(result)
-        except Exception as e:
-            st.error(f"An error occurred during verification: {e}")
+    try:
+        # Run async agent
+        verify_claim_stream = _load_backend()
+        asyncio.run(_stream_verification(verify_claim_stream, claim))
+    except Exception as e:
+        st.error(f"An error occurred during verification: {e}")
+
+async def _stream_verification(verify_claim_stream, claim: str):
+    """Renders stage events as they arrive: progress, the local verdict, then the web verdict token by token."""
+    status = st.empty()
+    preliminary = st.empty()
+    stream_box = st.empty()
+    status.info("💾 Checking Local DB...")
+    streamed = ""
+
+    async for event in verify_claim_stream(claim, with_timings=True):
+        if event.stage == "local_evidence":
+            status.info(f"💾 Found {len(event.evidence)} local evidence item(s). Adjudicating...")
+        elif event.stage == "local_verdict" and event.result.verdict == "NotEnoughInfo":
+            preliminary.caption(f"Local verdict: **{event.result.verdict}** — {event.result.reasoning}")
+            status.info("🌐 Local evidence inconclusive. Searching the web...")
+        elif event.stage == "web_evidence":
+            status.info(f"🌐 Found {len(event.evidence)} web result(s). Writing final verdict...")
+        elif event.stage == "token":
+            streamed += event.text
+            stream_box.markdown(streamed + "▌")
+        elif event.stage == "final":
+            status.empty()
+            preliminary.empty()
+            stream_box.empty()
+            _display_result(event.result)
 
 def _display_result(result: VerificationResult):
     """Visualizes the verification result."""
@@ -196,6 +266,9 @@ def _display_result(result: VerificationResult):
     has_web = any("web" in e.source.lower() for e in result.evidence)
     source_type = "🌐 Live Web Search" if has_web else "💾 Local Database"
     st.caption(f"Source Strategy: **{source_type}**")
+    if result.evidence_budget:
+        budget = result.evidence_budget
+        st.caption(f"Evidence packed to ~{budget['tokens_after']} tokens ({budget['tokens_saved']} saved, {budget['items_before'] - budget['items_after']} items removed)")
         
     with st.expander("View Source Details"):
         for e in result.evidence:
@@ -208,9 +281,14 @@ def _display_result(result: VerificationResult):
             if hasattr(e, 'url') and e.url:
                 st.markdown(f"[🔗 Open Link]({e.url})")
 
+    if result.timings:
+        with st.expander("⏱️ Timing Breakdown (ms)"):
+            st.json(result.timings)
+
 # --- Main Application Flow ---
 
 if __name__ == "__main__":
     apply_custom_styles()
+    _load_backend()
     render_sidebar()
     render_main_interface()
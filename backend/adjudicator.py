@@ -0,0 +1,402 @@
+import os
+import re
+import time
+import asyncio
+import logging
+from typing import AsyncIterator, Optional, Union
+from langchain_core.prompts import ChatPromptTemplate
+from models import VerificationResult, Evidence
+from startup import timed
+import evidence_budget
+import deadlines
+from telemetry import span, inc, observe, record_stage, SIZE_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+ADJUDICATOR_MODEL = os.getenv("ADJUDICATOR_MODEL", "gemini-2.5-flash-lite")
+# Max claims packed into one LLM request by adjudicate_many
+ADJUDICATION_BATCH_SIZE = int(os.getenv("ADJUDICATION_BATCH_SIZE", "8"))
+
+# Prompt emphasizing the source we are looking at
+SINGLE_PROMPT = """
+    You are an expert fact-checker. Verify the claim based ONLY on the provided evidence.
+
+    Claim: {claim}
+
+    Evidence Source: {source_type}
+    Evidence:
+    {context}
+
+    Instructions:
+    1. Assess if the evidence **conclusively** supports or refutes the claim.
+    2. If the evidence is irrelevant, vague, or missing, return 'NotEnoughInfo'.
+    3. Be strict. Do not hallucinate.
+
+    Output format:
+    Verdict: [Supported/Refuted/NotEnoughInfo]
+    Reasoning: [Concise explanation]
+    """
+
+# Several claims in one request; each claim is judged only against its own evidence
+BATCH_PROMPT = """
+    You are an expert fact-checker. Below are {count} numbered claims, each followed by its own evidence.
+    Verify EACH claim based ONLY on the evidence listed under that claim. Never use evidence from another claim.
+
+    {items}
+
+    Instructions:
+    1. Assess if the evidence **conclusively** supports or refutes the claim.
+    2. If the evidence is irrelevant, vague, or missing, return 'NotEnoughInfo'.
+    3. Be strict. Do not hallucinate.
+
+    Output format (one block per claim, in the same order, nothing else):
+    ### Claim 1
+    Verdict: [Supported/Refuted/NotEnoughInfo]
+    Reasoning: [Concise explanation]
+    ### Claim 2
+    ...
+    """
+
+_VERDICT_RE = re.compile(r"Verdict:\s*\**\s*(Supported|Refuted|NotEnoughInfo)", re.IGNORECASE)
+_REASONING_RE = re.compile(r"Reasoning:\s*(.*)", re.IGNORECASE | re.DOTALL)
+_CLAIM_HEADER_RE = re.compile(r"^\s*#*\s*Claim\s+(\d+)\s*:?\s*$", re.IGNORECASE | re.MULTILINE)
+_CANONICAL_VERDICTS = {"supported": "Supported", "refuted": "Refuted", "notenoughinfo": "NotEnoughInfo"}
+
+def format_evidence(evidence: list[Evidence]) -> str:
+    return "\n".join([evidence_budget.evidence_line(e) for e in evidence])
+
+def _llm_status_code(e: BaseException) -> Optional[int]:
+    """HTTP status behind an LLM client error, following wrapped causes (the Google SDK errors
+    carry it as `code`; langchain re-raises them wrapped)."""
+    for _ in range(5):
+        if e is None:
+            break
+        code = getattr(e, "code", None)
+        if isinstance(code, int):
+            return code
+        status = getattr(getattr(e, "response", None), "status_code", None)
+        if isinstance(status, int):
+            return status
+        e = e.__cause__ or e.__context__
+    return None
+
+def _retryable_llm_error(e: Exception) -> bool:
+    # Rejected requests (bad key, invalid prompt, quota exhausted) fail the same way on a retry
+    # and say nothing about the LLM being down; timeouts, 5xx and dropped connections are transient
+    status = _llm_status_code(e)
+    return status is None or status == 408 or status >= 500
+
+def parse_verdict(content: str) -> tuple[Optional[str], str]:
+    """Extracts (verdict, reasoning) from a 'Verdict: ... Reasoning: ...' block. verdict is None if absent."""
+    verdict = None
+    reasoning_text = content
+
+    # Simple parsing strategy: Look for "Verdict:" and "Reasoning:" markers
+    verdict_match = _VERDICT_RE.search(content)
+    if verdict_match:
+        # Normalize casing
+        verdict = _CANONICAL_VERDICTS[verdict_match.group(1).strip().lower()]
+
+    # Extract Reasoning (everything after Reasoning:)
+    reasoning_match = _REASONING_RE.search(content)
+    if reasoning_match:
+        reasoning_text = reasoning_match.group(1).strip()
+    elif verdict_match:
+        # Fallback: if no "Reasoning:" tag, try to remove the Verdict line from content
+        reasoning_text = content.replace(verdict_match.group(0), "").strip()
+
+    return verdict, reasoning_text
+
+def split_batch_response(content: str, count: int) -> dict[int, str]:
+    """Splits a batched response into {claim_index (0-based): block}. Missing claims are simply absent."""
+    headers = list(_CLAIM_HEADER_RE.finditer(content))
+    blocks = {}
+    for n, header in enumerate(headers):
+        index = int(header.group(1)) - 1
+        end = headers[n + 1].start() if n + 1 < len(headers) else len(content)
+        if 0 <= index < count and index not in blocks:
+            blocks[index] = content[header.end():end].strip()
+    return blocks
+
+class Adjudicator:
+    """Adjudicator LLM engine: the client and prompts are built once and reused across claims.
+
+    Any object with an async `ainvoke(messages)` returning something with `.content` can stand in
+    for the Gemini client (e.g. LangChain's FakeListChatModel), which makes call counts measurable offline.
+    adjudicate_stream additionally uses `astream(messages)` when the client has it.
+    """
+
+    def __init__(self, llm=None, model: str = ADJUDICATOR_MODEL, batch_size: int = ADJUDICATION_BATCH_SIZE):
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self._llm = llm
+        self.single_prompt = ChatPromptTemplate.from_template(SINGLE_PROMPT)
+        self.batch_prompt = ChatPromptTemplate.from_template(BATCH_PROMPT)
+        self.stats = {
+            "llm_calls": 0,
+            "batched_calls": 0,
+            "single_retries": 0,
+            "claims": 0,
+            "llm_seconds": 0.0,
+        }
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                return None
+            with timed("gemini client"):
+                # Imported on first use: the Google SDK is slow to import
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                self._llm = ChatGoogleGenerativeAI(model=self.model, google_api_key=api_key)
+        return self._llm
+
+    def get_stats(self) -> dict:
+        stats = dict(self.stats)
+        stats["llm_calls_per_claim"] = stats["llm_calls"] / stats["claims"] if stats["claims"] else 0.0
+        stats["claims_per_llm_second"] = stats["claims"] / stats["llm_seconds"] if stats["llm_seconds"] else 0.0
+        return stats
+
+    async def _invoke(self, prompt: ChatPromptTemplate, variables: dict, kind: str = "single") -> str:
+        messages = prompt.format_messages(**variables)
+        observe("llm_prompt_chars", sum(len(str(getattr(m, "content", m))) for m in messages), buckets=SIZE_BUCKETS, kind=kind)
+        inc("llm_calls_total", kind=kind)
+        start = time.perf_counter()
+        try:
+            with span("adjudicate", kind=kind):
+                # Retried with backoff while the claim deadline allows; see deadlines.call
+                response = await deadlines.call("adjudicate", deadlines.LLM_BREAKER, lambda: self.llm.ainvoke(messages),
+                                                 retryable=_retryable_llm_error)
+        finally:
+            self.stats["llm_calls"] += 1
+            self.stats["llm_seconds"] += time.perf_counter() - start
+        content = response.content
+        if not isinstance(content, str):
+            content = str(content)
+        observe("llm_response_chars", len(content), buckets=SIZE_BUCKETS, kind=kind)
+        return content
+
+    async def _stream(self, prompt: ChatPromptTemplate, variables: dict) -> AsyncIterator[str]:
+        """_invoke, yielding the response text as it arrives. Only time spent waiting on the LLM is counted.
+
+        Not retried (text may already be on screen); the whole stream shares the stage's time budget.
+        """
+        messages = prompt.format_messages(**variables)
+        observe("llm_prompt_chars", sum(len(str(getattr(m, "content", m))) for m in messages), buckets=SIZE_BUCKETS, kind="stream")
+        busy, size, failed, acquired = 0.0, 0, True, False
+        try:
+            expires_at = time.perf_counter() + deadlines.acquire("adjudicate", deadlines.LLM_BREAKER)
+            acquired = True
+            inc("llm_calls_total", kind="stream")
+            chunks = self.llm.astream(messages).__aiter__()
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), deadlines.wait_timeout(max(0.0, expires_at - start)))
+                except StopAsyncIteration:
+                    busy += time.perf_counter() - start
+                    break
+                except asyncio.TimeoutError:
+                    busy += time.perf_counter() - start
+                    inc("deadline_exceeded_total", stage="adjudicate")
+                    raise deadlines.DeadlineExceeded("adjudicate stream ran out of time")
+                busy += time.perf_counter() - start
+                if not size:
+                    observe("llm_first_token_seconds", busy)
+                text = chunk.content if isinstance(chunk.content, str) else str(chunk.content)
+                size += len(text)
+                yield text
+            failed = False
+        except (asyncio.CancelledError, GeneratorExit):
+            # Abandoned without an outcome (cancelled, or the consumer stopped reading)
+            if acquired:
+                deadlines.LLM_BREAKER.release()
+            raise
+        except Exception as e:
+            # A refused acquire (no time left, circuit open) took no trial and has nothing to record
+            if acquired and _retryable_llm_error(e):
+                deadlines.LLM_BREAKER.record_failure()
+            elif acquired:
+                deadlines.LLM_BREAKER.record_success() # the LLM answered; the request was bad
+            raise
+        else:
+            deadlines.LLM_BREAKER.record_success()
+        finally:
+            if acquired:
+                self.stats["llm_calls"] += 1
+                self.stats["llm_seconds"] += busy
+                record_stage("adjudicate", busy, error=failed, kind="stream")
+                if not failed:
+                    observe("llm_response_chars", size, buckets=SIZE_BUCKETS, kind="stream")
+
+    async def _budget(self, claims: list[str], evidence_lists: list[list[Evidence]]) -> list[tuple[list[Evidence], Optional[dict]]]:
+        """Evidence budgeter (evidence_budget.py) ahead of the prompt; a no-op when disabled."""
+        if not evidence_budget.EVIDENCE_BUDGET_ENABLED:
+            return [(evidence, None) for evidence in evidence_lists]
+        with span("evidence_budget"):
+            if evidence_budget.EVIDENCE_RERANK:
+                # Cross-encoder inference is CPU-bound
+                return await asyncio.to_thread(evidence_budget.budget_many, claims, evidence_lists)
+            return evidence_budget.budget_many(claims, evidence_lists)
+
+    async def adjudicate(self, claim: str, evidence: list[Evidence], source_type: str) -> VerificationResult:
+        """Runs the Adjudicator LLM on a specific set of evidence for one claim."""
+        self.stats["claims"] += 1
+        [(evidence, report)] = await self._budget([claim], [evidence])
+        result = await self._adjudicate_single(claim, evidence, source_type)
+        result.evidence_budget = report
+        return result
+
+    async def _adjudicate_single(self, claim: str, evidence: list[Evidence], source_type: str) -> VerificationResult:
+        if not evidence:
+            return _no_evidence_result(claim, source_type)
+
+        if self.llm is None:
+            return VerificationResult(claim=claim, verdict="Error", reasoning="Missing API Key", evidence=evidence, source_type=source_type)
+
+        try:
+            content = await self._invoke(self.single_prompt, {"claim": claim, "context": format_evidence(evidence), "source_type": source_type})
+            return _single_result(claim, evidence, source_type, content)
+        except deadlines.StageUnavailable:
+            raise # the caller falls back to its best verdict so far
+        except Exception as e:
+            return _llm_error_result(claim, evidence, source_type, e)
+
+    async def adjudicate_stream(self, claim: str, evidence: list[Evidence], source_type: str) -> AsyncIterator[Union[str, VerificationResult]]:
+        """Like adjudicate, but yields the response text chunks as the LLM produces them.
+
+        The last item is always the VerificationResult. Without evidence, an API key or a streaming
+        client, only that result is yielded. Raises deadlines.StageUnavailable when the LLM runs out of
+        time (or is circuit-broken) before a verdict line was produced.
+        """
+        self.stats["claims"] += 1
+        [(evidence, report)] = await self._budget([claim], [evidence])
+        if not evidence or self.llm is None or not hasattr(self.llm, "astream"):
+            result = await self._adjudicate_single(claim, evidence, source_type)
+        else:
+            chunks = []
+            try:
+                async for text in self._stream(self.single_prompt, {"claim": claim, "context": format_evidence(evidence), "source_type": source_type}):
+                    chunks.append(text)
+                    yield text
+                result = _single_result(claim, evidence, source_type, "".join(chunks))
+            except deadlines.StageUnavailable:
+                if parse_verdict("".join(chunks))[0] is None:
+                    raise
+                # The verdict made it out before the deadline; the reasoning is cut short
+                result = _single_result(claim, evidence, source_type, "".join(chunks))
+            except Exception as e:
+                if chunks:
+                    result = _llm_error_result(claim, evidence, source_type, e)
+                else:
+                    # Nothing shown yet: retry without streaming (with backoff, while time remains)
+                    logger.warning("Streaming adjudication failed (%s). Retrying without streaming.", e)
+                    result = await self._adjudicate_single(claim, evidence, source_type)
+        result.evidence_budget = report
+        yield result
+
+    async def adjudicate_many(self, items: list[tuple[str, list[Evidence], str]]) -> list[VerificationResult]:
+        """Adjudicates (claim, evidence, source_type) items, packing up to batch_size claims per LLM call.
+
+        Claims the batched response does not cover cleanly are retried on their own. Results keep input order.
+        """
+        results: list[Optional[VerificationResult]] = [None] * len(items)
+        self.stats["claims"] += len(items)
+        # One budgeting pass (and one batched rerank) for every claim in the request
+        budgeted = await self._budget([claim for claim, _, _ in items], [evidence for _, evidence, _ in items])
+        items = [(claim, evidence, source_type) for (claim, _, source_type), (evidence, _) in zip(items, budgeted)]
+
+        # Claims without evidence never reach the LLM
+        todo = []
+        for i, (claim, evidence, source_type) in enumerate(items):
+            if not evidence:
+                results[i] = _no_evidence_result(claim, source_type)
+            else:
+                todo.append(i)
+
+        for start in range(0, len(todo), self.batch_size):
+            chunk = todo[start:start + self.batch_size]
+            if len(chunk) == 1 or self.llm is None:
+                for i in chunk:
+                    results[i] = await self._adjudicate_single(*items[i])
+                continue
+
+            retry = chunk
+            try:
+                item_blocks = []
+                for n, i in enumerate(chunk, start=1):
+                    claim, evidence, source_type = items[i]
+                    item_blocks.append(f"### Claim {n}\nClaim: {claim}\nEvidence Source: {source_type}\nEvidence:\n{format_evidence(evidence)}")
+                content = await self._invoke(self.batch_prompt, {"count": len(chunk), "items": "\n\n".join(item_blocks)}, kind="batch")
+                self.stats["batched_calls"] += 1
+
+                blocks = split_batch_response(content, len(chunk))
+                retry = []
+                for n, i in enumerate(chunk):
+                    verdict, reasoning_text = parse_verdict(blocks.get(n, ""))
+                    if n not in blocks or verdict is None:
+                        retry.append(i)
+                        continue
+                    claim, evidence, source_type = items[i]
+                    results[i] = VerificationResult(
+                        claim=claim,
+                        verdict=verdict,
+                        reasoning=reasoning_text,
+                        evidence=evidence,
+                        source_type=source_type
+                    )
+            except deadlines.StageUnavailable:
+                raise
+            except Exception as e:
+                logger.warning("Batched adjudication failed (%s). Retrying claims individually.", e)
+
+            for i in retry:
+                self.stats["single_retries"] += 1
+                results[i] = await self._adjudicate_single(*items[i])
+
+        for result, (_, report) in zip(results, budgeted):
+            result.evidence_budget = report
+        return results
+
+def _single_result(claim: str, evidence: list[Evidence], source_type: str, content: str) -> VerificationResult:
+    verdict, reasoning_text = parse_verdict(content)
+    return VerificationResult(
+        claim=claim,
+        verdict=verdict or "NotEnoughInfo",
+        reasoning=reasoning_text,
+        evidence=evidence,
+        source_type=source_type
+    )
+
+def _llm_error_result(claim: str, evidence: list[Evidence], source_type: str, error: Exception) -> VerificationResult:
+    return VerificationResult(
+        claim=claim,
+        verdict="Error",
+        reasoning=f"LLM Error: {str(error)}",
+        evidence=evidence,
+        source_type=source_type
+    )
+
+def _no_evidence_result(claim: str, source_type: str) -> VerificationResult:
+    return VerificationResult(
+        claim=claim,
+        verdict="NotEnoughInfo",
+        reasoning=f"No evidence found in {source_type}.",
+        evidence=[],
+        source_type=source_type
+    )
+
+_adjudicator: Optional[Adjudicator] = None
+
+def get_adjudicator() -> Adjudicator:
+    """Process-wide Adjudicator, built on first use."""
+    global _adjudicator
+    if _adjudicator is None:
+        _adjudicator = Adjudicator()
+    return _adjudicator
+
+def set_adjudicator(adjudicator: Optional[Adjudicator]):
+    """Replaces the process-wide Adjudicator (e.g. with one wrapping a fake LLM). None resets it."""
+    global _adjudicator
+    _adjudicator = adjudicator
@@ -1,130 +1,408 @@
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
-from models import VerificationResult, Evidence
-from retriever import search_web, search_local
+import time
+import asyncio
+import logging
+from typing import AsyncIterator, Optional
+from models import VerificationResult, VerificationEvent, Evidence
+from retriever import search_web_async, search_local, search_local_batch
+from verdict_cache import VERDICT_CACHE_ENABLED, get_cached_verdict, cache_verdict
+import semantic_cache
+from adjudicator import get_adjudicator
+import fast_path
+import web_pages
+import deadlines
+import web_memory
+from telemetry import span, inc, observe, start_trace, end_trace
 
-async def verify_claim(claim: str) -> VerificationResult:
+logger = logging.getLogger(__name__)
+
+# Default number of claims adjudicated concurrently by verify_claims
+MAX_CONCURRENCY = int(os.getenv("VERIFY_MAX_CONCURRENCY", "8"))
+
+# Speculative web retrieval: "never" (default), "always", or "auto" (only when local evidence looks weak)
+SPECULATIVE_WEB_MODE = os.getenv("SPECULATIVE_WEB_MODE", "never").lower()
+SPECULATIVE_MIN_LOCAL_CONFIDENCE = float(os.getenv("SPECULATIVE_MIN_LOCAL_CONFIDENCE", "0.6"))
+
+# Attach a per-stage timing breakdown (ms) to every verify_claim result
+RESULT_TIMINGS = os.getenv("RESULT_TIMINGS", "0") == "1"
+
+# Counters for speculative web searches (process-wide)
+SPECULATION_STATS = {
+    "started": 0,               # speculative searches launched
+    "used": 0,                  # results consumed by a Web+Local adjudication
+    "cancelled": 0,             # still in flight when the local verdict was conclusive
+    "discarded": 0,             # finished but not needed
+    "wasted_web_seconds": 0.0,  # web time spent on searches we did not use
+    "latency_saved_seconds": 0.0,  # web time overlapped with local work on used searches
+}
+
+def get_speculation_stats() -> dict:
+    return dict(SPECULATION_STATS)
+
+class _SpeculativeSearch:
+    """A web search started ahead of the local verdict."""
+
+    def __init__(self, claim: str):
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        self.task = asyncio.create_task(self._run(claim))
+        SPECULATION_STATS["started"] += 1
+
+    async def _run(self, claim: str) -> list[Evidence]:
+        try:
+            return await _search_web(claim)
+        finally:
+            self.finished_at = time.perf_counter()
+
+    async def collect(self, local_done_at: float) -> list[Evidence]:
+        evidence = await self.task
+        # Sequentially the search would have started at local_done_at
+        duration = self.finished_at - self.started_at
+        SPECULATION_STATS["used"] += 1
+        SPECULATION_STATS["latency_saved_seconds"] += max(0.0, min(duration, local_done_at - self.started_at))
+        return evidence
+
+    def discard(self):
+        if self.task.done():
+            if not self.task.cancelled():
+                self.task.exception() # retrieved, so a failed search is not logged as unhandled
+            SPECULATION_STATS["discarded"] += 1
+            SPECULATION_STATS["wasted_web_seconds"] += self.finished_at - self.started_at
+        else:
+            self.task.cancel()
+            SPECULATION_STATS["cancelled"] += 1
+            SPECULATION_STATS["wasted_web_seconds"] += time.perf_counter() - self.started_at
+
+async def _search_web(claim: str) -> list[Evidence]:
+    """Web search, optionally with snippets replaced by passages from the linked pages."""
+    evidence = await search_web_async(claim)
+    if web_pages.WEB_ENRICH_ENABLED:
+        try:
+            evidence = await deadlines.within("web_enrich", web_pages.enrich_web_evidence(claim, evidence))
+        except Exception as e:
+            # Snippets are still usable evidence
+            logger.warning("Web evidence enrichment failed: %s", e)
+    return evidence
+
+def _likely_local_miss(local_evidence: list[Evidence]) -> bool:
+    """Heuristic for "auto" mode: no evidence, only system errors, or weak similarity."""
+    scores = [e.confidence for e in local_evidence if not e.source.startswith("System")]
+    return not scores or max(scores) < SPECULATIVE_MIN_LOCAL_CONFIDENCE
+
+async def verify_claim(claim: str, speculative: Optional[str] = None, with_timings: Optional[bool] = None,
+                       timeout: Optional[float] = None) -> VerificationResult:
+    """Verifies one claim (local first, web fallback).
+
+    with_timings (default RESULT_TIMINGS) attaches the milliseconds spent per stage to the result.
+    Stages nest (e.g. "embed" runs inside "local_search"), so they do not add up to "total".
+    timeout (default VERIFY_DEADLINE) bounds the whole verification. If a stage runs out of time or
+    its upstream is circuit-broken, the best verdict reached so far is returned, with `incomplete` set.
+    """
+    result = None
+    async for event in _traced_events(claim, speculative, with_timings, timeout, stream_tokens=False):
+        if event.stage == "final":
+            result = event.result
+    return result
+
+async def verify_claim_stream(claim: str, speculative: Optional[str] = None, with_timings: Optional[bool] = None,
+                              timeout: Optional[float] = None) -> AsyncIterator[VerificationEvent]:
+    """verify_claim as a stream of stage events, so callers can show progress before the final verdict.
+
+    Yields "local_evidence", then "local_verdict" (once the LLM has judged the local evidence),
+    and on a web fallback "web_evidence" followed by "token" events carrying the final
+    adjudication text as it is generated. The last event is always "final", with the result.
+    Cache and fast-path hits go straight to "final" (after "local_evidence" for the fast path).
+    """
+    async for event in _traced_events(claim, speculative, with_timings, timeout, stream_tokens=True):
+        yield event
+
+async def _traced_events(claim: str, speculative: Optional[str], with_timings: Optional[bool], timeout: Optional[float], stream_tokens: bool) -> AsyncIterator[VerificationEvent]:
+    token = start_trace()
+    deadline_token = deadlines.start_deadline(deadlines.VERIFY_DEADLINE if timeout is None else timeout)
+    start = time.perf_counter()
+    try:
+        async for event in _verification_events(claim, speculative, stream_tokens):
+            if event.stage == "final":
+                timings = end_trace(token)
+                token = None
+                elapsed = time.perf_counter() - start
+                observe("claim_seconds", elapsed, path=event.path)
+                inc("claims_total", path=event.path)
+                if with_timings if with_timings is not None else RESULT_TIMINGS:
+                    timings["total"] = round(elapsed * 1000, 2)
+                    event.result.timings = timings
+            yield event
+    finally:
+        deadlines.end_deadline(deadline_token)
+        if token is not None:
+            end_trace(token)
+
+async def _verification_events(claim: str, speculative: Optional[str], stream_tokens: bool) -> AsyncIterator[VerificationEvent]:
+    """The verification pipeline; the "final" event's path labels how the verdict was reached."""
     # --- Step 1: Local First Strategy ---
-    print(f"Agent: Analyzing claim: '{claim}'")
-    
-    # 1. Search Local Knowledge Base
-    print("Agent: Querying Local DB (Chroma)...")
-    local_evidence = search_local(claim)
-    
-    # 2. Adjudicate with ONLY Local Evidence first
-    # We only skip this if we found literally 0 evidence, but search_local usually returns something or a specific 'no info' signal.
-    # But let's verify what search_local returns. It returns a list of Evidence.
-    
-    verification_result = await _adjudicate_claim(claim, local_evidence, source_type="Local")
-    
-    # --- Step 2: Fallback to Web if Needed ---
-    # Strategies for fallback:
-    # A) Verdict is "NotEnoughInfo"
-    # B) Verdict is "Refuted" but confidence is low (not implemented yet, stick to A)
-    # C) Local evidence list was actually empty (handled by Adjudicator saying NotEnoughInfo)
-    
-    if verification_result.verdict == "NotEnoughInfo":
-        print("Agent: Local verdict inconclusive. Falling back to Web Search...")
-        
-        web_evidence = search_web(claim)
-        
-        # Combine Evidence:
-        # We assume local was insufficient, but maybe it had *some* useful context? 
-        # Let's keep it.
-        all_evidence = local_evidence + web_evidence
-        
-        # 3. Adjudicate with Combined Evidence
-        verification_result = await _adjudicate_claim(claim, all_evidence, source_type="Web+Local")
-    else:
-        print(f"Agent: Local evidence sufficient. Verdict: {verification_result.verdict}")
-        
-    return verification_result
+    logger.info("Analyzing claim: '%s'", claim)
+
+    # 0. Verdict cache (normalized claim text)
+    if VERDICT_CACHE_ENABLED:
+        with span("verdict_cache"):
+            cached = get_cached_verdict(claim)
+        if cached:
+            logger.info("Verdict cache hit. Verdict: %s", cached.verdict)
+            yield VerificationEvent(stage="final", result=cached, path="verdict_cache")
+            return
+
+    # 0b. Semantic cache (paraphrases of already adjudicated claims)
+    if semantic_cache.SEMANTIC_CACHE_ENABLED:
+        with span("semantic_cache"):
+            cached = await asyncio.to_thread(semantic_cache.lookup, claim)
+        if cached:
+            logger.info("Semantic cache hit. Verdict: %s", cached.verdict)
+            yield VerificationEvent(stage="final", result=cached, path="semantic_cache")
+            return
+
+    mode = (speculative or SPECULATIVE_WEB_MODE).lower()
+    speculation = None
+    local_evidence: list[Evidence] = []
+    verification_result = None  # best verdict so far
+
+    if mode == "always":
+        logger.info("Speculatively starting Web Search alongside local retrieval...")
+        speculation = _SpeculativeSearch(claim)
 
-async def _adjudicate_claim(claim: str, evidence: list[Evidence], source_type: str) -> VerificationResult:
-    """Helper to run the Adjudicator LLM on a specific set of evidence."""
-    
-    if not evidence:
-         return VerificationResult(
-            claim=claim,
-            verdict="NotEnoughInfo",
-            reasoning=f"No evidence found in {source_type}.",
-            evidence=[]
-        )
-
-    # Context String
-    context_str = "\n".join([f"- [{e.source}] (Conf: {e.confidence:.2f}) {e.text}" for e in evidence])
-    
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        return VerificationResult(claim=claim, verdict="Error", reasoning="Missing API Key", evidence=evidence)
-
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash-lite", google_api_key=api_key)
-    
-    # Prompt emphasizing the source we are looking at
-    prompt = ChatPromptTemplate.from_template("""
-    You are an expert fact-checker. Verify the claim based ONLY on the provided evidence.
-    
-    Claim: {claim}
-    
-    Evidence Source: {source_type}
-    Evidence:
-    {context}
-    
-    Instructions:
-    1. Assess if the evidence **conclusively** supports or refutes the claim.
-    2. If the evidence is irrelevant, vague, or missing, return 'NotEnoughInfo'.
-    3. Be strict. Do not hallucinate.
-    
-    Output format:
-    Verdict: [Supported/Refuted/NotEnoughInfo]
-    Reasoning: [Concise explanation]
-    """)
-    
-    chain = prompt | llm
-    
     try:
-        response = await chain.ainvoke({"claim": claim, "context": context_str, "source_type": source_type})
-        content = response.content
-        
-        if not isinstance(content, str):
-            content = str(content)
-            
-        # Parse Verdict and Reasoning
-        verdict = "NotEnoughInfo"
-        reasoning_text = content
-        
-        # Simple parsing strategy: Look for "Verdict:" and "Reasoning:" markers
-        import re
-        
-        # Extact Verdict
-        verdict_match = re.search(r"Verdict:\s*(Supported|Refuted|NotEnoughInfo)", content, re.IGNORECASE)
-        if verdict_match:
-            verdict = verdict_match.group(1).strip()
-            # Normalize casing
-            if verdict.lower() == "supported": verdict = "Supported"
-            elif verdict.lower() == "refuted": verdict = "Refuted"
-            elif verdict.lower() == "notenoughinfo": verdict = "NotEnoughInfo"
-            
-        # Extract Reasoning (everything after Reasoning:)
-        reasoning_match = re.search(r"Reasoning:\s*(.*)", content, re.IGNORECASE | re.DOTALL)
-        if reasoning_match:
-            reasoning_text = reasoning_match.group(1).strip()
+        # 1. Search Local Knowledge Base
+        logger.info("Querying Local DB...")
+        try:
+            with span("local_search"):
+                local_evidence = await deadlines.within("local_search", asyncio.to_thread(search_local, claim))
+        except deadlines.DeadlineExceeded as e:
+            # The web may still answer in the time left
+            logger.warning("Local search timed out: %s", e)
+            local_evidence = [_timeout_evidence("Local search", e)]
+        yield VerificationEvent(stage="local_evidence", evidence=local_evidence)
+
+        # 1b. Fast path: a near-identical verified FEVER fact needs no LLM call
+        fast_result = fast_path.fast_verdict(claim, local_evidence) if fast_path.FAST_VERDICT_ENABLED else None
+        if fast_result:
+            logger.info("Near-identical local fact found. Returning fast-path verdict.")
+            verification_result = fast_result
+            path = "fast_path"
         else:
-            # Fallback: if no "Reasoning:" tag, try to remove the Verdict line from content
-            if verdict_match:
-                reasoning_text = content.replace(verdict_match.group(0), "").strip()
-            
-        return VerificationResult(
-            claim=claim,
-            verdict=verdict,
-            reasoning=reasoning_text,
-            evidence=evidence
-        )
-    except Exception as e:
-        return VerificationResult(
-            claim=claim,
-            verdict="Error",
-            reasoning=f"LLM Error: {str(e)}",
-            evidence=evidence
-        )
+            if mode == "auto" and _likely_local_miss(local_evidence):
+                logger.info("Local evidence looks weak. Speculatively starting Web Search...")
+                speculation = _SpeculativeSearch(claim)
+
+            # 2. Adjudicate with ONLY Local Evidence first
+            verification_result = await _adjudicate_claim(claim, local_evidence, source_type="Local")
+            local_done_at = time.perf_counter()
+            path = "local"
+            yield VerificationEvent(stage="local_verdict", result=verification_result)
+
+            # --- Step 2: Fallback to Web if the local verdict is NotEnoughInfo ---
+            if verification_result.verdict == "NotEnoughInfo":
+                logger.info("Local verdict inconclusive. Falling back to Web Search...")
+                path = "web"
+
+                if speculation:
+                    web_evidence = await speculation.collect(local_done_at)
+                    speculation = None
+                else:
+                    web_evidence = await _search_web(claim)
+
+                # Combine Evidence:
+                # We assume local was insufficient, but maybe it had *some* useful context? 
+                # Let's keep it.
+                all_evidence = local_evidence + web_evidence
+                yield VerificationEvent(stage="web_evidence", evidence=web_evidence)
+
+                # 3. Adjudicate with Combined Evidence
+                if stream_tokens:
+                    async for item in get_adjudicator().adjudicate_stream(claim, all_evidence, "Web+Local"):
+                        if isinstance(item, VerificationResult):
+                            verification_result = item
+                        else:
+                            yield VerificationEvent(stage="token", text=item)
+                else:
+                    verification_result = await _adjudicate_claim(claim, all_evidence, source_type="Web+Local")
+            else:
+                logger.info("Local evidence sufficient. Verdict: %s", verification_result.verdict)
+    except deadlines.StageUnavailable as e:
+        logger.warning("Verification cut short (%s). Returning the best verdict so far.", e)
+        verification_result = _best_so_far(claim, verification_result, local_evidence, e)
+        path = "deadline"
+    finally:
+        # Local verdict was conclusive (or we failed): the speculative search is not needed
+        if speculation:
+            speculation.discard()
+
+    if VERDICT_CACHE_ENABLED:
+        cache_verdict(verification_result)
+    if semantic_cache.SEMANTIC_CACHE_ENABLED:
+        await asyncio.to_thread(semantic_cache.store, [verification_result])
+    if path == "web" and web_memory.WEB_WRITEBACK_ENABLED:
+        await asyncio.to_thread(web_memory.write_back, verification_result, web_evidence)
+    if path in ("local", "fast_path", "web"):
+        web_memory.record_outcomes(fell_back=int(path == "web"), settled_locally=int(path != "web"))
+
+    yield VerificationEvent(stage="final", result=verification_result, path=path)
+
+async def verify_claims(claims: list[str], max_concurrency: int = MAX_CONCURRENCY, timeout: Optional[float] = None) -> list[VerificationResult]:
+    """Batch version of verify_claim. Returns one result per claim, in input order.
+
+    timeout bounds the whole batch (no deadline by default: batches can be arbitrarily large);
+    claims still unresolved when it runs out get their best verdict so far, as in verify_claim.
+    """
+    if not claims:
+        return []
+    deadline_token = deadlines.start_deadline(timeout)
+    try:
+        return await _verify_claims(claims, max_concurrency)
+    finally:
+        deadlines.end_deadline(deadline_token)
+
+async def _verify_claims(claims: list[str], max_concurrency: int) -> list[VerificationResult]:
+    logger.info("Verifying batch of %d claims (max_concurrency=%d)", len(claims), max_concurrency)
+    results: list[Optional[VerificationResult]] = [None] * len(claims)
+
+    # 0. Serve what we can from the verdict cache; only misses go through the pipeline
+    if VERDICT_CACHE_ENABLED:
+        with span("verdict_cache"):
+            for i, claim in enumerate(claims):
+                results[i] = get_cached_verdict(claim)
+    pending = [i for i, r in enumerate(results) if r is None]
+    inc("claims_total", len(claims) - len(pending), path="verdict_cache")
+    if pending and semantic_cache.SEMANTIC_CACHE_ENABLED:
+        with span("semantic_cache"):
+            semantic_hits = await asyncio.to_thread(semantic_cache.lookup_many, [claims[i] for i in pending])
+        for i, result in zip(pending, semantic_hits):
+            results[i] = result
+        served = len(pending)
+        pending = [i for i, r in enumerate(results) if r is None]
+        inc("claims_total", served - len(pending), path="semantic_cache")
+    if len(pending) < len(claims):
+        logger.info("%d/%d claims served from cache", len(claims) - len(pending), len(claims))
+    if not pending:
+        return results
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    pending_claims = [claims[i] for i in pending]
+
+    # 1. One embedding pass + a few large Chroma queries for the whole batch
+    logger.info("Querying Local DB in batch...")
+    try:
+        with span("local_search"):
+            local_evidence = await deadlines.within("local_search_batch", asyncio.to_thread(search_local_batch, pending_claims))
+    except deadlines.DeadlineExceeded as e:
+        logger.warning("Batch local search timed out: %s", e)
+        local_evidence = [[_timeout_evidence("Local search", e)] for _ in pending_claims]
+
+    # 1b. Fast path for near-identical verified facts; only the rest reach the LLM
+    fast_results = [
+        fast_path.fast_verdict(claim, evidence) if fast_path.FAST_VERDICT_ENABLED else None
+        for claim, evidence in zip(pending_claims, local_evidence)
+    ]
+    to_adjudicate = [j for j, r in enumerate(fast_results) if r is None]
+    inc("claims_total", len(pending_claims) - len(to_adjudicate), path="fast_path")
+
+    # 2. Adjudicate every remaining claim against its local evidence (several claims per LLM call)
+    pending_results: list[VerificationResult] = fast_results
+    adjudicated = await _adjudicate_batched(
+        [(pending_claims[j], local_evidence[j], "Local") for j in to_adjudicate], semaphore
+    )
+    for j, result in zip(to_adjudicate, adjudicated):
+        pending_results[j] = result
+
+    # 3. Only the inconclusive subset goes to the web fallback
+    fallback = [j for j, r in enumerate(pending_results) if r.verdict == "NotEnoughInfo"]
+    inc("claims_total", len(to_adjudicate) - len(fallback), path="local")
+    inc("claims_total", len(fallback), path="web")
+    web_memory.record_outcomes(fell_back=len(fallback), settled_locally=len(pending_claims) - len(fallback))
+    if fallback:
+        logger.info("%d/%d claims inconclusive locally. Falling back to Web Search...", len(fallback), len(pending))
+
+        async def _web_search(j: int) -> list[Evidence]:
+            async with semaphore:
+                return await _search_web(pending_claims[j])
+
+        web_evidence = await asyncio.gather(*[_web_search(j) for j in fallback], return_exceptions=True)
+        searched, items = [], []
+        for j, found in zip(fallback, web_evidence):
+            if isinstance(found, deadlines.StageUnavailable):
+                # No web evidence to judge: keep the local verdict, marked incomplete (never cached)
+                pending_results[j] = _best_so_far(pending_claims[j], pending_results[j], local_evidence[j], found)
+                continue
+            if isinstance(found, BaseException):
+                found = [Evidence(text=f"Process Error: Could not retrieve web evidence. Details: {str(found)}", source="System Error", confidence=0.0)]
+            searched.append((j, found))
+            items.append((pending_claims[j], local_evidence[j] + found, "Web+Local"))
+        web_results = await _adjudicate_batched(items, semaphore, fallbacks=[pending_results[j] for j, _ in searched])
+        for (j, _), result in zip(searched, web_results):
+            pending_results[j] = result
+        if web_memory.WEB_WRITEBACK_ENABLED:
+            # Error items carry no URL, so write_back_many skips them
+            written = [(result, found) for result, (_, found) in zip(web_results, searched)]
+            await asyncio.to_thread(web_memory.write_back_many, written)
+
+    for i, result in zip(pending, pending_results):
+        results[i] = result
+        if VERDICT_CACHE_ENABLED:
+            cache_verdict(result)
+    if semantic_cache.SEMANTIC_CACHE_ENABLED:
+        await asyncio.to_thread(semantic_cache.store, pending_results)
+
+    return results
+
+async def _adjudicate_batched(items: list[tuple[str, list[Evidence], str]], semaphore: asyncio.Semaphore,
+                              fallbacks: Optional[list[VerificationResult]] = None) -> list[VerificationResult]:
+    """Splits items into LLM-sized chunks run concurrently; a failing chunk only turns its own claims into Errors.
+
+    A chunk that runs out of time (or finds the LLM circuit open) falls back to the matching
+    `fallbacks` result, i.e. the best verdict so far, instead.
+    """
+    adjudicator = get_adjudicator()
+    chunks = [items[start:start + adjudicator.batch_size] for start in range(0, len(items), adjudicator.batch_size)]
+    fallbacks = fallbacks or [None] * len(items)
+
+    async def _run(chunk):
+        async with semaphore:
+            return await adjudicator.adjudicate_many(chunk)
+
+    outcomes = await asyncio.gather(*[_run(chunk) for chunk in chunks], return_exceptions=True)
+    results = []
+    for chunk, outcome in zip(chunks, outcomes):
+        if isinstance(outcome, deadlines.StageUnavailable):
+            best = fallbacks[len(results):len(results) + len(chunk)]
+            outcome = [_best_so_far(claim, b, evidence, outcome) for (claim, evidence, _), b in zip(chunk, best)]
+        elif isinstance(outcome, BaseException):
+            outcome = [VerificationResult(
+                claim=claim,
+                verdict="Error",
+                reasoning=f"Batch Error: {str(outcome)}",
+                evidence=evidence,
+                source_type=source_type
+            ) for claim, evidence, source_type in chunk]
+        results.extend(outcome)
+    return results
+
+def _timeout_evidence(stage: str, reason: Exception) -> Evidence:
+    return Evidence(text=f"{stage} timed out ({reason}).", source="System", confidence=0.0)
+
+def _best_so_far(claim: str, best: Optional[VerificationResult], evidence: list[Evidence], reason: Exception) -> VerificationResult:
+    """Result for a claim whose verification was cut short: the local verdict when one was reached, else NotEnoughInfo."""
+    if best is not None:
+        return best.model_copy(update={
+            "reasoning": f"(Web fallback not completed: {reason}) {best.reasoning}",
+            "incomplete": str(reason),
+        })
+    return VerificationResult(
+        claim=claim,
+        verdict="NotEnoughInfo",
+        reasoning=f"No verdict reached in time: {reason}",
+        evidence=evidence,
+        source_type="Local",
+        incomplete=str(reason)
+    )
+
+async def _adjudicate_claim(claim: str, evidence: list[Evidence], source_type: str) -> VerificationResult:
+    """Helper to run the Adjudicator LLM on a specific set of evidence."""
+    return await get_adjudicator().adjudicate(claim, evidence, source_type)
@@ -0,0 +1,126 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+# Compares local top-k retrieval on the Chroma collection vs the mmap index (vector_index.py).
+# Each backend runs in its own subprocess so resident memory is measured independently;
+# query embeddings are computed once up front so only the index itself is timed.
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except Exception:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _latency_summary(samples: list) -> dict:
+    ms = np.asarray(samples) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3), "p95_ms": round(float(np.percentile(ms, 95)), 3), "mean_ms": round(float(ms.mean()), 3)}
+
+def _run_backend(backend: str, queries_path: str, k: int, batch_size: int, chroma_path: str, collection_name: str, index_dir: str) -> dict:
+    queries = np.load(queries_path)
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    if backend == "chroma":
+        import chromadb
+        collection = chromadb.PersistentClient(path=chroma_path).get_collection(name=collection_name)
+        search = lambda q: collection.query(query_embeddings=q.tolist(), n_results=k)
+    else:
+        from vector_index import MmapVectorIndex
+        index = MmapVectorIndex(index_dir)
+        search = lambda q: index.search(q, k=k)
+    open_seconds = time.perf_counter() - start
+
+    search(queries[:1]) # warm-up
+    single = []
+    for q in queries:
+        start = time.perf_counter()
+        search(q[None, :])
+        single.append(time.perf_counter() - start)
+
+    batched = []
+    for start_row in range(0, len(queries), batch_size):
+        chunk = queries[start_row:start_row + batch_size]
+        start = time.perf_counter()
+        search(chunk)
+        batched.append((time.perf_counter() - start) / len(chunk))
+
+    return {
+        "backend": backend,
+        "open_seconds": round(open_seconds, 3),
+        "single_query": _latency_summary(single),
+        "batched_per_query": _latency_summary(batched),
+        "rss_mb_before_open": round(rss_before, 1),
+        "rss_mb_after": round(_rss_mb(), 1),
+    }
+
+def _load_claims(data_file: str, n: int) -> list:
+    claims = []
+    with open(data_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                claims.append(json.loads(line)["claim"])
+            except Exception:
+                continue
+            if len(claims) >= n:
+                break
+    return claims
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Chroma vs mmap index for local retrieval.")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--data", default=os.path.join("data", "fever.jsonl"), help="Claims used as queries")
+    parser.add_argument("--chroma-path", default="chroma_db")
+    parser.add_argument("--collection", default="fever-facts")
+    parser.add_argument("--index-dir", default="vector_index")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--child", choices=["chroma", "mmap"], help=argparse.SUPPRESS)
+    parser.add_argument("--queries-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = _run_backend(args.child, args.queries_file, args.k, args.batch_size, args.chroma_path, args.collection, args.index_dir)
+        print(json.dumps(result))
+        return
+
+    import embedding_service
+    claims = _load_claims(args.data, args.queries)
+    print(f"Embedding {len(claims)} query claims...")
+    queries = np.asarray(embedding_service.load_model_fn()(claims), dtype=np.float32)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        queries_file = os.path.join(tmp, "queries.npy")
+        np.save(queries_file, queries)
+        for backend in ("chroma", "mmap"):
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", backend, "--queries-file", queries_file,
+                 "--k", str(args.k), "--batch-size", str(args.batch_size), "--chroma-path", args.chroma_path,
+                 "--collection", args.collection, "--index-dir", args.index_dir],
+                capture_output=True, text=True, cwd=os.getcwd()
+            )
+            if out.returncode != 0:
+                print(f"{backend} benchmark failed:\n{out.stderr}")
+                continue
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"{'backend':<8} {'open s':>8} {'single p50':>11} {'single p95':>11} {'batch p50':>10} {'RSS MB':>8}")
+    for r in results:
+        print(f"{r['backend']:<8} {r['open_seconds']:>8} {r['single_query']['p50_ms']:>9}ms {r['single_query']['p95_ms']:>9}ms "
+              f"{r['batched_per_query']['p50_ms']:>8}ms {r['rss_mb_after']:>8}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"queries": len(claims), "k": args.k, "batch_size": args.batch_size, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
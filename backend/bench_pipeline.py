@@ -0,0 +1,271 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import resource
+import tempfile
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Offline end-to-end benchmark: FEVER claims through the real local retrieval, with a
+# deterministic fake Gemini model and a local stub of the Custom Search endpoint (both with
+# injectable latency). Nothing leaves the machine. Results are written as JSON so runs can be
+# compared with --compare.
+
+FEVER_LABEL_TO_VERDICT = {"SUPPORTS": "Supported", "REFUTES": "Refuted", "NOT ENOUGH INFO": "NotEnoughInfo"}
+
+def _stable_choice(text: str, options: list):
+    return options[int(hashlib.md5(text.encode("utf-8")).hexdigest(), 16) % len(options)]
+
+class _Latency:
+    """Seeded latency source: mean milliseconds +/- uniform jitter."""
+
+    def __init__(self, mean_ms: float, jitter_ms: float, seed: int):
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def seconds(self) -> float:
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.mean_ms + jitter) / 1000
+
+class _FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+
+class FakeChatModel:
+    """Deterministic stand-in for ChatGoogleGenerativeAI (ainvoke / astream).
+
+    Verdicts follow the FEVER gold label of the claim: NOT ENOUGH INFO stays inconclusive on
+    local evidence and resolves (by hash) once web evidence is present. Unknown claims are hashed.
+    Understands both the single-claim and the packed multi-claim prompts.
+    """
+
+    def __init__(self, labels: dict, latency: _Latency, per_claim_ms: float = 0.0):
+        self.labels = labels
+        self.latency = latency
+        self.per_claim_ms = per_claim_ms
+        self.calls = 0
+
+    def _verdict(self, claim: str, source_type: str) -> str:
+        verdict = FEVER_LABEL_TO_VERDICT.get(self.labels.get(claim), None)
+        if verdict is None:
+            verdict = _stable_choice(claim, ["Supported", "Refuted", "NotEnoughInfo"])
+        if verdict == "NotEnoughInfo" and "Web" in source_type:
+            verdict = _stable_choice(claim, ["Supported", "Refuted", "NotEnoughInfo"])
+        return verdict
+
+    def _answer(self, prompt: str) -> tuple[str, int]:
+        blocks = re.split(r"^\s*### Claim (\d+)\s*$", prompt.split("Instructions:")[0], flags=re.MULTILINE)
+        if len(blocks) > 1:
+            lines = []
+            for number, block in zip(blocks[1::2], blocks[2::2]):
+                claim = re.search(r"Claim:\s*(.*)", block).group(1).strip()
+                source = re.search(r"Evidence Source:\s*(.*)", block).group(1).strip()
+                lines.append(f"### Claim {number}\nVerdict: {self._verdict(claim, source)}\nReasoning: Fake adjudication of claim {number}.")
+            return "\n".join(lines), len(lines)
+        claim = re.search(r"Claim:\s*(.*)", prompt).group(1).strip()
+        source = re.search(r"Evidence Source:\s*(.*)", prompt).group(1).strip()
+        return f"Verdict: {self._verdict(claim, source)}\nReasoning: Fake adjudication based on {source} evidence.", 1
+
+    @staticmethod
+    def _prompt_text(messages) -> str:
+        return "\n".join(m if isinstance(m, str) else str(m.content) for m in messages)
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        content, claims = self._answer(self._prompt_text(messages))
+        await asyncio.sleep(self.latency.seconds() + claims * self.per_claim_ms / 1000)
+        return _FakeMessage(content)
+
+    async def astream(self, messages, **kwargs):
+        self.calls += 1
+        content, claims = self._answer(self._prompt_text(messages))
+        await asyncio.sleep(self.latency.seconds() + claims * self.per_claim_ms / 1000)
+        for token in re.findall(r"\S+\s*", content):
+            yield _FakeMessage(token)
+
+class StubSearchServer:
+    """Local HTTP server answering Custom Search style queries after an injected delay."""
+
+    def __init__(self, latency: _Latency):
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests += 1
+                query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+                time.sleep(server.latency.seconds())
+                body = json.dumps({"items": [
+                    {"snippet": f"Stub result {i} about: {query}", "displayLink": f"stub{i}.example", "link": f"http://stub{i}.example/{i}"}
+                    for i in range(3)
+                ]}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/customsearch/v1"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+def _load_claims(data_file: str, sample: int, seed: int) -> list:
+    with open(data_file, "r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    random.Random(seed).shuffle(rows)
+    return rows[:sample]
+
+async def _run(args, rows: list) -> dict:
+    import agent
+    import retriever
+    import adjudicator
+    import semantic_cache
+    import telemetry
+    import embedding_service
+    import web_memory
+    from cache import SQLiteCache
+
+    # In case the retriever was imported before main() set GOOGLE_SEARCH_URL
+    retriever.SEARCH_API_URL = args.stub.url
+
+    labels = {row["claim"]: row.get("label") for row in rows}
+    llm = FakeChatModel(labels, _Latency(args.llm_ms, args.llm_jitter_ms, args.seed), per_claim_ms=args.llm_per_claim_ms)
+    adjudicator.set_adjudicator(adjudicator.Adjudicator(llm=llm))
+
+    if not args.warm_cache:
+        # Cold caches: verdicts and written-back web evidence off, web cache in a throwaway file
+        agent.VERDICT_CACHE_ENABLED = False
+        semantic_cache.SEMANTIC_CACHE_ENABLED = False
+        web_memory.WEB_WRITEBACK_ENABLED = False
+        retriever._web_cache = SQLiteCache(os.path.join(tempfile.mkdtemp(), "web.sqlite"))
+
+    claims = [row["claim"] for row in rows]
+    retriever.warm_up(background=False)
+
+    latencies = []
+    start = time.perf_counter()
+    if args.mode == "batch":
+        results = await agent.verify_claims(claims, max_concurrency=args.concurrency)
+        # Batch mode has no per-claim latency; report the amortized batch time per claim
+        latencies = [(time.perf_counter() - start) / max(1, len(claims))] * len(claims)
+    else:
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def _one(claim):
+            async with semaphore:
+                t0 = time.perf_counter()
+                result = await agent.verify_claim(claim)
+                latencies.append(time.perf_counter() - t0)
+                return result
+
+        results = await asyncio.gather(*[_one(c) for c in claims])
+    wall = time.perf_counter() - start
+    await retriever.close_http_client()
+
+    n = max(1, len(claims))
+    verdicts = {}
+    for r in results:
+        verdicts[r.verdict] = verdicts.get(r.verdict, 0) + 1
+    return {
+        "claims": len(claims),
+        "wall_seconds": round(wall, 3),
+        "claims_per_second": round(len(claims) / wall, 3) if wall else 0.0,
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 50) * 1000, 2),
+            "p95": round(_percentile(latencies, 95) * 1000, 2),
+            "p99": round(_percentile(latencies, 99) * 1000, 2),
+        },
+        "llm_calls_per_claim": round(llm.calls / n, 3),
+        "web_calls_per_claim": round(args.stub.requests / n, 3),
+        "fallback_rate": round(sum(1 for r in results if r.source_type and "Web" in r.source_type) / n, 4),
+        "evidence_tokens_saved_per_claim": round(sum(r.evidence_budget["tokens_saved"] for r in results if r.evidence_budget) / n, 1),
+        "verdicts": verdicts,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "local_search": retriever.get_local_search_stats(),
+        "embedding": embedding_service.get_embedding_stats(),
+        "web_memory": web_memory.get_web_memory_stats(),
+        "stages": {name: stats for name, stats in telemetry.snapshot()["histograms"].items() if name.startswith("stage_seconds")},
+    }
+
+def _compare(current: dict, previous: dict):
+    keys = [
+        ("claims_per_second", "claims/s"), ("llm_calls_per_claim", "LLM calls/claim"),
+        ("web_calls_per_claim", "web calls/claim"), ("fallback_rate", "fallback rate"), ("peak_rss_mb", "peak RSS MB"),
+    ]
+    print("\nChange vs previous run:")
+    for q in ("p50", "p95", "p99"):
+        before, after = previous["results"]["latency_ms"][q], current["latency_ms"][q]
+        print(f"  latency {q}: {before} -> {after} ms ({(after - before) / before * 100 if before else 0:+.1f}%)")
+    for key, label in keys:
+        before, after = previous["results"][key], current[key]
+        print(f"  {label}: {before} -> {after} ({(after - before) / before * 100 if before else 0:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of verify_claim / verify_claims.")
+    parser.add_argument("--data", default=os.path.join("data", "fever.jsonl"))
+    parser.add_argument("--sample", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=["single", "batch"], default="single", help="verify_claim per claim, or one verify_claims call")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-ms", type=float, default=400, help="Injected fake LLM latency per call")
+    parser.add_argument("--llm-jitter-ms", type=float, default=150)
+    parser.add_argument("--llm-per-claim-ms", type=float, default=20, help="Extra latency per claim in a packed prompt")
+    parser.add_argument("--search-ms", type=float, default=250, help="Injected stub search latency")
+    parser.add_argument("--search-jitter-ms", type=float, default=100)
+    parser.add_argument("--warm-cache", action="store_true", help="Keep verdict/semantic/web caches enabled")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="Earlier --out file to diff against")
+    args = parser.parse_args()
+
+    # Point the search client at the stub before the retriever reads its configuration
+    args.stub = StubSearchServer(_Latency(args.search_ms, args.search_jitter_ms, args.seed + 1))
+    os.environ["GOOGLE_SEARCH_URL"] = args.stub.url
+    os.environ.setdefault("GOOGLE_SEARCH_API_KEY", "offline-benchmark")
+    os.environ.setdefault("GOOGLE_CSE_ID", "offline-benchmark")
+
+    rows = _load_claims(args.data, args.sample, args.seed)
+    results = asyncio.run(_run(args, rows))
+    args.stub.close()
+
+    config = {k: v for k, v in vars(args).items() if k not in ("stub", "out", "compare")}
+    print(json.dumps(results, indent=2))
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"config": config, "results": results}, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            _compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os
+import json
+import shutil
+import argparse
+import tempfile
+import numpy as np
+from vector_index import INDEX_DIR, MATRIX_FILE, META_FILE, DOCS_FILE, MmapVectorIndex, quantize_index
+
+# Recall@k vs index memory for float32 / float16 / int8 storage, with and without full-precision
+# re-scoring. Ground truth is the current search_local path (Chroma, float32); recall against an
+# exact float32 scan is reported too, so HNSW approximation and quantization loss can be told apart.
+
+CONFIGS = [
+    ("float32", False),
+    ("float16", False),
+    ("float16", True),
+    ("int8", False),
+    ("int8", True),
+]
+
+def _recall(results: list, truth: list, k: int) -> float:
+    hits = [len(set(r[:k]) & set(t[:k])) / max(1, min(k, len(t))) for r, t in zip(results, truth)]
+    return float(np.mean(hits)) if hits else 0.0
+
+def _load_claims(data_file: str, n: int) -> list:
+    claims = []
+    with open(data_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                claims.append(json.loads(line)["claim"])
+            except Exception:
+                continue
+            if len(claims) >= n:
+                break
+    return claims
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k vs memory for quantized mmap indexes.")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--data", default=os.path.join("data", "fever.jsonl"))
+    parser.add_argument("--index-dir", default=INDEX_DIR, help="A float32 index exported by vector_index.py")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    import retriever
+    claims = _load_claims(args.data, args.queries)
+    print(f"Embedding {len(claims)} claims and querying the current search_local path...")
+    queries = np.asarray(retriever.get_embed_fn()(claims), dtype=np.float32)
+    collection = retriever.get_collection()
+    if collection is None:
+        raise SystemExit(f"Local collection unavailable: {retriever.get_init_error()}")
+    chroma_truth = []
+    for start in range(0, len(queries), 256):
+        results = collection.query(query_embeddings=queries[start:start + 256].tolist(), n_results=args.k)
+        chroma_truth.extend(results["documents"])
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        exact_truth = None
+        for dtype, rescore in CONFIGS:
+            path = os.path.join(tmp, dtype)
+            if not os.path.exists(path):
+                os.makedirs(path)
+                for name in (MATRIX_FILE, META_FILE, DOCS_FILE):
+                    shutil.copy(os.path.join(args.index_dir, name), path)
+                if dtype != "float32":
+                    quantize_index(path, dtype)
+            index = MmapVectorIndex(path, rescore=rescore)
+            found = [[doc for doc, _ in hits] for hits in index.search(queries, k=args.k)]
+            if exact_truth is None:
+                exact_truth = found
+            rows.append({
+                "dtype": dtype,
+                "rescore": index.rescore,
+                "scoring_mb": round(index.scoring_bytes() / 2**20, 2),
+                f"recall@{args.k}_vs_search_local": round(_recall(found, chroma_truth, args.k), 4),
+                f"recall@{args.k}_vs_exact": round(_recall(found, exact_truth, args.k), 4),
+            })
+
+    print(f"{'dtype':<8} {'rescore':<8} {'MB':>8} {'vs search_local':>16} {'vs exact':>10}")
+    for r in rows:
+        print(f"{r['dtype']:<8} {str(r['rescore']):<8} {r['scoring_mb']:>8} {r[f'recall@{args.k}_vs_search_local']:>16} {r[f'recall@{args.k}_vs_exact']:>10}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"queries": len(claims), "k": args.k, "results": rows}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
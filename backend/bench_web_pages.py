@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import tempfile
+import threading
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import web_pages
+import retriever
+import telemetry
+from cache import SQLiteCache
+from models import Evidence
+
+# Web evidence enrichment against a local fixture server (no network): throughput of the page
+# fetcher and the behaviour of its conditional-GET disk cache across three passes:
+#   cold        empty cache, every page downloaded
+#   fresh       within PAGE_FRESH_SECONDS, no requests at all
+#   revalidate  freshness expired, conditional GETs answered with 304
+# The fixture also serves oversized, slow and non-HTML pages, and records the peak number of
+# concurrent requests per Host header so the per-host limit can be checked.
+
+LOREM = (
+    "The committee reviewed the archive records from {year} and confirmed the original figures. "
+    "Several witnesses described the event in detail, and the reports were published in regional newspapers. "
+)
+
+def _page_html(i: int, paragraphs: int) -> bytes:
+    body = "".join(
+        f"<p>Page {i}, paragraph {n}: {LOREM.format(year=1900 + (i * 7 + n) % 120)}</p>" for n in range(paragraphs)
+    )
+    return f"<html><head><script>var x = 1;</script></head><body><nav>Menu</nav>{body}<footer>Footer</footer></body></html>".encode("utf-8")
+
+class FixturePageServer:
+    """Local HTTP server for /page/N (ETag + Last-Modified, honours conditional GETs), /big/N,
+    /slow/N and /pdf/N, with injected latency and per-host concurrency tracking."""
+
+    def __init__(self, latency_ms: float, paragraphs: int, big_bytes: int, slow_seconds: float):
+        self.latency = latency_ms / 1000
+        self.paragraphs = paragraphs
+        self.big_bytes = big_bytes
+        self.slow_seconds = slow_seconds
+        self.status_counts = {}
+        self.bytes_sent = 0
+        self.active = {}
+        self.peak = {}
+        self._lock = threading.Lock()
+        self._last_modified = formatdate(time.time() - 86400, usegmt=True)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                # Slow pages keep a server thread busy after the client has timed out; leave them
+                # out of the concurrency peaks, which are meant to reflect the client's limits
+                host = self.headers.get("Host", "") if not self.path.startswith("/slow/") else None
+                if host is not None:
+                    with server._lock:
+                        server.active[host] = server.active.get(host, 0) + 1
+                        server.peak[host] = max(server.peak.get(host, 0), server.active[host])
+                try:
+                    server._handle(self)
+                finally:
+                    if host is not None:
+                        with server._lock:
+                            server.active[host] -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.port = self.httpd.server_port
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def _respond(self, handler, status: int, content_type: str = "", body: bytes = b"", headers: dict = None):
+        handler.send_response(status)
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        if content_type:
+            handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        try:
+            handler.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass # client hit its size cap or timeout
+        with self._lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            self.bytes_sent += len(body)
+
+    def _handle(self, handler):
+        time.sleep(self.latency)
+        kind, _, number = handler.path.strip("/").partition("/")
+        if kind == "page":
+            body = _page_html(int(number), self.paragraphs)
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            validators = {"ETag": etag, "Last-Modified": self._last_modified}
+            if handler.headers.get("If-None-Match") == etag:
+                self._respond(handler, 304, headers=validators)
+            else:
+                self._respond(handler, 200, "text/html; charset=utf-8", body, validators)
+        elif kind == "big":
+            paragraph = f"<p>{LOREM.format(year=2000)}</p>".encode("utf-8")
+            self._respond(handler, 200, "text/html", paragraph * (self.big_bytes // len(paragraph) + 1))
+        elif kind == "slow":
+            time.sleep(self.slow_seconds)
+            self._respond(handler, 200, "text/html", _page_html(int(number), self.paragraphs))
+        elif kind == "pdf":
+            self._respond(handler, 200, "application/pdf", b"%PDF-1.4 fixture")
+        else:
+            self._respond(handler, 404, "text/plain", b"not found")
+
+    def reset_counts(self):
+        with self._lock:
+            self.status_counts, self.bytes_sent, self.peak = {}, 0, {}
+
+    def close(self):
+        self.httpd.shutdown()
+
+def _evidence_sets(server: FixturePageServer, claims: int, special_every: int) -> list:
+    """Three linked results per claim, spread over two host names for the same server."""
+    hosts = [f"127.0.0.1:{server.port}", f"localhost:{server.port}"]
+    sets = []
+    for c in range(claims):
+        evidence = []
+        for r in range(3):
+            n = c * 3 + r
+            kind = "page"
+            if special_every and n % special_every == special_every - 1:
+                kind = ("big", "slow", "pdf")[(n // special_every) % 3]
+            host = hosts[n % 2]
+            evidence.append(Evidence(text=f"Snippet {n}", source=host, url=f"http://{host}/{kind}/{n}", confidence=0.7))
+        sets.append((f"Archive records from {1900 + c % 120} confirmed the original figures", evidence))
+    return sets
+
+def _outcome_delta(before: dict, after: dict) -> dict:
+    """page_fetch_total increments between two snapshots, keyed by outcome."""
+    prefix = 'page_fetch_total{result="'
+    return {
+        key[len(prefix):-2]: int(after[key] - before.get(key, 0))
+        for key in after if key.startswith(prefix) and after[key] != before.get(key, 0)
+    }
+
+async def _pass(sets: list, concurrency: int) -> tuple[float, list]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one(claim, evidence):
+        async with semaphore:
+            return await web_pages.enrich_web_evidence(claim, evidence)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[_one(c, e) for c, e in sets])
+    return time.perf_counter() - start, results
+
+async def _run(args, server: FixturePageServer) -> dict:
+    sets = _evidence_sets(server, args.claims, args.special_every)
+    pages = sum(len(e) for _, e in sets)
+    report = {"claims": args.claims, "pages_per_pass": pages}
+    for name, fresh_seconds in (("cold", 3600), ("fresh", 3600), ("revalidate", 0)):
+        web_pages.PAGE_FRESH_SECONDS = fresh_seconds
+        server.reset_counts()
+        before = telemetry.snapshot()["counters"]
+        wall, results = await _pass(sets, args.concurrency)
+        after = telemetry.snapshot()["counters"]
+        report[name] = {
+            "wall_seconds": round(wall, 3),
+            "pages_per_second": round(pages / wall, 1) if wall else 0.0,
+            "server_responses": dict(server.status_counts),
+            "server_bytes": server.bytes_sent,
+            "peak_concurrency_per_host": dict(server.peak),
+            "outcomes": _outcome_delta(before, after),
+            "evidence_per_claim": round(sum(len(r) for r in results) / len(results), 2),
+        }
+    report["sample"] = [e.model_dump() for e in results[0][:3]]
+    await retriever.close_http_client()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark web page enrichment against a local fixture server.")
+    parser.add_argument("--claims", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8, help="Claims enriched at once")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Injected server latency per request")
+    parser.add_argument("--paragraphs", type=int, default=40, help="Paragraphs per fixture page")
+    parser.add_argument("--special-every", type=int, default=10, help="Every Nth link is a big / slow / PDF page (0: none)")
+    parser.add_argument("--per-host-limit", type=int, default=web_pages.PAGE_PER_HOST_LIMIT)
+    parser.add_argument("--max-bytes", type=int, default=200_000)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--out", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    web_pages.PAGE_PER_HOST_LIMIT = args.per_host_limit
+    web_pages.PAGE_MAX_BYTES = args.max_bytes
+    web_pages.PAGE_FETCH_TIMEOUT = args.timeout
+    # Throwaway page cache so the cold pass really is cold
+    web_pages._page_cache = SQLiteCache(os.path.join(tempfile.mkdtemp(), "pages.sqlite"))
+    retriever.get_embed_fn()
+
+    server = FixturePageServer(args.latency_ms, args.paragraphs, big_bytes=args.max_bytes * 3, slow_seconds=args.timeout * 2)
+    try:
+        report = asyncio.run(_run(args, server))
+    finally:
+        server.close()
+    report["config"] = {k: v for k, v in vars(args).items() if k != "out"}
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+import json
+import random
+import asyncio
+import argparse
+from collections import defaultdict
+import agent
+import fast_path
+import semantic_cache
+from retriever import search_local_batch
+
+# Offline calibration of the fast-path thresholds (fast_path.py).
+# Every sampled FEVER dev claim goes through the full LLM path with the fast path and caches off.
+# Then, per dense evidence source, we pick the lowest confidence threshold at which "Supported"
+# agrees with the LLM verdict at least --target of the time. Exact matches need no threshold and
+# BM25 is never used for the fast path (fast_path.py), so neither is calibrated.
+
+def _llm_calls(result) -> int:
+    # Local adjudication, plus a second one when the claim fell back to the web
+    if not result.evidence:
+        return 0
+    return 2 if result.source_type and "Web" in result.source_type else 1
+
+def pick_threshold(samples: list, target: float, min_support: int):
+    """samples: (confidence, agrees). Lowest threshold whose covered set meets the target agreement."""
+    best = None
+    ordered = sorted(samples, key=lambda s: s[0], reverse=True)
+    agreeing = 0
+    for n, (confidence, agrees) in enumerate(ordered, start=1):
+        agreeing += agrees
+        # Only cut between distinct confidence values
+        if n < len(ordered) and ordered[n][0] == confidence:
+            continue
+        if n >= min_support and agreeing / n >= target:
+            best = (confidence, n, agreeing / n)
+    return best
+
+async def calibrate(data_file: str, sample: int, target: float, min_support: int, seed: int, max_concurrency: int) -> dict:
+    with open(data_file, "r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    random.Random(seed).shuffle(rows)
+    claims = [row["claim"] for row in rows[:sample]]
+
+    # Full LLM path only: no short-circuits, no cached verdicts
+    fast_path.FAST_VERDICT_ENABLED = False
+    agent.VERDICT_CACHE_ENABLED = False
+    semantic_cache.SEMANTIC_CACHE_ENABLED = False
+
+    print(f"Running {len(claims)} claims through the full LLM path...")
+    local_evidence = search_local_batch(claims)
+    results = await agent.verify_claims(claims, max_concurrency=max_concurrency)
+
+    by_source = defaultdict(list)
+    calls_by_source = defaultdict(list)
+    for evidence, result in zip(local_evidence, results):
+        candidates = [e for e in evidence if e.source in fast_path.DENSE_SOURCES]
+        if not candidates or result.verdict == "Error":
+            continue
+        top = max(candidates, key=lambda e: e.confidence)
+        by_source[top.source].append((top.confidence, result.verdict == "Supported"))
+        calls_by_source[top.source].append((top.confidence, _llm_calls(result)))
+
+    thresholds, report = {}, {}
+    total_calls = sum(_llm_calls(r) for r in results)
+    saved_claims = saved_calls = 0
+    for source, samples in by_source.items():
+        choice = pick_threshold(samples, target, min_support)
+        if choice is None:
+            thresholds[source] = None # never short-circuit on this source
+            report[source] = {"samples": len(samples), "threshold": None}
+            continue
+        threshold, covered, agreement = choice
+        thresholds[source] = threshold
+        calls = sum(c for conf, c in calls_by_source[source] if conf >= threshold)
+        saved_claims += covered
+        saved_calls += calls
+        report[source] = {
+            "samples": len(samples),
+            "threshold": round(threshold, 4),
+            "covered_claims": covered,
+            "agreement": round(agreement, 4),
+            "llm_calls_saved": calls,
+        }
+
+    return {
+        "target_agreement": target,
+        "claims": len(claims),
+        "llm_calls_full_path": total_calls,
+        "fast_path_claims": saved_claims,
+        "llm_calls_saved": saved_calls,
+        "llm_calls_saved_fraction": round(saved_calls / total_calls, 4) if total_calls else 0.0,
+        "sources": report,
+        "thresholds": thresholds,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate fast-path thresholds against the full LLM path.")
+    parser.add_argument("--data", default=os.path.join("data", "fever.jsonl"))
+    parser.add_argument("--sample", type=int, default=500)
+    parser.add_argument("--target", type=float, default=0.98, help="Required agreement with the LLM verdict")
+    parser.add_argument("--min-support", type=int, default=20, help="Minimum claims above a threshold")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--out", default=fast_path.FAST_VERDICT_THRESHOLDS_FILE)
+    args = parser.parse_args()
+
+    summary = asyncio.run(calibrate(args.data, args.sample, args.target, args.min_support, args.seed, args.max_concurrency))
+    print(json.dumps({k: v for k, v in summary.items() if k != "thresholds"}, indent=2))
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    print(f"Thresholds written to {args.out}. Enable with FAST_VERDICT_ENABLED=1.")
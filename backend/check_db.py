@@ -1,11 +1,14 @@
-import chromadb
-from chromadb.utils import embedding_functions
+import retriever
+import embedding_service
 
 def check_count():
-    client = chromadb.PersistentClient(path="./chroma_db")
-    sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
-    collection = client.get_collection(name="fever_facts", embedding_function=sentence_transformer_ef)
+    # Same client, collection name and embedding function as the retriever (or the embedding service)
+    collection = retriever.get_collection()
+    if collection is None:
+        print(f"Collection not available: {retriever.get_init_error()}")
+        return
     print(f"Total documents in collection: {collection.count()}")
+    print(f"Embedding backend: {embedding_service.EMBEDDING_BACKEND}")
 
 if __name__ == "__main__":
     check_count()
@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from embedding_service import create_model_fn
+from onnx_embedder import ONNX_MODEL_DIR, FP32_FILE, INT8_FILE, OnnxEmbeddingFunction
+
+# Parity and speed of the ONNX embedding backend against the current sentence-transformers model.
+# For every exported variant (fp32, int8) and thread count: per-sentence cosine to the reference
+# vectors, agreement of the top-k neighbours within the sample (what retrieval would notice),
+# single-query latency and batched throughput. Exits non-zero when a variant drifts too far.
+
+SAMPLE_SENTENCES = [
+    "The Eiffel Tower is located in Paris.",
+    "Barack Obama was the 44th president of the United States.",
+    "Water boils at 100 degrees Celsius at sea level.",
+    "The Great Wall of China is visible from space with the naked eye.",
+    "Albert Einstein developed the theory of general relativity.",
+    "Mount Everest is the tallest mountain above sea level.",
+    "The Amazon river flows through Brazil.",
+    "Shakespeare wrote Hamlet in the early seventeenth century.",
+]
+
+def _load_sentences(data_file: str, n: int) -> list:
+    if not data_file or not os.path.exists(data_file):
+        return SAMPLE_SENTENCES
+    sentences = []
+    with open(data_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                sentences.append(json.loads(line)["claim"])
+            except Exception:
+                continue
+            if len(sentences) >= n:
+                break
+    return sentences or SAMPLE_SENTENCES
+
+def _embed(fn, sentences: list) -> np.ndarray:
+    return np.asarray(fn(sentences), dtype=np.float32)
+
+def _speed(fn, sentences: list, single_queries: int) -> dict:
+    fn(sentences[:8]) # warm-up
+    latencies = []
+    for sentence in sentences[:single_queries]:
+        start = time.perf_counter()
+        fn([sentence])
+        latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    fn(sentences)
+    batch_seconds = time.perf_counter() - start
+    return {
+        "single_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+        "single_p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 2),
+        "batch_sentences_per_second": round(len(sentences) / batch_seconds, 1) if batch_seconds else 0.0,
+    }
+
+def _neighbours(vectors: np.ndarray, k: int) -> np.ndarray:
+    normed = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    scores = normed @ normed.T
+    np.fill_diagonal(scores, -np.inf)
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def _parity(reference: np.ndarray, candidate: np.ndarray, k: int) -> dict:
+    ref = reference / np.maximum(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12)
+    cand = candidate / np.maximum(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12)
+    cosine = (ref * cand).sum(axis=1)
+    k = min(k, len(reference) - 1)
+    overlap = 0.0
+    if k > 0:
+        ref_nn, cand_nn = _neighbours(reference, k), _neighbours(candidate, k)
+        overlap = float(np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_nn, cand_nn)]))
+    return {
+        "cosine_min": round(float(cosine.min()), 5),
+        "cosine_p1": round(float(np.percentile(cosine, 1)), 5),
+        "cosine_mean": round(float(cosine.mean()), 5),
+        f"neighbour_overlap@{k}": round(overlap, 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Check ONNX embeddings against the sentence-transformers model.")
+    parser.add_argument("--data", default=os.path.join("data", "fever.jsonl"), help="Claims to embed (built-in sample if missing)")
+    parser.add_argument("--sentences", type=int, default=1000)
+    parser.add_argument("--onnx-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--threads", default="0", help="Comma-separated intra-op thread counts to time (0: onnxruntime default)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--single-queries", type=int, default=100)
+    parser.add_argument("--min-cosine", type=float, default=0.995, help="Required worst-case cosine for the fp32 export")
+    parser.add_argument("--min-cosine-int8", type=float, default=0.97, help="Required worst-case cosine for the int8 export")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    sentences = _load_sentences(args.data, args.sentences)
+    print(f"Embedding {len(sentences)} sentences with sentence-transformers (reference)...")
+    reference_fn = create_model_fn("sentence-transformers")
+    reference = _embed(reference_fn, sentences)
+    report = {"sentences": len(sentences), "reference": _speed(reference_fn, sentences, args.single_queries), "variants": []}
+
+    failed = []
+    for name, file, threshold in (("fp32", FP32_FILE, args.min_cosine), ("int8", INT8_FILE, args.min_cosine_int8)):
+        if not os.path.exists(os.path.join(args.onnx_dir, file)):
+            print(f"Skipping {name}: {os.path.join(args.onnx_dir, file)} not found.")
+            continue
+        parity = None
+        for threads in [int(t) for t in args.threads.split(",")]:
+            fn = OnnxEmbeddingFunction(args.onnx_dir, int8=name == "int8", intra_op_threads=threads)
+            if parity is None:
+                parity = _parity(reference, _embed(fn, sentences), args.k)
+                if parity["cosine_min"] < threshold:
+                    failed.append(f"{name}: min cosine {parity['cosine_min']} < {threshold}")
+            report["variants"].append({"variant": name, "threads": threads, **parity, **_speed(fn, sentences, args.single_queries)})
+
+    print(f"{'backend':<26} {'min cos':>8} {'mean cos':>9} {'nn overlap':>10} {'single p50':>11} {'batch/s':>9}")
+    ref = report["reference"]
+    print(f"{'sentence-transformers':<26} {'-':>8} {'-':>9} {'-':>10} {ref['single_p50_ms']:>9}ms {ref['batch_sentences_per_second']:>9}")
+    for v in report["variants"]:
+        overlap = next(value for key, value in v.items() if key.startswith("neighbour_overlap"))
+        label = f"onnx {v['variant']} (threads={v['threads'] or 'auto'})"
+        print(f"{label:<26} {v['cosine_min']:>8} {v['cosine_mean']:>9} {overlap:>10} {v['single_p50_ms']:>9}ms {v['batch_sentences_per_second']:>9}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if failed:
+        print("Parity check FAILED: " + "; ".join(failed))
+        sys.exit(1)
+    if not report["variants"]:
+        print(f"No ONNX export found. Run: python onnx_embedder.py --out {args.onnx_dir}")
+        sys.exit(1)
+    print("Parity check passed.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import os
+import math
+import time
+import random
+import asyncio
+import logging
+import contextvars
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from telemetry import inc, set_gauge, describe
+
+logger = logging.getLogger(__name__)
+
+# End-to-end deadlines for verification. verify_claim opens a Deadline, and every stage below it
+# reads the deadline from the context. Like the telemetry trace, the context follows asyncio tasks
+# and to_thread hops. A stage waits at most min(its STAGE_BUDGETS cap, time left).
+# Upstream calls (LLM, web search) go through call(). It retries with full-jitter exponential
+# backoff, but only while the deadline leaves room for another attempt. Each upstream has a
+# circuit breaker, so a dead dependency fails fast instead of eating every request's budget.
+VERIFY_DEADLINE = float(os.getenv("VERIFY_DEADLINE", "30"))
+STAGE_BUDGETS = {
+    "local_search": float(os.getenv("LOCAL_SEARCH_BUDGET", "5")),
+    "web_search": float(os.getenv("WEB_SEARCH_BUDGET", "8")),
+    "web_enrich": float(os.getenv("WEB_ENRICH_BUDGET", "6")),
+    "adjudicate": float(os.getenv("ADJUDICATE_BUDGET", "20")),
+}
+UPSTREAM_MAX_ATTEMPTS = int(os.getenv("UPSTREAM_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.25"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "2"))
+# No attempt is started with less time than this left
+MIN_ATTEMPT_SECONDS = float(os.getenv("MIN_ATTEMPT_SECONDS", "0.5"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+T = TypeVar("T")
+
+describe("upstream_retries_total", "Upstream calls retried after a failure or stage timeout.")
+describe("upstream_failures_total", "Upstream calls that failed for good, by reason.")
+describe("circuit_rejections_total", "Upstream calls refused because the circuit breaker was open.")
+describe("circuit_open", "1 while an upstream's circuit breaker is open or half-open.")
+describe("deadline_exceeded_total", "Stages cut short by the claim deadline or their own budget.")
+
+class StageUnavailable(Exception):
+    """A stage could not produce its result: out of time, or its upstream is known to be down."""
+
+class DeadlineExceeded(StageUnavailable):
+    pass
+
+class CircuitOpen(StageUnavailable):
+    pass
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar("verification_deadline", default=None)
+
+def start_deadline(seconds: Optional[float]) -> contextvars.Token:
+    """Sets the deadline for the current claim (this task and its children). None: stage caps only."""
+    return _current_deadline.set(Deadline(seconds) if seconds is not None else None)
+
+def end_deadline(token: contextvars.Token):
+    try:
+        _current_deadline.reset(token)
+    except ValueError:
+        pass # ended from another context (abandoned async generator)
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+def stage_timeout(stage: str) -> float:
+    """Seconds the stage may take: its budget, capped by the time left on the claim."""
+    budget = STAGE_BUDGETS.get(stage, float("inf"))
+    deadline = current_deadline()
+    return min(budget, deadline.remaining()) if deadline is not None else budget
+
+def wait_timeout(timeout: float) -> Optional[float]:
+    return None if math.isinf(timeout) else timeout
+
+def check_time(stage: str) -> float:
+    """stage_timeout, or DeadlineExceeded when it is too short to start anything."""
+    timeout = stage_timeout(stage)
+    if timeout < MIN_ATTEMPT_SECONDS:
+        inc("deadline_exceeded_total", stage=stage)
+        raise DeadlineExceeded(f"no time left for {stage}")
+    return timeout
+
+async def within(stage: str, awaitable: Awaitable[T]) -> T:
+    """Awaits a stage under its time budget; DeadlineExceeded when it runs over."""
+    try:
+        timeout = check_time(stage)
+    except DeadlineExceeded:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close() # never started
+        raise
+    try:
+        return await asyncio.wait_for(awaitable, wait_timeout(timeout))
+    except asyncio.TimeoutError:
+        inc("deadline_exceeded_total", stage=stage)
+        raise DeadlineExceeded(f"{stage} did not finish within {timeout:.1f}s")
+
+class CircuitBreaker:
+    """Closed until failure_threshold consecutive failures, then open (calls refused) for
+    reset_seconds, then half-open: a single trial call decides whether it closes again."""
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = "half_open"
+            self._trial_in_flight = False
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info("Circuit for %s closed again.", self.name)
+        self.state = "closed"
+        self.failures = 0
+        self._trial_in_flight = False
+        set_gauge("circuit_open", 0, upstream=self.name)
+
+    def release(self):
+        """Gives the half-open trial back when the call was abandoned without an outcome."""
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning("Circuit for %s opened after %d consecutive failures.", self.name, self.failures)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+            set_gauge("circuit_open", 1, upstream=self.name)
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+LLM_BREAKER = CircuitBreaker("llm")
+SEARCH_BREAKER = CircuitBreaker("web_search")
+
+def acquire(stage: str, breaker: CircuitBreaker) -> float:
+    """Admission for one upstream attempt: returns its timeout, or raises DeadlineExceeded / CircuitOpen."""
+    timeout = check_time(stage)
+    if not breaker.allow():
+        inc("circuit_rejections_total", upstream=breaker.name)
+        raise CircuitOpen(f"{breaker.name} is unavailable (circuit open)")
+    return timeout
+
+def _backoff(attempt: int) -> float:
+    # Full jitter: spreads the retries of concurrent claims hitting the same failing upstream
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+async def call(stage: str, breaker: CircuitBreaker, fn: Callable[[], Awaitable[T]],
+               retryable: Callable[[Exception], bool] = lambda e: True) -> T:
+    """Runs fn() under the stage budget, retrying failures while time remains.
+
+    Raises CircuitOpen when the upstream is known to be down, DeadlineExceeded when the time
+    runs out (or the last attempt timed out), and otherwise the last error.
+    """
+    attempt = 0
+    while True:
+        timeout = acquire(stage, breaker)
+        try:
+            result = await asyncio.wait_for(fn(), wait_timeout(timeout))
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            timed_out = isinstance(e, asyncio.TimeoutError)
+            if timed_out or retryable(e):
+                breaker.record_failure()
+            else:
+                # The upstream answered (e.g. a 4xx); the request itself was bad
+                breaker.record_success()
+                raise
+            attempt += 1
+            delay = _backoff(attempt)
+            deadline = current_deadline()
+            out_of_time = deadline is not None and deadline.remaining() < delay + MIN_ATTEMPT_SECONDS
+            if attempt >= UPSTREAM_MAX_ATTEMPTS or out_of_time or breaker.state == "open":
+                inc("upstream_failures_total", upstream=breaker.name, reason="timeout" if timed_out else "error")
+                if timed_out:
+                    inc("deadline_exceeded_total", stage=stage)
+                    raise DeadlineExceeded(f"{stage} did not answer within {timeout:.1f}s") from e
+                raise
+            inc("upstream_retries_total", upstream=breaker.name)
+            logger.warning("%s attempt %d failed (%s). Retrying in %.2fs.", stage, attempt, "timeout" if timed_out else e, delay)
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+def get_breaker_stats() -> Dict[str, dict]:
+    return {breaker.name: breaker.stats() for breaker in (LLM_BREAKER, SEARCH_BREAKER)}
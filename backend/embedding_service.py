@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import queue
+import base64
+import logging
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List
+import numpy as np
+import requests
+from startup import timed
+import telemetry
+
+# One MiniLM per machine instead of one per process, and micro-batching across callers.
+#
+# In-process: MicroBatchEmbedder runs the model on a single worker thread. Concurrent encode calls
+# (search_local from several request threads, ingest embed workers, the semantic cache, ...) are
+# queued and merged into one model call, waiting at most EMBED_MAX_WAIT_MS after the first request
+# for others to join (up to EMBED_MAX_BATCH texts). Requests that arrive while the model is busy
+# are merged into the next batch even with a zero wait.
+#
+# Shared service: `python embedding_service.py --port 8100` serves the same batcher over HTTP.
+# Processes started with EMBEDDING_SERVICE_URL=http://host:8100 then never load the model themselves.
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+# "sentence-transformers" (PyTorch) or "onnx" (exported model on onnxruntime, see onnx_embedder.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers").lower()
+EMBEDDING_SERVICE_URL = os.getenv("EMBEDDING_SERVICE_URL", "").rstrip("/")
+EMBEDDING_SERVICE_TIMEOUT = float(os.getenv("EMBEDDING_SERVICE_TIMEOUT", "30"))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+QUEUE_SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+telemetry.describe("embed_batch_size", "Texts per model call made by the embedding batcher.")
+telemetry.describe("embed_requests_per_batch", "Caller requests merged into one model call.")
+telemetry.describe("embed_queue_seconds", "Time an encode request waited before its batch started.")
+
+_model_fn = None
+_embedder = None
+_lock = threading.RLock()
+
+def create_model_fn(backend: str = EMBEDDING_BACKEND):
+    """A new embedding function for the given backend (same model, same vectors up to rounding)."""
+    if backend == "onnx":
+        from onnx_embedder import OnnxEmbeddingFunction
+        return OnnxEmbeddingFunction()
+    if backend != "sentence-transformers":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}' (expected sentence-transformers or onnx)")
+    from chromadb.utils import embedding_functions
+    return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=EMBEDDING_MODEL_NAME)
+
+def load_model_fn():
+    """The EMBEDDING_BACKEND embedding function (model loaded once per process)."""
+    global _model_fn
+    if _model_fn is None:
+        with _lock:
+            if _model_fn is None:
+                with timed("embedding model"):
+                    _model_fn = create_model_fn()
+                logger.info("Embedding backend: %s", EMBEDDING_BACKEND)
+    return _model_fn
+
+class _Request:
+    __slots__ = ("texts", "future", "enqueued_at")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+class MicroBatchEmbedder:
+    """Embedding function (Chroma's `__call__(input)` protocol) that batches concurrent callers."""
+
+    def __init__(self, encode, max_batch: int = EMBED_MAX_BATCH, max_wait_ms: float = EMBED_MAX_WAIT_MS):
+        self.encode = encode
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.stats = {"requests": 0, "texts": 0, "batches": 0, "batch_sizes": {}}
+        self._queue_ms = deque(maxlen=10000)
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def __call__(self, input: List[str]):
+        if not input:
+            return []
+        request = _Request(list(input))
+        self._queue.put(request)
+        return request.future.result()
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = batch[0].enqueued_at + self.max_wait
+        # A single oversized request (e.g. an ingestion batch) is never split
+        while size < self.max_batch:
+            try:
+                timeout = deadline - time.perf_counter()
+                request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            texts = [text for request in batch for text in request.texts]
+            self._record(batch, started)
+            try:
+                vectors = self.encode(texts)
+            except BaseException as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            offset = 0
+            for request in batch:
+                request.future.set_result(vectors[offset:offset + len(request.texts)])
+                offset += len(request.texts)
+
+    def _record(self, batch: List[_Request], started: float):
+        size = sum(len(r.texts) for r in batch)
+        telemetry.observe("embed_batch_size", size, buckets=BATCH_SIZE_BUCKETS)
+        telemetry.observe("embed_requests_per_batch", len(batch), buckets=BATCH_SIZE_BUCKETS)
+        bucket = next((b for b in BATCH_SIZE_BUCKETS if size <= b), "more")
+        with self._stats_lock:
+            self.stats["requests"] += len(batch)
+            self.stats["texts"] += size
+            self.stats["batches"] += 1
+            self.stats["batch_sizes"][bucket] = self.stats["batch_sizes"].get(bucket, 0) + 1
+            for request in batch:
+                waited = started - request.enqueued_at
+                telemetry.observe("embed_queue_seconds", waited, buckets=QUEUE_SECONDS_BUCKETS)
+                self._queue_ms.append(waited * 1000)
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            stats = {k: (dict(v) if isinstance(v, dict) else v) for k, v in self.stats.items()}
+            waits = sorted(self._queue_ms)
+        stats["batch_sizes"] = {f"<={k}" if k != "more" else f">{BATCH_SIZE_BUCKETS[-1]}": n for k, n in stats["batch_sizes"].items()}
+        stats["mean_batch_size"] = round(stats["texts"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["requests_per_batch"] = round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["queue_ms"] = {
+            "p50": round(waits[len(waits) // 2], 3) if waits else 0.0,
+            "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+            "max": round(waits[-1], 3) if waits else 0.0,
+        }
+        stats["max_batch"] = self.max_batch
+        stats["max_wait_ms"] = self.max_wait * 1000
+        stats["backend"] = EMBEDDING_BACKEND
+        return stats
+
+class RemoteEmbedder:
+    """Embedding function backed by a shared embedding service process (see serve)."""
+
+    def __init__(self, url: str = EMBEDDING_SERVICE_URL, timeout: float = EMBEDDING_SERVICE_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        # One keep-alive session per calling thread
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def __call__(self, input: List[str]):
+        if not input:
+            return []
+        response = self._session().post(f"{self.url}/embed", json={"texts": list(input)}, timeout=self.timeout)
+        response.raise_for_status()
+        return decode_vectors(response.json())
+
+    def get_stats(self) -> dict:
+        response = self._session().get(f"{self.url}/stats", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+def encode_vectors(vectors) -> dict:
+    array = np.asarray(vectors, dtype=np.float32)
+    return {"shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+def decode_vectors(payload: dict) -> List[np.ndarray]:
+    array = np.frombuffer(base64.b64decode(payload["data"]), dtype=np.float32).reshape(payload["shape"])
+    return list(array)
+
+def get_embedder():
+    """The process-wide embedding function: remote when EMBEDDING_SERVICE_URL is set, else in-process."""
+    global _embedder
+    if _embedder is None:
+        with _lock:
+            if _embedder is None:
+                if EMBEDDING_SERVICE_URL:
+                    _embedder = RemoteEmbedder(EMBEDDING_SERVICE_URL)
+                else:
+                    _embedder = MicroBatchEmbedder(load_model_fn())
+    return _embedder
+
+def collection_embedding_function():
+    """What Chroma collections are opened with.
+
+    In-process this is the model's own embedding function (the one the collections were created
+    with); with a remote service it is the client, so the model is never loaded here. Either way
+    our code embeds explicitly through get_embedder() and passes vectors to Chroma.
+    """
+    return get_embedder() if EMBEDDING_SERVICE_URL else load_model_fn()
+
+def get_embedding_stats() -> dict:
+    """Batching stats of the embedder in use (the shared service's, in remote mode)."""
+    if _embedder is None and not EMBEDDING_SERVICE_URL:
+        return {} # model not loaded yet
+    try:
+        return get_embedder().get_stats()
+    except Exception as e:
+        return {"error": str(e)}
+
+def serve(host: str = "127.0.0.1", port: int = 8100, max_batch: int = EMBED_MAX_BATCH,
+          max_wait_ms: float = EMBED_MAX_WAIT_MS) -> ThreadingHTTPServer:
+    """Serves POST /embed ({"texts": [...]}), GET /stats and GET /metrics; one thread per connection,
+    all feeding the same in-process batcher."""
+    embedder = MicroBatchEmbedder(load_model_fn(), max_batch, max_wait_ms)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status: int, body: bytes, content_type: str = "application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if self.path != "/embed":
+                self._reply(404, b"{}")
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                vectors = embedder(payload["texts"])
+                self._reply(200, json.dumps(encode_vectors(vectors)).encode("utf-8"))
+            except Exception as e:
+                logger.error("Embedding request failed: %s", e)
+                self._reply(500, json.dumps({"error": str(e)}).encode("utf-8"))
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._reply(200, json.dumps(embedder.get_stats()).encode("utf-8"))
+            elif self.path == "/metrics":
+                self._reply(200, telemetry.render_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+            else:
+                self._reply(404, b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared embedding service (one model, micro-batched across processes).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--max-batch", type=int, default=EMBED_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=EMBED_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s: %(message)s")
+    server = serve(args.host, args.port, args.max_batch, args.max_wait_ms)
+    logger.info("Embedding service (%s) listening on http://%s:%d", EMBEDDING_MODEL_NAME, args.host, args.port)
+    server.serve_forever()
@@ -0,0 +1,145 @@
+import os
+import threading
+from typing import List, Optional, Tuple
+from models import Evidence
+from lexical_index import tokenize
+from cache import normalize_text
+from startup import timed
+from telemetry import inc, observe, describe, SIZE_BUCKETS
+
+# Evidence budgeter, run by the Adjudicator before every prompt: drops system/error placeholders,
+# removes near-duplicates, optionally reranks with a cross-encoder, and packs the best items into
+# EVIDENCE_TOKEN_BUDGET prompt tokens. Token counts are estimates (no Gemini tokenizer offline).
+EVIDENCE_BUDGET_ENABLED = os.getenv("EVIDENCE_BUDGET_ENABLED", "1") == "1"
+EVIDENCE_TOKEN_BUDGET = int(os.getenv("EVIDENCE_TOKEN_BUDGET", "600"))
+# Cross-encoder reranking is opt-in: it loads a second model. Without it, items keep confidence order.
+EVIDENCE_RERANK = os.getenv("EVIDENCE_RERANK", "0") == "1"
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+
+CHARS_PER_TOKEN = 4
+# Token overlap above which two items count as the same evidence
+DEDUPE_JACCARD = 0.8
+DEDUPE_CONTAINMENT = 0.9
+# Do not bother truncating an item into less room than this
+MIN_TRUNCATED_TOKENS = 40
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+describe("evidence_tokens_saved_total", "Estimated prompt tokens removed by the evidence budgeter.")
+describe("evidence_items_dropped_total", "Evidence items removed before adjudication, by reason.")
+describe("evidence_prompt_tokens", "Estimated evidence tokens per adjudicated claim after budgeting.")
+
+def evidence_line(e: Evidence) -> str:
+    """How one evidence item appears in the adjudication prompt."""
+    return f"- [{e.source}] (Conf: {e.confidence:.2f}) {e.text}"
+
+def estimate_tokens(text: str) -> int:
+    return max(1, round(len(text) / CHARS_PER_TOKEN))
+
+def is_placeholder(e: Evidence) -> bool:
+    # "Local DB not initialized.", search / vector DB errors: nothing the LLM can judge against
+    return e.source.startswith("System")
+
+def _is_duplicate(a: set, b: set) -> bool:
+    if not a or not b:
+        return a == b
+    shared = len(a & b)
+    return shared / len(a | b) >= DEDUPE_JACCARD or shared / min(len(a), len(b)) >= DEDUPE_CONTAINMENT
+
+def dedupe(evidence: List[Evidence]) -> List[Evidence]:
+    """Keeps the most confident item of each near-duplicate group, in the original order."""
+    order = sorted(range(len(evidence)), key=lambda i: -evidence[i].confidence)
+    kept, kept_terms = [], []
+    for i in order:
+        terms = set(tokenize(evidence[i].text)) or {normalize_text(evidence[i].text)}
+        if any(_is_duplicate(terms, other) for other in kept_terms):
+            continue
+        kept.append(i)
+        kept_terms.append(terms)
+    return [evidence[i] for i in sorted(kept)]
+
+def _get_reranker():
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                with timed("reranker model"):
+                    from sentence_transformers import CrossEncoder
+                    _reranker = CrossEncoder(RERANKER_MODEL, device="cpu")
+    return _reranker
+
+def rerank_many(claims: List[str], evidence_lists: List[List[Evidence]]) -> List[List[Evidence]]:
+    """Orders every claim's evidence by cross-encoder relevance, scoring all pairs in shared batches."""
+    pairs = [(claim, e.text) for claim, evidence in zip(claims, evidence_lists) for e in evidence]
+    if not pairs:
+        return evidence_lists
+    scores = iter(_get_reranker().predict(pairs, batch_size=RERANK_BATCH_SIZE, show_progress_bar=False))
+    ranked = []
+    for evidence in evidence_lists:
+        scored = [(float(next(scores)), n, e) for n, e in enumerate(evidence)]
+        ranked.append([e for _, _, e in sorted(scored, key=lambda s: (-s[0], s[1]))])
+    return ranked
+
+def _truncate(e: Evidence, tokens: int) -> Evidence:
+    room = max(0, tokens * CHARS_PER_TOKEN - len(evidence_line(e)) + len(e.text) - 1)
+    text = e.text[:room]
+    if " " in text:
+        text = text[:text.rindex(" ")]
+    return e.model_copy(update={"text": text + "…"})
+
+def pack(evidence: List[Evidence], budget: int) -> Tuple[List[Evidence], int]:
+    """Greedy fill of the token budget in ranked order. Returns (packed items, number truncated).
+
+    An item that does not fit is truncated when enough room is left; the first item is always kept.
+    """
+    packed, used, truncated = [], 0, 0
+    for e in evidence:
+        cost = estimate_tokens(evidence_line(e))
+        if used + cost <= budget:
+            packed.append(e)
+            used += cost
+        elif budget - used >= MIN_TRUNCATED_TOKENS or not packed:
+            packed.append(_truncate(e, max(budget - used, MIN_TRUNCATED_TOKENS)))
+            truncated += 1
+            used = budget
+    return packed, truncated
+
+def budget_many(claims: List[str], evidence_lists: List[List[Evidence]], budget: Optional[int] = None) -> List[Tuple[List[Evidence], dict]]:
+    """Budgeted evidence plus a report (tokens before/after/saved, items removed) for each claim."""
+    budget = EVIDENCE_TOKEN_BUDGET if budget is None else budget
+    cleaned, reports = [], []
+    for evidence in evidence_lists:
+        usable = [e for e in evidence if not is_placeholder(e)]
+        unique = dedupe(usable)
+        cleaned.append(unique)
+        reports.append({
+            "items_before": len(evidence),
+            "dropped_system": len(evidence) - len(usable),
+            "duplicates": len(usable) - len(unique),
+            "tokens_before": sum(estimate_tokens(evidence_line(e)) for e in evidence),
+        })
+    if EVIDENCE_RERANK:
+        cleaned = rerank_many(claims, cleaned)
+    else:
+        cleaned = [sorted(evidence, key=lambda e: -e.confidence) for evidence in cleaned]
+
+    results = []
+    for evidence, report in zip(cleaned, reports):
+        packed, truncated = pack(evidence, budget)
+        report["truncated"] = truncated
+        report["items_after"] = len(packed)
+        report["tokens_after"] = sum(estimate_tokens(evidence_line(e)) for e in packed)
+        report["tokens_saved"] = max(0, report["tokens_before"] - report["tokens_after"])
+
+        inc("evidence_tokens_saved_total", report["tokens_saved"])
+        observe("evidence_prompt_tokens", report["tokens_after"], buckets=SIZE_BUCKETS)
+        for reason in ("dropped_system", "duplicates"):
+            if report[reason]:
+                inc("evidence_items_dropped_total", report[reason], reason=reason)
+        dropped_by_budget = len(evidence) - len(packed)
+        if dropped_by_budget:
+            inc("evidence_items_dropped_total", dropped_by_budget, reason="budget")
+        results.append((packed, report))
+    return results
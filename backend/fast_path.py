@@ -0,0 +1,73 @@
+import os
+import json
+import logging
+from typing import Optional
+from models import VerificationResult, Evidence
+
+logger = logging.getLogger(__name__)
+
+# The local store only holds FEVER SUPPORTS claims, so a near-identical hit means "Supported"
+# without asking the LLM. Only two kinds of evidence qualify: an exact match of the normalized
+# claim text, and dense (cosine) hits above the per-source threshold that calibrate_fast_path.py
+# wrote. BM25 overlap ignores word order ("A succeeded B" vs "B succeeded A"), and uncalibrated
+# sources have no known error rate, so neither ever skips the LLM.
+FAST_VERDICT_ENABLED = os.getenv("FAST_VERDICT_ENABLED", "0") == "1"
+FAST_VERDICT_THRESHOLDS_FILE = os.getenv("FAST_VERDICT_THRESHOLDS_FILE", "fast_path_thresholds.json")
+
+FAST_PATH_SOURCE_TYPE = "Local (Fast Path)"
+EXACT_MATCH_SOURCE = "Local (Exact Match)"
+DENSE_SOURCES = {"Local (ChromaDB)", "Local (Mmap Index)"}
+
+FAST_PATH_STATS = {"checked": 0, "hits": 0}
+
+_thresholds: Optional[dict] = None
+
+def load_thresholds() -> dict:
+    """{evidence source: minimum confidence}, from the calibration file if present."""
+    global _thresholds
+    if _thresholds is None:
+        _thresholds = {}
+        if os.path.exists(FAST_VERDICT_THRESHOLDS_FILE):
+            try:
+                with open(FAST_VERDICT_THRESHOLDS_FILE, "r", encoding="utf-8") as f:
+                    _thresholds = json.load(f).get("thresholds", {})
+            except Exception as e:
+                logger.error("Fast Path Config Error: %s", e)
+    return _thresholds
+
+def threshold_for(source: str) -> Optional[float]:
+    """Minimum confidence for a fast verdict from this source, or None: never short-circuit on it."""
+    if source == EXACT_MATCH_SOURCE:
+        return 1.0
+    if source not in DENSE_SOURCES:
+        return None
+    # Missing or a calibrated null: no threshold we can trust
+    return load_thresholds().get(source)
+
+def fast_verdict(claim: str, local_evidence: list[Evidence]) -> Optional[VerificationResult]:
+    """A Supported verdict straight from high-similarity local evidence, or None to run the LLM."""
+    FAST_PATH_STATS["checked"] += 1
+    qualifying = [
+        (e, threshold) for e, threshold in ((e, threshold_for(e.source)) for e in local_evidence)
+        if threshold is not None and e.confidence >= threshold
+    ]
+    if not qualifying:
+        return None
+    top, threshold = max(qualifying, key=lambda item: item[0].confidence)
+
+    FAST_PATH_STATS["hits"] += 1
+    return VerificationResult(
+        claim=claim,
+        verdict="Supported",
+        reasoning=(
+            f"Fast-path verdict (no LLM): the claim matches a verified FEVER fact with confidence "
+            f"{top.confidence:.2f} (threshold {threshold:.2f} for {top.source}): \"{top.text}\""
+        ),
+        evidence=local_evidence,
+        source_type=FAST_PATH_SOURCE_TYPE
+    )
+
+def get_fast_path_stats() -> dict:
+    stats = dict(FAST_PATH_STATS)
+    stats["hit_rate"] = stats["hits"] / stats["checked"] if stats["checked"] else 0.0
+    return stats
@@ -1,98 +1,357 @@
 import os
 import json
+import time
+import queue
+import hashlib
+import logging
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
 import requests
 import chromadb
-from chromadb.utils import embedding_functions
 from tqdm import tqdm
+from verdict_cache import invalidate_verdict_cache
+from semantic_cache import invalidate_semantic_cache
+from lexical_index import LEXICAL_INDEX_DIR, SegmentWriter, build_from_collection, index_exists
+from vector_index import INDEX_DIR, refresh_export
+import retriever
+import embedding_service
+
+logger = logging.getLogger(__name__)
 
 DATA_DIR = "data"
 DATA_FILE = os.path.join(DATA_DIR, "fever.jsonl")
 URL = "https://fever.ai/download/fever/shared_task_dev.jsonl"
 CHROMA_DB_PATH = "chroma_db"
 COLLECTION_NAME = "fever-facts"
+CHECKPOINT_FILE = os.path.join(CHROMA_DB_PATH, "ingest_checkpoint.json")
+
+# Pipeline tuning: rows per batch, parallel embedding workers, max batches buffered between stages
+BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500")) # ChromaDB handles batches well
+EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "2"))
+QUEUE_DEPTH = int(os.getenv("INGEST_QUEUE_DEPTH", "4"))
 
 def download_data():
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
     
     if os.path.exists(DATA_FILE):
-        print(f"Dataset already exists at {DATA_FILE}")
+        logger.info("Dataset already exists at %s", DATA_FILE)
         return
 
-    print(f"Downloading dataset from {URL}...")
+    logger.info("Downloading dataset from %s...", URL)
     response = requests.get(URL, stream=True)
     
     with open(DATA_FILE, 'wb') as f:
         for chunk in response.iter_content(chunk_size=8192):
             f.write(chunk)
-    print("Download complete.")
+    logger.info("Download complete.")
+
+def _content_hash(text: str, label: str) -> str:
+    return hashlib.sha1(f"{label}\x1f{text}".encode("utf-8")).hexdigest()
+
+def _parse_record(data: dict) -> List[tuple]:
+    """Turns one JSON line into (id, document, metadata) rows.
+
+    Supports the FEVER claim files (only SUPPORTS claims are stored as facts) and the
+    FEVER wiki-pages dump (one row per evidence sentence).
+    """
+    if "claim" in data:
+        if data.get("label") != "SUPPORTS":
+            return []
+        claim = data["claim"]
+        return [(str(data["id"]), claim, {"source": "FEVER", "label": data["label"], "text": claim})]
+
+    if "lines" in data:
+        rows = []
+        page = data["id"]
+        for line in data["lines"].split("\n"):
+            parts = line.split("\t")
+            if len(parts) < 2 or not parts[1].strip():
+                continue
+            sentence = parts[1].strip()
+            rows.append((f"{page}:{parts[0]}", sentence, {"source": "FEVER-wiki", "label": "SUPPORTS", "page": page, "text": sentence}))
+        return rows
+
+    return []
+
+def _list_data_files(path: str) -> List[str]:
+    # A single jsonl file, or a directory of them (e.g. wiki-pages/wiki-001.jsonl ...)
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".jsonl"))
+    return [path]
+
+def _load_checkpoint(files: List[str]) -> dict:
+    if not os.path.exists(CHECKPOINT_FILE):
+        return {"file_index": 0, "offset": 0}
+    try:
+        with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if checkpoint.get("files") == files:
+            return checkpoint
+        logger.warning("Checkpoint belongs to a different dataset. Starting from the beginning.")
+    except Exception as e:
+        logger.warning("Ignoring unreadable checkpoint: %s", e)
+    return {"file_index": 0, "offset": 0}
+
+def _save_checkpoint(files: List[str], file_index: int, offset: int, rows: int):
+    os.makedirs(os.path.dirname(CHECKPOINT_FILE), exist_ok=True)
+    tmp_path = CHECKPOINT_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"files": files, "file_index": file_index, "offset": offset, "rows_done": rows}, f)
+    os.replace(tmp_path, CHECKPOINT_FILE)
+
+class _StageStats:
+    """Rows handled and busy time for one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, rows: int, seconds: float):
+        with self._lock:
+            self.rows += rows
+            self.seconds += seconds
 
-def ingest_data():
-    download_data()
+    def report(self) -> dict:
+        return {
+            "rows": self.rows,
+            "busy_seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows / self.seconds, 1) if self.seconds else 0.0,
+        }
 
-    print("Initializing ChromaDB...")
+def _read_batches(files: List[str], checkpoint: dict, batch_size: int, stats: _StageStats, malformed: List[int]) -> Iterator[dict]:
+    """Streams batches of parsed rows, each tagged with the file position right after its last line."""
+    rows = []
+    start = time.perf_counter()
+    for file_index in range(checkpoint["file_index"], len(files)):
+        with open(files[file_index], "rb") as f:
+            if file_index == checkpoint["file_index"] and checkpoint["offset"]:
+                f.seek(checkpoint["offset"])
+            while True:
+                line = f.readline()
+                if not line:
+                    break
+                try:
+                    rows.extend(_parse_record(json.loads(line)))
+                except Exception:
+                    malformed[0] += 1 # Skip malformed lines
+                if len(rows) >= batch_size:
+                    stats.add(len(rows), time.perf_counter() - start)
+                    yield {"rows": rows, "file_index": file_index, "offset": f.tell()}
+                    rows = []
+                    start = time.perf_counter()
+            position = f.tell()
+    if rows:
+        stats.add(len(rows), time.perf_counter() - start)
+        yield {"rows": rows, "file_index": len(files) - 1, "offset": position}
+
+def ingest_data(data_path: str = DATA_FILE, resume: bool = True, embed_workers: int = EMBED_WORKERS, batch_size: int = BATCH_SIZE) -> dict:
+    """Streams the dataset through parse -> embed (worker pool) -> upsert, with the stages overlapping.
+
+    Rows whose content hash is already stored are skipped, and a checkpoint lets an interrupted
+    run resume where it stopped. Memory stays bounded by QUEUE_DEPTH batches per stage.
+    """
+    if data_path == DATA_FILE:
+        download_data()
+
+    logger.info("Initializing ChromaDB...")
     client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
     
-    # Use accurate embedding model
-    ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
+    # Same model as the retriever; embed workers share its batcher (or the embedding service)
+    ef = embedding_service.collection_embedding_function()
+    embed = embedding_service.get_embedder()
     
-    # Get or create collection
+    # Get or create collection (existing rows are kept; unchanged ones are skipped by content hash)
     try:
         collection = client.get_collection(name=COLLECTION_NAME, embedding_function=ef)
-        print(f"Collection '{COLLECTION_NAME}' already exists. Appending strictly new data is tricky without ID checks. For now, we assume clean slate or overwrite logic if needed.")
-        # Optional: client.delete_collection(COLLECTION_NAME) to start fresh
-    except:
-        print(f"Creating collection '{COLLECTION_NAME}'...")
+        logger.info("Collection '%s' already exists. Only new or changed records will be embedded.", COLLECTION_NAME)
+    except Exception:
+        logger.info("Creating collection '%s'...", COLLECTION_NAME)
         collection = client.create_collection(name=COLLECTION_NAME, embedding_function=ef)
 
-    print(f"Processing {DATA_FILE}...")
-    
-    batch_size = 500 # ChromaDB handles batches well
-    documents = []
-    metadatas = []
-    ids = []
-    
-    count = 0
-    total_processed = 0
-    
-    # Count total lines for progress bar (optional, but good for UX)
-    # total_lines = sum(1 for _ in open(DATA_FILE, 'r', encoding='utf-8')) 
-    
-    with open(DATA_FILE, 'r', encoding='utf-8') as f:
-        for line in tqdm(f, desc="Ingesting facts"):
-            try:
-                data = json.loads(line)
-                # Only store SUPPORTED claims as "facts"
-                if data['label'] == 'SUPPORTS':
-                    documents.append(data['claim'])
-                    metadatas.append({"source": "FEVER", "label": data['label'], "text": data['claim']})
-                    ids.append(str(data['id']))
-                    count += 1
-                    
-                    if count >= batch_size:
-                        collection.upsert(
-                            documents=documents,
-                            metadatas=metadatas,
-                            ids=ids
-                        )
-                        total_processed += count
-                        documents = []
-                        metadatas = []
-                        ids = []
-                        count = 0
-            except Exception as e:
-                pass # Skip malformed lines
-
-    # Upsert remaining
-    if documents:
-        collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
-        total_processed += count
-
-    print(f"Ingestion complete! Total facts stored: {total_processed}")
+    files = _list_data_files(data_path)
+    checkpoint = _load_checkpoint(files) if resume else {"file_index": 0, "offset": 0}
+    if checkpoint["offset"] or checkpoint["file_index"]:
+        logger.info("Resuming from checkpoint: file %s/%s, byte %s", checkpoint['file_index'] + 1, len(files), checkpoint['offset'])
+    logger.info("Processing %s...", data_path)
+
+    # Lexical index: upserted rows are appended as segments as they are stored. Only a collection
+    # that already has rows but no index yet needs the one-off full build after the run.
+    lexical_writer = SegmentWriter(LEXICAL_INDEX_DIR) if index_exists(LEXICAL_INDEX_DIR) or collection.count() == 0 else None
+
+    parse_stats, embed_stats, upsert_stats = _StageStats("parse"), _StageStats("embed"), _StageStats("upsert")
+    skipped = [0]
+    malformed = [0]
+    wall_start = time.perf_counter()
+
+    def _embed(batch: dict) -> dict:
+        start = time.perf_counter()
+        rows = batch["rows"]
+        # Content-hash check: skip rows already stored with identical text
+        rows = list({row[0]: row for row in rows}.values()) # last one wins for duplicate IDs
+        existing = collection.get(ids=[row[0] for row in rows], include=["metadatas"])
+        stored = {i: (m or {}).get("content_hash") for i, m in zip(existing["ids"], existing["metadatas"])}
+        fresh = []
+        for row_id, document, metadata in rows:
+            content_hash = _content_hash(document, metadata.get("label", ""))
+            if stored.get(row_id) == content_hash:
+                continue
+            fresh.append((row_id, document, {**metadata, "content_hash": content_hash}))
+        skipped[0] += len(rows) - len(fresh)
+        batch["rows"] = fresh
+        batch["embeddings"] = embed([row[1] for row in fresh]) if fresh else []
+        embed_stats.add(len(fresh), time.perf_counter() - start)
+        return batch
+
+    # Stage 1: parsing runs in its own thread, feeding a bounded queue
+    parsed: "queue.Queue" = queue.Queue(maxsize=QUEUE_DEPTH)
+    embedded: "queue.Queue" = queue.Queue(maxsize=QUEUE_DEPTH)
+    errors: List[BaseException] = []
+    done = object()
+    # Set on the first error: the parser stops reading instead of parsing the rest of the corpus
+    stop = threading.Event()
+
+    def _parse_stage():
+        try:
+            for batch in _read_batches(files, checkpoint, batch_size, parse_stats, malformed):
+                if stop.is_set():
+                    break
+                parsed.put(batch)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            parsed.put(done)
+
+    # Stage 3: a single writer upserts in file order and advances the checkpoint
+    def _upsert_stage():
+        progress = tqdm(desc="Ingesting facts", unit="rows")
+        try:
+            while True:
+                batch = embedded.get()
+                if batch is done:
+                    break
+                if batch["rows"]:
+                    start = time.perf_counter()
+                    collection.upsert(
+                        ids=[row[0] for row in batch["rows"]],
+                        documents=[row[1] for row in batch["rows"]],
+                        metadatas=[row[2] for row in batch["rows"]],
+                        embeddings=batch["embeddings"]
+                    )
+                    upsert_stats.add(len(batch["rows"]), time.perf_counter() - start)
+                    progress.update(len(batch["rows"]))
+                    if lexical_writer is not None:
+                        lexical_writer.add([row[0] for row in batch["rows"]], [row[1] for row in batch["rows"]])
+                _save_checkpoint(files, batch["file_index"], batch["offset"], upsert_stats.rows)
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+            # Keep draining so the producer never blocks on a dead consumer
+            while embedded.get() is not done:
+                pass
+        finally:
+            progress.close()
+            if lexical_writer is not None:
+                # Rows already upserted must be searchable even if the run stopped early
+                try:
+                    lexical_writer.flush()
+                except Exception as e:
+                    errors.append(e)
+
+    parser = threading.Thread(target=_parse_stage, name="ingest-parse", daemon=True)
+    writer = threading.Thread(target=_upsert_stage, name="ingest-upsert", daemon=True)
+    parser.start()
+    writer.start()
+
+    # Stage 2: embedding in a worker pool; futures are drained in submission order so the
+    # checkpoint only ever covers rows that are really stored
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=max(1, embed_workers), thread_name_prefix="ingest-embed") as pool:
+        try:
+            while not errors:
+                batch = parsed.get()
+                if batch is done:
+                    break
+                in_flight.append(pool.submit(_embed, batch))
+                while len(in_flight) > max(1, embed_workers) * 2 or (in_flight and in_flight[0].done()):
+                    embedded.put(in_flight.popleft().result())
+            while in_flight and not errors:
+                embedded.put(in_flight.popleft().result())
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            stop.set()
+            for future in in_flight:
+                future.cancel()
+            embedded.put(done)
+            # Unblock the parser if we stopped early; it exits after its current batch
+            while parser.is_alive():
+                try:
+                    parsed.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+    writer.join()
+    parser.join()
+
+    if errors:
+        logger.error("Ingestion stopped: %s. Re-run to resume from the last checkpoint.", errors[0])
+        raise errors[0]
+
+    if os.path.exists(CHECKPOINT_FILE):
+        os.remove(CHECKPOINT_FILE)
+
+    wall = time.perf_counter() - wall_start
+    report = {
+        "rows_upserted": upsert_stats.rows,
+        "rows_unchanged": skipped[0],
+        "malformed_lines": malformed[0],
+        "wall_seconds": round(wall, 3),
+        "rows_per_second": round((upsert_stats.rows + skipped[0]) / wall, 1) if wall else 0.0,
+        "stages": {s.name: s.report() for s in (parse_stats, embed_stats, upsert_stats)},
+        "embedding": embedding_service.get_embedding_stats(),
+    }
+    logger.info("Ingestion complete! Facts stored: %s, unchanged: %s, malformed lines: %s", upsert_stats.rows, skipped[0], malformed[0])
+    for name, stage in report["stages"].items():
+        logger.info("  %6s: %s rows, %s rows/s (%ss busy)", name, stage['rows'], stage['rows_per_second'], stage['busy_seconds'])
+
+    # Lexical fast path: BM25 + exact-match table over everything stored (incl. earlier runs)
+    if lexical_writer is not None:
+        report["lexical_index_seconds"] = round(lexical_writer.seconds, 3)
+        logger.info("Lexical index: %s documents appended in %ss.", lexical_writer.rows, report['lexical_index_seconds'])
+    else:
+        start = time.perf_counter()
+        lexical_rows = build_from_collection(collection, LEXICAL_INDEX_DIR)
+        report["lexical_index_seconds"] = round(time.perf_counter() - start, 3)
+        logger.info("Lexical index built over %s documents in %ss.", lexical_rows, report['lexical_index_seconds'])
+    # An exported mmap index would otherwise keep serving the pre-ingestion neighbours
+    if upsert_stats.rows:
+        start = time.perf_counter()
+        exported = refresh_export(collection, INDEX_DIR)
+        if exported is not None:
+            report["vector_index_seconds"] = round(time.perf_counter() - start, 3)
+            logger.info("Mmap vector index re-exported (%s vectors) in %ss.", exported, report['vector_index_seconds'])
+    # Reopen collection / indexes on the next query in this process
+    retriever.reset_local_store()
+
+    # Cached verdicts were computed against the old collection
+    if upsert_stats.rows:
+        invalidate_verdict_cache()
+        invalidate_semantic_cache()
+        logger.info("Verdict caches invalidated.")
+
+    return report
 
 if __name__ == "__main__":
-    ingest_data()
+    parser = argparse.ArgumentParser(description="Ingest FEVER data into the local ChromaDB collection.")
+    parser.add_argument("--data", default=DATA_FILE, help="FEVER jsonl file, or a directory such as the wiki-pages dump")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore any checkpoint and start from the beginning")
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS, help="Parallel embedding workers")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    ingest_data(args.data, resume=not args.no_resume, embed_workers=args.workers, batch_size=args.batch_size)
@@ -0,0 +1,276 @@
+import os
+import math
+import time
+import pickle
+import shutil
+import hashlib
+import argparse
+import numpy as np
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from cache import normalize_text
+
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", "lexical_index")
+# The index directory holds an optional merged base plus append-only segments. Each ingestion run
+# adds segments built from the rows it upserted, so it never reloads the corpus; a segment row
+# replaces any earlier row with the same id. Loading merges everything in order.
+LEXICAL_INDEX_FILE = "bm25.pkl"
+SEGMENT_PREFIX = "segment-"
+# Rows buffered per segment file; bounds the builder's memory during ingestion
+LEXICAL_SEGMENT_ROWS = int(os.getenv("LEXICAL_SEGMENT_ROWS", "100000"))
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Function words carry no evidence and only bloat the postings
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "at", "to", "for", "by", "with", "from", "and", "or",
+    "is", "was", "are", "were", "be", "been", "as", "it", "its", "that", "this", "which",
+}
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in normalize_text(text).split() if t not in STOPWORDS]
+
+def text_key(text: str) -> int:
+    """64-bit hash of the normalized text, used for exact-match lookups."""
+    return int.from_bytes(hashlib.sha1(normalize_text(text).encode("utf-8")).digest()[:8], "big", signed=True)
+
+def _build_segment(ids: List[Optional[str]], documents: List[str]) -> dict:
+    term_docs: Dict[str, List[Tuple[int, int]]] = {}
+    lengths = np.zeros(len(documents), dtype=np.float32)
+    exact: Dict[int, int] = {}
+    for i, document in enumerate(documents):
+        tokens = tokenize(document)
+        lengths[i] = len(tokens)
+        exact.setdefault(text_key(document), i)
+        for term, tf in Counter(tokens).items():
+            term_docs.setdefault(term, []).append((i, tf))
+
+    postings = {}
+    for term, entries in term_docs.items():
+        doc_ids = np.fromiter((e[0] for e in entries), dtype=np.int32, count=len(entries))
+        tfs = np.fromiter((e[1] for e in entries), dtype=np.float32, count=len(entries))
+        postings[term] = (doc_ids, tfs)
+    return {"ids": list(ids), "documents": list(documents), "postings": postings, "doc_lengths": lengths, "exact": exact}
+
+def _write_pickle(file: str, data: dict):
+    tmp_file = file + ".tmp"
+    with open(tmp_file, "wb") as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, file)
+
+def _segment_files(path: str) -> List[str]:
+    if not os.path.isdir(path):
+        return []
+    return sorted(name for name in os.listdir(path) if name.startswith(SEGMENT_PREFIX) and name.endswith(".pkl"))
+
+def index_exists(path: str = LEXICAL_INDEX_DIR) -> bool:
+    return os.path.exists(os.path.join(path, LEXICAL_INDEX_FILE)) or bool(_segment_files(path))
+
+class LexicalIndex:
+    """Compact BM25 inverted index plus a normalized-text hash table over the stored documents.
+
+    Postings are per-term numpy arrays (doc ids + term frequencies), so a query only touches
+    the postings of its own terms.
+    """
+
+    def __init__(self, ids: List[Optional[str]], documents: List[str], postings: Dict[str, Tuple[np.ndarray, np.ndarray]],
+                 doc_lengths: np.ndarray, exact: Dict[int, int]):
+        self.ids = ids
+        self.documents = documents
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.exact = exact
+        self.count = len(documents)
+        self.avg_length = float(doc_lengths.mean()) if self.count else 0.0
+        # Sum of idf over each document's distinct terms (denominator of the weighted overlap score)
+        self.doc_idf_mass = np.zeros(self.count, dtype=np.float32)
+        for term, (doc_ids, _) in postings.items():
+            self.doc_idf_mass[doc_ids] += self.idf(term)
+
+    @classmethod
+    def build(cls, documents: List[str], ids: Optional[List[str]] = None) -> "LexicalIndex":
+        return cls.from_segments([_build_segment(ids or [None] * len(documents), documents)])
+
+    @classmethod
+    def from_segments(cls, segments: List[dict]) -> "LexicalIndex":
+        """Merges segments in order; a later row with the same id replaces the earlier one."""
+        latest: Dict[str, int] = {}
+        total = 0
+        for segment in segments:
+            for local, row_id in enumerate(segment["ids"]):
+                if row_id is not None:
+                    latest[row_id] = total + local
+            total += len(segment["ids"])
+        keep = np.ones(total, dtype=bool)
+        offset = 0
+        for segment in segments:
+            for local, row_id in enumerate(segment["ids"]):
+                if row_id is not None and latest[row_id] != offset + local:
+                    keep[offset + local] = False
+            offset += len(segment["ids"])
+        del latest
+        new_positions = (np.cumsum(keep) - 1).astype(np.int32)
+
+        ids, documents, lengths, exact = [], [], [], {}
+        parts: Dict[str, list] = {}
+        offset = 0
+        for segment in segments:
+            n = len(segment["ids"])
+            segment_keep, segment_positions = keep[offset:offset + n], new_positions[offset:offset + n]
+            ids.extend(row_id for row_id, kept in zip(segment["ids"], segment_keep) if kept)
+            documents.extend(document for document, kept in zip(segment["documents"], segment_keep) if kept)
+            lengths.append(segment["doc_lengths"][segment_keep])
+            for key, local in segment["exact"].items():
+                if segment_keep[local]:
+                    exact.setdefault(key, int(segment_positions[local]))
+            for term, (doc_ids, tfs) in segment["postings"].items():
+                mask = segment_keep[doc_ids]
+                if not mask.all():
+                    doc_ids, tfs = doc_ids[mask], tfs[mask]
+                if len(doc_ids):
+                    parts.setdefault(term, []).append((segment_positions[doc_ids], tfs))
+            offset += n
+
+        postings = {
+            term: entries[0] if len(entries) == 1 else (np.concatenate([e[0] for e in entries]), np.concatenate([e[1] for e in entries]))
+            for term, entries in parts.items()
+        }
+        doc_lengths = np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.float32)
+        return cls(ids, documents, postings, doc_lengths, exact)
+
+    def idf(self, term: str) -> float:
+        entry = self.postings.get(term)
+        df = len(entry[0]) if entry else 0
+        return math.log(1 + (self.count - df + 0.5) / (df + 0.5))
+
+    def exact_match(self, query: str) -> Optional[int]:
+        return self.exact.get(text_key(query))
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float, float]]:
+        """Top-k (doc index, bm25 score, overlap) by BM25.
+
+        overlap is an idf-weighted Jaccard between query and document terms in [0, 1];
+        1.0 means the same content words, regardless of stopwords, punctuation or casing.
+        """
+        terms = set(tokenize(query))
+        ids_parts, bm25_parts, idf_parts = [], [], []
+        query_mass = 0.0
+        for term in terms:
+            idf = self.idf(term)
+            query_mass += idf
+            entry = self.postings.get(term)
+            if not entry:
+                continue
+            ids, tfs = entry
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[ids] / (self.avg_length or 1.0))
+            ids_parts.append(ids)
+            bm25_parts.append(idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+            idf_parts.append(np.full(len(ids), idf, dtype=np.float32))
+        if not ids_parts:
+            return []
+
+        doc_ids, inverse = np.unique(np.concatenate(ids_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(bm25_parts))
+        matched_mass = np.bincount(inverse, weights=np.concatenate(idf_parts))
+        overlap = matched_mass / np.maximum(query_mass + self.doc_idf_mass[doc_ids] - matched_mass, 1e-9)
+
+        top = np.argsort(-scores)[:k]
+        return [(int(doc_ids[j]), float(scores[j]), float(overlap[j])) for j in top]
+
+    def save(self, path: str = LEXICAL_INDEX_DIR):
+        """Writes the index as the merged base of path, replacing the segments it was loaded from."""
+        os.makedirs(path, exist_ok=True)
+        merged = _segment_files(path)
+        _write_pickle(os.path.join(path, LEXICAL_INDEX_FILE), {
+            "ids": self.ids,
+            "documents": self.documents,
+            "postings": self.postings,
+            "doc_lengths": self.doc_lengths,
+            "exact": self.exact,
+        })
+        for name in merged:
+            os.remove(os.path.join(path, name))
+
+    @classmethod
+    def load(cls, path: str = LEXICAL_INDEX_DIR) -> "LexicalIndex":
+        """The merged base plus every segment. FileNotFoundError when nothing has been built yet."""
+        files = ([LEXICAL_INDEX_FILE] if os.path.exists(os.path.join(path, LEXICAL_INDEX_FILE)) else []) + _segment_files(path)
+        if not files:
+            raise FileNotFoundError(f"No lexical index in {path}")
+        segments = []
+        for name in files:
+            with open(os.path.join(path, name), "rb") as f:
+                segment = pickle.load(f)
+            segment.setdefault("ids", [None] * len(segment["documents"])) # bases written before ids were kept
+            segments.append(segment)
+        return cls.from_segments(segments)
+
+class SegmentWriter:
+    """Appends (id, document) rows to an index directory, one segment file per segment_rows rows."""
+
+    def __init__(self, path: str = LEXICAL_INDEX_DIR, segment_rows: int = LEXICAL_SEGMENT_ROWS):
+        self.path = path
+        self.segment_rows = max(1, segment_rows)
+        self.rows = 0
+        self.seconds = 0.0
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+
+    def add(self, ids: List[str], documents: List[str]):
+        self._ids.extend(ids)
+        self._documents.extend(documents)
+        if len(self._ids) >= self.segment_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._ids:
+            return
+        start = time.perf_counter()
+        os.makedirs(self.path, exist_ok=True)
+        existing = _segment_files(self.path)
+        number = int(existing[-1][len(SEGMENT_PREFIX):-len(".pkl")]) + 1 if existing else 1
+        _write_pickle(os.path.join(self.path, f"{SEGMENT_PREFIX}{number:06d}.pkl"), _build_segment(self._ids, self._documents))
+        self.rows += len(self._ids)
+        self._ids, self._documents = [], []
+        self.seconds += time.perf_counter() - start
+
+def build_from_collection(collection, path: str = LEXICAL_INDEX_DIR, page_size: int = 5000) -> int:
+    """Rebuilds the lexical index from every document stored in a Chroma collection.
+
+    Pages are streamed into segments, so memory stays bounded by LEXICAL_SEGMENT_ROWS. The new
+    index is written next to the old one and swapped in at the end.
+    """
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    writer = SegmentWriter(tmp_path)
+    offset = 0
+    while True:
+        page = collection.get(include=["documents"], limit=page_size, offset=offset)
+        if not len(page["ids"]):
+            break
+        writer.add(page["ids"], page["documents"])
+        offset += len(page["ids"])
+    writer.flush()
+    os.makedirs(tmp_path, exist_ok=True)
+
+    old_path = path + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return writer.rows
+
+def compact(path: str = LEXICAL_INDEX_DIR) -> int:
+    """Merges the base and all segments into a single base file. Returns the document count."""
+    index = LexicalIndex.load(path)
+    index.save(path)
+    return index.count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge the lexical index segments written by ingestion into one file.")
+    parser.add_argument("--path", default=LEXICAL_INDEX_DIR)
+    args = parser.parse_args()
+    print(f"Compacted {compact(args.path)} documents in {args.path}")
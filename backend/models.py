@@ -1,8 +1,13 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class ClaimRequest(BaseModel):
     claim: str
+    timeout: Optional[float] = None  # seconds; the server default applies when omitted
+
+class BatchClaimRequest(BaseModel):
+    claims: List[str]
+    timeout: Optional[float] = None
 
 class Evidence(BaseModel):
     text: str
@@ -15,3 +20,15 @@ class VerificationResult(BaseModel):
     verdict: str  # "Supported", "Refuted", "NotEnoughInfo"
     reasoning: str
     evidence: List[Evidence]
+    source_type: Optional[str] = None  # "Local", "Web+Local"
+    timings: Optional[Dict[str, float]] = None  # milliseconds per pipeline stage, when requested
+    evidence_budget: Optional[Dict[str, int]] = None  # evidence tokens/items before and after budgeting
+    incomplete: Optional[str] = None  # set when a stage ran out of time (or its upstream was down): best verdict so far
+
+class VerificationEvent(BaseModel):
+    # "local_evidence", "local_verdict", "web_evidence", "token" (final reasoning text), "final"
+    stage: str
+    evidence: Optional[List[Evidence]] = None
+    result: Optional[VerificationResult] = None
+    text: Optional[str] = None
+    path: Optional[str] = None  # on "final": verdict_cache, semantic_cache, fast_path, local, web or deadline
@@ -0,0 +1,135 @@
+import os
+import json
+import inspect
+import argparse
+import logging
+from typing import List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# MiniLM on onnxruntime instead of PyTorch (no GPU on our hosts). Export once with
+#   python onnx_embedder.py --out models/minilm-onnx [--int8]
+# then run with EMBEDDING_BACKEND=onnx. The session is tuned for a single caller thread (the
+# embedding_service batcher): intra-op threads do the parallelism, inter-op is kept at one.
+# Texts are sorted by length and padded per batch, so short queries never pay for a long neighbour.
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join("models", "minilm-onnx"))
+# "1": use model_int8.onnx (dynamic int8 quantization) when present
+ONNX_INT8 = os.getenv("ONNX_INT8", "1") == "1"
+# 0 lets onnxruntime pick (one thread per physical core)
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+ONNX_BATCH_SIZE = int(os.getenv("ONNX_BATCH_SIZE", "32"))
+
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2's sentence-transformers limit
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+CONFIG_FILE = "embedder.json"
+
+def model_path(model_dir: str = ONNX_MODEL_DIR, int8: bool = ONNX_INT8) -> str:
+    int8_path = os.path.join(model_dir, INT8_FILE)
+    if int8 and os.path.exists(int8_path):
+        return int8_path
+    return os.path.join(model_dir, FP32_FILE)
+
+class OnnxEmbeddingFunction:
+    """Drop-in for Chroma's SentenceTransformerEmbeddingFunction (same vectors, `__call__(input)`)."""
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, int8: bool = ONNX_INT8,
+                 intra_op_threads: int = ONNX_INTRA_OP_THREADS, batch_size: int = ONNX_BATCH_SIZE):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.path = model_path(model_dir, int8)
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"No exported model at {self.path}. Run: python onnx_embedder.py --out {model_dir}")
+        self.batch_size = max(1, batch_size)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.no_padding() # padded per batch in _encode_batch
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = max(0, intra_op_threads)
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(self.path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        if not input:
+            return []
+        encodings = self.tokenizer.encode_batch(list(input))
+        order = sorted(range(len(encodings)), key=lambda i: len(encodings[i].ids))
+        vectors: List[Optional[np.ndarray]] = [None] * len(encodings)
+        for start in range(0, len(order), self.batch_size):
+            chunk = order[start:start + self.batch_size]
+            for i, vector in zip(chunk, self._encode_batch([encodings[i] for i in chunk])):
+                vectors[i] = vector
+        return vectors
+
+    def _encode_batch(self, encodings) -> np.ndarray:
+        length = max(len(e.ids) for e in encodings)
+        ids = np.zeros((len(encodings), length), dtype=np.int64)
+        mask = np.zeros((len(encodings), length), dtype=np.int64)
+        for row, e in enumerate(encodings):
+            ids[row, :len(e.ids)] = e.ids
+            mask[row, :len(e.ids)] = 1
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, feeds)[0]
+        # sentence-transformers pipeline of this model: mean pooling, then L2 normalization
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32)
+
+def export(model_name: str, out_dir: str, int8: bool = True, opset: int = 14) -> dict:
+    """Exports the Hugging Face encoder behind a sentence-transformers model to ONNX (plus int8)."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    tokenizer = AutoTokenizer.from_pretrained(repo)
+    model = AutoModel.from_pretrained(repo).eval()
+    tokenizer.save_pretrained(out_dir)
+
+    sample = tokenizer(["An example sentence to trace the graph."], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    dynamic = {n: {0: "batch", 1: "sequence"} for n in names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    extra = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    fp32_path = os.path.join(out_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[n] for n in names), fp32_path,
+            input_names=names, output_names=["last_hidden_state"], dynamic_axes=dynamic,
+            opset_version=opset, do_constant_folding=True, **extra
+        )
+    files = [FP32_FILE]
+    if int8:
+        # Dynamic quantization: int8 weights, activations quantized on the fly (CPU-friendly)
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, os.path.join(out_dir, INT8_FILE), weight_type=QuantType.QInt8)
+        files.append(INT8_FILE)
+
+    config = {"model_name": model_name, "files": files, "opset": opset, "max_seq_length": MAX_SEQ_LENGTH}
+    with open(os.path.join(out_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    return config
+
+if __name__ == "__main__":
+    from embedding_service import EMBEDDING_MODEL_NAME
+    parser = argparse.ArgumentParser(description="Export the MiniLM encoder to ONNX for EMBEDDING_BACKEND=onnx.")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--out", default=ONNX_MODEL_DIR)
+    parser.add_argument("--no-int8", action="store_true", help="Skip the int8-quantized copy")
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    config = export(args.model, args.out, int8=not args.no_int8, opset=args.opset)
+    logger.info("Exported %s to %s: %s", args.model, args.out, ", ".join(config["files"]))
+    logger.info("Check parity with: python check_embedding_parity.py --onnx-dir %s", args.out)
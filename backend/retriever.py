@@ -1,88 +1,468 @@
 import os
+import time
+import asyncio
+import logging
+import threading
 import requests
-from typing import List
+import httpx
+from typing import List, Optional, Tuple
 from models import Evidence
+from cache import CACHE_DIR, SQLiteCache, normalize_text
+from startup import timed
+from telemetry import span, inc
+import embedding_service
+import deadlines
+import web_memory
 
-# Mock for now if keys are missing
-def search_web(query: str) -> List[Evidence]:
+logger = logging.getLogger(__name__)
+
+# Overridable so tests / local stubs can stand in for Google Custom Search
+SEARCH_API_URL = os.getenv("GOOGLE_SEARCH_URL", "https://www.googleapis.com/customsearch/v1")
+SEARCH_TIMEOUT = float(os.getenv("WEB_SEARCH_TIMEOUT", "10"))
+WEB_CACHE_TTL = float(os.getenv("WEB_CACHE_TTL", str(24 * 3600)))
+WEB_CACHE_MAX_ENTRIES = int(os.getenv("WEB_CACHE_MAX_ENTRIES", "5000"))
+
+# Raw Custom Search responses keyed by normalized query
+_web_cache = SQLiteCache(os.path.join(CACHE_DIR, "web_search.sqlite"), max_entries=WEB_CACHE_MAX_ENTRIES, default_ttl=WEB_CACHE_TTL)
+
+# One keep-alive connection pool per event loop (Streamlit starts a fresh loop per asyncio.run)
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop = None
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client_loop is not loop or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=SEARCH_TIMEOUT,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30),
+        )
+        _http_client_loop = loop
+    return _http_client
+
+async def close_http_client():
+    """Closes the shared async HTTP pool. Call before the event loop shuts down."""
+    global _http_client, _http_client_loop
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+    _http_client_loop = None
+
+def _parse_search_results(results: dict) -> List[Evidence]:
+    evidence_list = []
+    with span("web_parse"):
+        if "items" in results:
+            for item in results["items"][:3]: # Top 3 results
+                evidence_list.append(Evidence(
+                    text=item.get("snippet", "No snippet"),
+                    source=item.get("displayLink", "Web"), # Use displayLink for source
+                    url=item.get("link"),
+                    confidence=0.7
+                ))
+    return evidence_list
+
+def _search_credentials():
     api_key = os.getenv("GOOGLE_SEARCH_API_KEY") 
     cse_id = os.getenv("GOOGLE_CSE_ID")
-    
     if not api_key or not cse_id:
-        print("Warning: Missing GOOGLE_SEARCH_API_KEY or GOOGLE_CSE_ID. Returning mock data.")
+        logger.warning("Missing GOOGLE_SEARCH_API_KEY or GOOGLE_CSE_ID. Returning mock data.")
+        return None
+    return api_key, cse_id
+
+# Mock for now if keys are missing
+def search_web(query: str) -> List[Evidence]:
+    credentials = _search_credentials()
+    if not credentials:
+        inc("web_searches_total", result="mock")
         return [Evidence(text="Mock web evidence for " + query, source="Web", confidence=0.5)]
-    
+    api_key, cse_id = credentials
+
+    cache_key = normalize_text(query)
+    cached = _web_cache.get(cache_key)
+    if cached is not None:
+        inc("web_searches_total", result="cache")
+        return _parse_search_results(cached)
+
     # Implementation using Google Custom Search JSON API
     try:
-        url = "https://www.googleapis.com/customsearch/v1"
         params = {
             "q": query,
             "key": api_key,
             "cx": cse_id,
         }
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        results = response.json()
-        
-        evidence_list = []
-        if "items" in results:
-            for item in results["items"][:3]: # Top 3 results
-                evidence_list.append(Evidence(
-                    text=item.get("snippet", "No snippet"),
-                    source=item.get("displayLink", "Web"), # Use displayLink for source
-                    url=item.get("link"),
-                    confidence=0.7
-                ))
-        return evidence_list
+        with span("web_search"):
+            response = requests.get(SEARCH_API_URL, params=params, timeout=SEARCH_TIMEOUT)
+            response.raise_for_status()
+            results = response.json()
+        inc("web_searches_total", result="network")
+        _web_cache.set(cache_key, results)
+        return _parse_search_results(results)
     except Exception as e:
-        print(f"Search Error: {e}")
+        inc("web_searches_total", result="error")
+        logger.error("Search Error: %s", e)
         return [Evidence(text=f"Process Error: Could not retrieve web evidence. Details: {str(e)}", source="System Error", confidence=0.0)]
 
-import chromadb
-from chromadb.utils import embedding_functions
+def _retryable_search_error(e: Exception) -> bool:
+    # Rejected requests (bad key, quota exhausted for the day, ...) will not succeed on a retry
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    return True
+
+async def search_web_async(query: str) -> List[Evidence]:
+    """Non-blocking search_web over the shared keep-alive pool, backed by the on-disk query cache.
+
+    Retried and circuit-broken through deadlines.call; failures come back as a System Error item,
+    except deadlines.StageUnavailable (no time left, or the search circuit is open), which is raised.
+    """
+    credentials = _search_credentials()
+    if not credentials:
+        inc("web_searches_total", result="mock")
+        return [Evidence(text="Mock web evidence for " + query, source="Web", confidence=0.5)]
+    api_key, cse_id = credentials
+
+    cache_key = normalize_text(query)
+    cached = _web_cache.get(cache_key)
+    if cached is not None:
+        inc("web_searches_total", result="cache")
+        return _parse_search_results(cached)
+
+    try:
+        params = {
+            "q": query,
+            "key": api_key,
+            "cx": cse_id,
+        }
+        async def _get():
+            response = await _get_http_client().get(SEARCH_API_URL, params=params)
+            response.raise_for_status()
+            return response.json()
+
+        with span("web_search"):
+            results = await deadlines.call("web_search", deadlines.SEARCH_BREAKER, _get, retryable=_retryable_search_error)
+        inc("web_searches_total", result="network")
+        _web_cache.set(cache_key, results)
+        return _parse_search_results(results)
+    except deadlines.StageUnavailable:
+        # Out of time or circuit open: the caller returns its best verdict so far instead
+        inc("web_searches_total", result="unavailable")
+        raise
+    except Exception as e:
+        inc("web_searches_total", result="error")
+        logger.error("Search Error: %s", e)
+        return [Evidence(text=f"Process Error: Could not retrieve web evidence. Details: {str(e)}", source="System Error", confidence=0.0)]
 
-# Initialize Chroma Client globally
+# Chroma client, embedding model and collection are created lazily on first use (or by
+# warm_up) so importing this module stays cheap for Streamlit reruns and worker spawns.
 CHROMA_DB_PATH = "chroma_db"
 COLLECTION_NAME = "fever-facts"
-try:
-    _chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
-    _embed_fn = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
-    _collection = _chroma_client.get_collection(name=COLLECTION_NAME, embedding_function=_embed_fn)
-except Exception as e:
-    print(f"ChromaDB Init Error: {e}")
-    _collection = None
+EMBEDDING_MODEL_NAME = embedding_service.EMBEDDING_MODEL_NAME
+_init_lock = threading.RLock()
+_chromadb = None
+_chroma_client = None
+_collection = None
+_init_error: Optional[str] = None
+
+# Local retrieval backend: "chroma" (default) or "mmap" (in-process index exported by vector_index.py)
+LOCAL_BACKEND = os.getenv("LOCAL_BACKEND", "chroma").lower()
+_mmap_index = None
+_mmap_checked = False
+_mmap_verified = False
+
+# Lexical fast path (lexical_index.py, built by ingest_data): exact or near-verbatim matches
+# skip the embedding model; everything else is fused with dense results by reciprocal rank.
+LEXICAL_FAST_PATH = os.getenv("LEXICAL_FAST_PATH", "1") == "1"
+LEXICAL_SKIP_THRESHOLD = float(os.getenv("LEXICAL_SKIP_THRESHOLD", "0.85"))
+LEXICAL_CANDIDATES = 10
+RRF_K = 60
+_lexical_index = None
+_lexical_checked = False
+
+# Queries answered by each local path and the time spent in it
+LOCAL_SEARCH_STATS = {
+    "exact": {"hits": 0, "seconds": 0.0},    # normalized-text hash hit, no embedding
+    "lexical": {"hits": 0, "seconds": 0.0},  # BM25 overlap above threshold, no embedding
+    "dense": {"hits": 0, "seconds": 0.0},    # embedding + vector query (fused with BM25 when available)
+}
+
+def _import_chromadb():
+    global _chromadb
+    if _chromadb is None:
+        with timed("import chromadb"):
+            import chromadb
+            _chromadb = chromadb
+    return _chromadb
+
+def get_chroma_client():
+    global _chroma_client
+    if _chroma_client is None:
+        with _init_lock:
+            if _chroma_client is None:
+                chromadb = _import_chromadb()
+                with timed("chroma client"):
+                    _chroma_client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+    return _chroma_client
+
+def get_embed_fn():
+    """The shared MiniLM embedding function: concurrent callers are micro-batched into one
+    model call (or sent to the embedding service, see embedding_service.py)."""
+    if not embedding_service.EMBEDDING_SERVICE_URL:
+        _import_chromadb()
+    return embedding_service.get_embedder()
+
+def get_collection():
+    """The FEVER collection, or None if it cannot be opened (the reason is kept in get_init_error)."""
+    global _collection, _init_error
+    if _collection is None:
+        with _init_lock:
+            if _collection is None:
+                try:
+                    client = get_chroma_client()
+                    embed_fn = embedding_service.collection_embedding_function()
+                    with timed("open collection"):
+                        _collection = client.get_collection(name=COLLECTION_NAME, embedding_function=embed_fn)
+                    _init_error = None
+                except Exception as e:
+                    # Not cached as permanent: the collection may appear after an ingestion run
+                    _init_error = str(e)
+                    logger.error("ChromaDB Init Error: %s", e)
+    return _collection
+
+def get_mmap_index():
+    global _mmap_index, _mmap_checked
+    if LOCAL_BACKEND != "mmap":
+        return None
+    if not _mmap_checked:
+        with _init_lock:
+            if not _mmap_checked:
+                try:
+                    with timed("mmap index"):
+                        from vector_index import MmapVectorIndex, INDEX_DIR
+                        _mmap_index = MmapVectorIndex(INDEX_DIR)
+                except Exception as e:
+                    logger.error("Mmap Index Init Error: %s. Falling back to ChromaDB.", e)
+                _mmap_checked = True
+    if _mmap_index is not None and not _mmap_verified:
+        _verify_mmap_index()
+    return _mmap_index
+
+def _verify_mmap_index():
+    """Drops an exported index whose row count no longer matches the collection (ingested since)."""
+    global _mmap_index, _mmap_verified
+    collection = get_collection()
+    with _init_lock:
+        if _mmap_index is None or _mmap_verified:
+            return
+        if collection is not None:
+            try:
+                count = collection.count()
+            except Exception as e:
+                logger.error("Mmap Index Check Error: %s", e)
+                count = _mmap_index.count
+            if count != _mmap_index.count:
+                logger.warning("Mmap index is stale (%s vectors, collection has %s). Falling back to ChromaDB; "
+                               "re-export with vector_index.py.", _mmap_index.count, count)
+                _mmap_index = None
+        _mmap_verified = True
+
+def get_lexical_index():
+    global _lexical_index, _lexical_checked
+    if not LEXICAL_FAST_PATH:
+        return None
+    if not _lexical_checked:
+        with _init_lock:
+            if not _lexical_checked:
+                try:
+                    with timed("lexical index"):
+                        from lexical_index import LexicalIndex, LEXICAL_INDEX_DIR
+                        _lexical_index = LexicalIndex.load(LEXICAL_INDEX_DIR)
+                except FileNotFoundError:
+                    pass # Not built yet (run ingest_data)
+                except Exception as e:
+                    logger.error("Lexical Index Init Error: %s", e)
+                _lexical_checked = True
+    return _lexical_index
+
+def get_local_search_stats() -> dict:
+    return {path: dict(values) for path, values in LOCAL_SEARCH_STATS.items()}
+
+def get_init_error() -> Optional[str]:
+    return _init_error
+
+def reset_local_store():
+    """Forgets the open collection/index so the next query reopens them (e.g. after re-ingestion)."""
+    global _collection, _mmap_index, _mmap_checked, _mmap_verified, _lexical_index, _lexical_checked
+    with _init_lock:
+        _collection = None
+        _mmap_index = None
+        _mmap_checked = False
+        _mmap_verified = False
+        _lexical_index = None
+        _lexical_checked = False
+
+def warm_up(background: bool = True) -> Optional[threading.Thread]:
+    """Loads the embedding model and opens the local store ahead of the first query."""
+    def _warm():
+        try:
+            embed_fn = get_embed_fn()
+            with timed("first embedding"):
+                embed_fn(["warm-up"])
+            if get_mmap_index() is None:
+                get_collection()
+        except Exception as e:
+            logger.error("Warm-up Error: %s", e)
+
+    if not background:
+        _warm()
+        return None
+    thread = threading.Thread(target=_warm, name="retriever-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+# Max claims sent to Chroma in a single query call (embedding + ANN search)
+LOCAL_QUERY_BATCH_SIZE = 256
+LOCAL_TOP_K = 2
+
+def _to_evidence(docs, distances, source: str = "Local (ChromaDB)") -> List[Evidence]:
+    evidence_list = []
+    for doc, distance in zip(docs, distances):
+        # Convert distance to similarity/confidence (approx)
+        # Cosine distance: 0 is identical, 1 is opposite. 
+        # We want 1.0 = good. 
+        evidence_list.append(Evidence(
+            text=doc,
+            source=source,
+            confidence=1 - distance
+        ))
+    return evidence_list
+
+def _local_ready() -> bool:
+    return get_lexical_index() is not None or get_mmap_index() is not None or get_collection() is not None
+
+def _not_initialized() -> Evidence:
+    reason = f" ({_init_error})" if _init_error else ""
+    return Evidence(text=f"Local DB not initialized.{reason}", source="System", confidence=0.0)
+
+def _dense_query(queries: List[str], k: int) -> Optional[Tuple[List[List[Evidence]], list]]:
+    """Top-k dense evidence per query, plus the query embeddings (reused for the web memory lookup).
+    None when there is no dense store to query (only the lexical index exists)."""
+    index = get_mmap_index()
+    collection = get_collection() if index is None else None
+    if index is None and collection is None:
+        return None
+    # Embed explicitly (rather than via query_texts) so model time and search time are measured apart
+    with span("embed"):
+        embeddings = get_embed_fn()(queries)
+    if index is not None:
+        with span("vector_query", backend="mmap"):
+            hits = index.search(embeddings, k=k)
+        return [_to_evidence([d for d, _ in row], [dist for _, dist in row], source="Local (Mmap Index)") for row in hits], embeddings
+
+    with span("vector_query", backend="chroma"):
+        results = collection.query(
+            query_embeddings=embeddings,
+            n_results=k
+        )
+    # Chroma returns lists of lists
+    docs = results['documents'] or [[] for _ in queries]
+    distances = results['distances'] or [[] for _ in queries]
+    return [_to_evidence(docs[i], distances[i]) for i in range(len(queries))], embeddings
+
+def _lexical_evidence(index, hits) -> List[Evidence]:
+    return [Evidence(text=index.documents[doc], source="Local (BM25)", confidence=overlap) for doc, _, overlap in hits]
+
+def _fuse(dense: List[Evidence], lexical: List[Evidence]) -> List[Evidence]:
+    """Reciprocal rank fusion of dense and BM25 results (by document text)."""
+    scores, by_text = {}, {}
+    for ranked in (dense, lexical):
+        for rank, evidence in enumerate(ranked):
+            scores[evidence.text] = scores.get(evidence.text, 0.0) + 1.0 / (RRF_K + rank + 1)
+            by_text.setdefault(evidence.text, evidence) # dense evidence (cosine confidence) wins
+    best = sorted(scores, key=scores.get, reverse=True)[:LOCAL_TOP_K]
+    return [by_text[text] for text in best]
+
+def _query_local(queries: List[str]) -> List[List[Evidence]]:
+    """Top-k evidence per query: lexical fast path first, one embedding pass for the rest."""
+    results: List[Optional[List[Evidence]]] = [None] * len(queries)
+    lexical_hits: List[list] = [[] for _ in queries]
+
+    index = get_lexical_index()
+    if index is not None:
+        with span("lexical"):
+            for i, query in enumerate(queries):
+                start = time.perf_counter()
+                exact = index.exact_match(query)
+                hits = index.search(query, k=LEXICAL_CANDIDATES)
+                if exact is not None:
+                    evidence = [Evidence(text=index.documents[exact], source="Local (Exact Match)", confidence=1.0)]
+                    results[i] = evidence + _lexical_evidence(index, [h for h in hits if h[0] != exact])[:LOCAL_TOP_K - 1]
+                    path = "exact"
+                elif hits and hits[0][2] >= LEXICAL_SKIP_THRESHOLD:
+                    results[i] = _lexical_evidence(index, hits[:LOCAL_TOP_K])
+                    path = "lexical"
+                else:
+                    lexical_hits[i] = hits
+                    path = None
+                LOCAL_SEARCH_STATS["exact" if path == "exact" else "lexical"]["seconds"] += time.perf_counter() - start
+                if path:
+                    LOCAL_SEARCH_STATS[path]["hits"] += 1
+                    inc("local_search_total", path=path)
+
+    pending = [i for i, r in enumerate(results) if r is None]
+    if pending:
+        start = time.perf_counter()
+        # Fetch extra dense candidates when there is a BM25 list to fuse with
+        k = LOCAL_TOP_K * 2 if index is not None else LOCAL_TOP_K
+        try:
+            dense = _dense_query([queries[i] for i in pending], k)
+            unavailable = _not_initialized()
+        except Exception as e:
+            # The BM25 candidates already found for these queries are still worth returning
+            logger.error("Dense Search Error: %s", e)
+            dense = None
+            unavailable = Evidence(text=f"Error accessing Vector DB: {str(e)}", source="System Error", confidence=0.0)
+        if dense is None:
+            for i in pending:
+                lexical = _lexical_evidence(index, lexical_hits[i][:LOCAL_TOP_K]) if index is not None else []
+                results[i] = lexical or [unavailable]
+            return results
+
+        dense, embeddings = dense
+        # Written-back web evidence is only consulted when the FEVER store had no close lexical match
+        remembered = web_memory.search_many(embeddings)
+        for i, evidence, memory in zip(pending, dense, remembered):
+            results[i] = _fuse(evidence, _lexical_evidence(index, lexical_hits[i])) if index is not None else evidence
+            seen = {e.text for e in results[i]}
+            results[i] = results[i] + [e for e in memory if e.text not in seen]
+        LOCAL_SEARCH_STATS["dense"]["hits"] += len(pending)
+        inc("local_search_total", len(pending), path="dense")
+        LOCAL_SEARCH_STATS["dense"]["seconds"] += time.perf_counter() - start
+    return results
 
 def search_local(query: str) -> List[Evidence]:
-    if not _collection:
-        return [Evidence(text="Local DB not initialized.", source="System", confidence=0.0)]
+    if not _local_ready():
+        return [_not_initialized()]
 
     try:
-        # ChromaDB handles embedding internally via embedding_function
-        results = _collection.query(
-            query_texts=[query],
-            n_results=2
-        )
-        
-        evidence_list = []
-        if results['documents']:
-            # Chroma returns lists of lists
-            docs = results['documents'][0]
-            metadatas = results['metadatas'][0]
-            distances = results['distances'][0] # Cosine distance
-            
-            for i, doc in enumerate(docs):
-                # Convert distance to similarity/confidence (approx)
-                # Cosine distance: 0 is identical, 1 is opposite. 
-                # We want 1.0 = good. 
-                confidence = 1 - distances[i] 
-                
-                evidence_list.append(Evidence(
-                    text=doc,
-                    source=f"Local (ChromaDB)",
-                    confidence=confidence
-                ))
-            
-        return evidence_list
+        return _query_local([query])[0]
     except Exception as e:
-        print(f"ChromaDB Search Error: {e}")
+        logger.error("ChromaDB Search Error: %s", e)
         return [Evidence(text=f"Error accessing Vector DB: {str(e)}", source="System Error", confidence=0.0)]
+
+def search_local_batch(queries: List[str], batch_size: int = LOCAL_QUERY_BATCH_SIZE) -> List[List[Evidence]]:
+    """Batched search_local: embeds and queries many claims per backend call. Results keep input order."""
+    if not _local_ready():
+        return [[_not_initialized()] for _ in queries]
+
+    all_evidence: List[List[Evidence]] = []
+    for start in range(0, len(queries), batch_size):
+        chunk = queries[start:start + batch_size]
+        try:
+            all_evidence.extend(_query_local(chunk))
+        except Exception as e:
+            # A failed chunk only affects its own claims
+            logger.error("ChromaDB Batch Search Error: %s", e)
+            all_evidence.extend(
+                [Evidence(text=f"Error accessing Vector DB: {str(e)}", source="System Error", confidence=0.0)]
+                for _ in chunk
+            )
+    return all_evidence
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import deque, OrderedDict
+from typing import List, Optional
+from models import VerificationResult
+from cache import normalize_text
+import retriever
+import embedding_service
+
+logger = logging.getLogger(__name__)
+
+# Paraphrase-level reuse of earlier verdicts. Off by default: negations ("X did not ...")
+# embed very close to the original claim, so tune the threshold on your own traffic first.
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "0") == "1"
+SEMANTIC_CACHE_COLLECTION = "claim-cache"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+# Lookups scoring within this margin below the threshold are reported as near misses
+SEMANTIC_NEAR_MISS_MARGIN = float(os.getenv("SEMANTIC_NEAR_MISS_MARGIN", "0.05"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", str(7 * 24 * 3600)))
+
+CACHEABLE_VERDICTS = {"Supported", "Refuted", "NotEnoughInfo"}
+
+_STATS = {"lookups": 0, "hits": 0, "near_misses": 0, "misses": 0}
+# Best-match similarity of every lookup, bucketed by 0.05
+_similarity_histogram: dict = {}
+# Recent near misses (incoming claim, cached claim, similarity) for eyeballing the threshold
+_recent_near_misses = deque(maxlen=50)
+# Embeddings computed during lookup, reused when the verdict is stored
+_recent_embeddings: "OrderedDict[str, list]" = OrderedDict()
+_RECENT_EMBEDDINGS_MAX = 1024
+# lookup/store run in asyncio.to_thread workers
+_embeddings_lock = threading.Lock()
+
+_collection = None
+
+def _get_collection():
+    global _collection
+    if _collection is None:
+        try:
+            _collection = retriever.get_chroma_client().get_or_create_collection(
+                name=SEMANTIC_CACHE_COLLECTION,
+                embedding_function=embedding_service.collection_embedding_function(),
+                metadata={"hnsw:space": "cosine"}
+            )
+        except Exception as e:
+            logger.error("Semantic Cache Init Error: %s", e)
+    return _collection
+
+def _claim_id(claim: str) -> str:
+    return hashlib.sha1(normalize_text(claim).encode("utf-8")).hexdigest()
+
+def _remember_embedding(claim: str, embedding):
+    with _embeddings_lock:
+        _recent_embeddings[claim] = embedding
+        _recent_embeddings.move_to_end(claim)
+        while len(_recent_embeddings) > _RECENT_EMBEDDINGS_MAX:
+            _recent_embeddings.popitem(last=False)
+
+def _recall_embedding(claim: str):
+    with _embeddings_lock:
+        return _recent_embeddings.get(claim)
+
+def _record(claim: str, similarity: Optional[float], cached_claim: Optional[str], hit: bool):
+    _STATS["lookups"] += 1
+    if similarity is not None:
+        bucket = f"{min(int(max(similarity, 0.0) * 20), 19) * 0.05:.2f}"
+        _similarity_histogram[bucket] = _similarity_histogram.get(bucket, 0) + 1
+    if hit:
+        _STATS["hits"] += 1
+    elif similarity is not None and similarity >= SEMANTIC_CACHE_THRESHOLD - SEMANTIC_NEAR_MISS_MARGIN:
+        _STATS["near_misses"] += 1
+        _recent_near_misses.append({"claim": claim, "cached_claim": cached_claim, "similarity": round(similarity, 4)})
+    else:
+        _STATS["misses"] += 1
+
+def lookup_many(claims: List[str]) -> List[Optional[VerificationResult]]:
+    """Embeds all claims in one pass and returns a reusable earlier verdict (or None) per claim."""
+    collection = _get_collection()
+    if collection is None or not claims:
+        return [None] * len(claims)
+
+    embeddings = retriever.get_embed_fn()(claims)
+    for claim, embedding in zip(claims, embeddings):
+        _remember_embedding(claim, embedding)
+
+    if collection.count() == 0:
+        for claim in claims:
+            _record(claim, None, None, hit=False)
+        return [None] * len(claims)
+
+    try:
+        results = collection.query(query_embeddings=embeddings, n_results=1)
+    except Exception as e:
+        logger.error("Semantic Cache Error: %s", e)
+        return [None] * len(claims)
+
+    now = time.time()
+    found: List[Optional[VerificationResult]] = []
+    for i, claim in enumerate(claims):
+        if not results["documents"][i]:
+            _record(claim, None, None, hit=False)
+            found.append(None)
+            continue
+        similarity = 1 - results["distances"][i][0]
+        cached_claim = results["documents"][i][0]
+        metadata = results["metadatas"][i][0]
+        hit = similarity >= SEMANTIC_CACHE_THRESHOLD and metadata.get("expires_at", 0) > now
+        _record(claim, similarity, cached_claim, hit)
+        if not hit:
+            found.append(None)
+            continue
+        result = VerificationResult(**json.loads(metadata["result"]))
+        result.claim = claim
+        result.reasoning = f"(Semantic cache: matched \"{cached_claim}\" at similarity {similarity:.2f}) {result.reasoning}"
+        found.append(result)
+    return found
+
+def lookup(claim: str) -> Optional[VerificationResult]:
+    return lookup_many([claim])[0]
+
+def store(results: List[VerificationResult]):
+    """Adds adjudicated results to the semantic index (upsert by normalized claim)."""
+    collection = _get_collection()
+    results = [r for r in results if r.verdict in CACHEABLE_VERDICTS and not r.incomplete]
+    if collection is None or not results:
+        return
+
+    claims = [r.claim for r in results]
+    # Kept local to this call: the shared LRU may evict entries while a large batch is stored
+    embeddings = {c: _recall_embedding(c) for c in claims}
+    missing = [c for c, embedding in embeddings.items() if embedding is None]
+    if missing:
+        embeddings.update(zip(missing, retriever.get_embed_fn()(missing)))
+
+    expires_at = time.time() + SEMANTIC_CACHE_TTL
+    try:
+        collection.upsert(
+            ids=[_claim_id(c) for c in claims],
+            embeddings=[embeddings[c] for c in claims],
+            documents=claims,
+            metadatas=[{
+                "verdict": r.verdict,
+                "source_type": r.source_type or "",
+                "expires_at": expires_at,
+                "result": r.model_dump_json(exclude={"timings", "evidence_budget"}),
+            } for r in results]
+        )
+    except Exception as e:
+        logger.error("Semantic Cache Error: %s", e)
+
+def invalidate_semantic_cache():
+    """Drops the whole index. Called after the local collection is re-ingested."""
+    global _collection
+    try:
+        retriever.get_chroma_client().delete_collection(SEMANTIC_CACHE_COLLECTION)
+    except Exception:
+        pass # Nothing cached yet
+    _collection = None
+
+def get_semantic_cache_stats() -> dict:
+    lookups = _STATS["lookups"]
+    return {
+        **_STATS,
+        "hit_rate": _STATS["hits"] / lookups if lookups else 0.0,
+        "near_miss_rate": _STATS["near_misses"] / lookups if lookups else 0.0,
+        "threshold": SEMANTIC_CACHE_THRESHOLD,
+        "similarity_histogram": dict(sorted(_similarity_histogram.items())),
+        "recent_near_misses": list(_recent_near_misses),
+    }
@@ -0,0 +1,283 @@
+import os
+import time
+import asyncio
+import logging
+import argparse
+from contextlib import asynccontextmanager
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from models import ClaimRequest, BatchClaimRequest, VerificationResult
+from cache import normalize_text
+import agent
+import retriever
+import deadlines
+import telemetry
+import web_memory
+
+# Standalone async API around verify_claim / verify_claims.
+# - Identical claims (after normalization) that arrive while one is being verified wait on that
+#   single computation instead of starting their own.
+# - Admission is bounded and counted in claims (a batch weighs as many claims as it brings): at most
+#   SERVER_MAX_IN_FLIGHT claims are verified at once, SERVER_MAX_QUEUE wait, and anything beyond
+#   that is shed immediately with 503 + Retry-After.
+# - Every request has a deadline (SERVER_DEFAULT_TIMEOUT unless the body sets "timeout"). The
+#   pipeline runs against a slightly shorter deadline and answers with its best verdict so far
+#   (`incomplete` set) when a stage runs out of time. 504 is the backstop for a computation started
+#   by an earlier request with a longer deadline; it carries on for its other waiters.
+
+logger = logging.getLogger(__name__)
+
+SERVER_MAX_IN_FLIGHT = int(os.getenv("SERVER_MAX_IN_FLIGHT", "16"))
+SERVER_MAX_QUEUE = int(os.getenv("SERVER_MAX_QUEUE", "64"))
+SERVER_DEFAULT_TIMEOUT = float(os.getenv("SERVER_DEFAULT_TIMEOUT", "30"))
+# Upper bound for client-supplied deadlines and for any single computation
+SERVER_MAX_TIMEOUT = float(os.getenv("SERVER_MAX_TIMEOUT", "120"))
+SERVER_MAX_BATCH = int(os.getenv("SERVER_MAX_BATCH", "100"))
+SERVER_RETRY_AFTER = int(os.getenv("SERVER_RETRY_AFTER", "2"))
+# Share of the request deadline kept back for queueing slack and writing the response
+SERVER_DEADLINE_HEADROOM = float(os.getenv("SERVER_DEADLINE_HEADROOM", "0.1"))
+
+telemetry.describe("server_requests_total", "HTTP verification requests by endpoint and outcome.")
+telemetry.describe("server_coalesced_total", "Claims that joined an identical in-flight computation.")
+telemetry.describe("server_in_flight", "Claims currently being verified.")
+telemetry.describe("server_queued", "Admitted claims waiting for a slot.")
+
+class Overloaded(Exception):
+    pass
+
+class AdmissionController:
+    """Bounded admission, counted in claims: at most max_in_flight claims being verified plus max_queue
+    waiting. A batch weighs as many claims as it brings; one larger than a limit is counted at that limit,
+    so it still runs on an otherwise idle server."""
+
+    def __init__(self, max_in_flight: int = SERVER_MAX_IN_FLIGHT, max_queue: int = SERVER_MAX_QUEUE):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.running = 0
+        self.waiting = 0
+        self._waiters: Deque[tuple[int, asyncio.Future]] = deque()
+
+    def _queued_weight(self, claims: int) -> int:
+        return min(max(1, claims), self.max_in_flight + self.max_queue)
+
+    def _running_weight(self, claims: int) -> int:
+        return min(max(1, claims), self.max_in_flight)
+
+    def admit(self, claims: int = 1):
+        """Reserves queue room for `claims` claims, or raises Overloaded when that would exceed capacity."""
+        weight = self._queued_weight(claims)
+        if self.running + self.waiting + weight > self.max_in_flight + self.max_queue:
+            raise Overloaded(f"{self.running} running, {self.waiting} queued, {claims} requested")
+        self.waiting += weight
+        self._publish()
+
+    @asynccontextmanager
+    async def slot(self, claims: int = 1):
+        """Waits (first come, first served) until `claims` claims may run. Must follow admit(claims)."""
+        weight = self._running_weight(claims)
+        try:
+            if self._waiters or self.running + weight > self.max_in_flight:
+                granted = asyncio.get_running_loop().create_future()
+                entry = (weight, granted)
+                self._waiters.append(entry)
+                try:
+                    await granted
+                except asyncio.CancelledError:
+                    if granted.done() and not granted.cancelled():
+                        self.running -= weight # granted just before the cancellation
+                    else:
+                        self._waiters.remove(entry)
+                    self._wake()
+                    raise
+            else:
+                self.running += weight
+        finally:
+            self.waiting -= self._queued_weight(claims)
+            self._publish()
+        try:
+            yield
+        finally:
+            self.running -= weight
+            self._wake()
+            self._publish()
+
+    def _wake(self):
+        while self._waiters and self.running + self._waiters[0][0] <= self.max_in_flight:
+            weight, granted = self._waiters.popleft()
+            if not granted.done():
+                self.running += weight
+                granted.set_result(None)
+
+    def _publish(self):
+        telemetry.set_gauge("server_in_flight", self.running)
+        telemetry.set_gauge("server_queued", self.waiting)
+
+    def stats(self) -> dict:
+        return {"running": self.running, "queued": self.waiting, "max_in_flight": self.max_in_flight, "max_queue": self.max_queue}
+
+class ClaimCoalescer:
+    """Runs each distinct (normalized) claim at most once at a time; later arrivals share the future."""
+
+    def __init__(self, admission: AdmissionController):
+        self.admission = admission
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._tasks = set()
+
+    def futures_for(self, claims: List[str], timeout: float = SERVER_DEFAULT_TIMEOUT) -> List[asyncio.Future]:
+        """One future per claim. New claims are admitted together and verified in one verify_claims call,
+        against a pipeline deadline derived from timeout (the requester's deadline)."""
+        loop = asyncio.get_running_loop()
+        futures, new = {}, {}
+        for claim in claims:
+            key = normalize_text(claim)
+            if key in futures:
+                continue
+            existing = self._in_flight.get(key)
+            if existing is not None:
+                telemetry.inc("server_coalesced_total")
+                futures[key] = existing
+            else:
+                new[key] = claim
+                futures[key] = None
+
+        if new:
+            self.admission.admit(len(new))
+            for key in new:
+                future = loop.create_future()
+                # Waiters may all have timed out; do not log the outcome as "never retrieved"
+                future.add_done_callback(lambda f: f.cancelled() or f.exception())
+                self._in_flight[key] = futures[key] = future
+            task = asyncio.create_task(self._run(new, timeout * (1 - SERVER_DEADLINE_HEADROOM), time.monotonic()))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return [futures[normalize_text(claim)] for claim in claims]
+
+    async def _run(self, new: Dict[str, str], deadline: float, admitted_at: float):
+        keys, claims = list(new), list(new.values())
+        try:
+            async with self.admission.slot(len(claims)):
+                # Time spent queued for a slot counts against the deadline
+                remaining = max(0.001, deadline - (time.monotonic() - admitted_at))
+                if len(claims) == 1:
+                    results = [await asyncio.wait_for(agent.verify_claim(claims[0], timeout=remaining), SERVER_MAX_TIMEOUT)]
+                else:
+                    results = await asyncio.wait_for(agent.verify_claims(claims, timeout=remaining), SERVER_MAX_TIMEOUT)
+            for key, result in zip(keys, results):
+                self._in_flight[key].set_result(result)
+        except BaseException as e:
+            for key in keys:
+                if not self._in_flight[key].done():
+                    self._in_flight[key].set_exception(e if isinstance(e, Exception) else RuntimeError("Verification cancelled"))
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            for key in keys:
+                self._in_flight.pop(key, None)
+
+    async def shutdown(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+def _timeout(requested: Optional[float]) -> float:
+    if requested is None or requested <= 0:
+        return SERVER_DEFAULT_TIMEOUT
+    return min(requested, SERVER_MAX_TIMEOUT)
+
+def _overloaded(endpoint: str, e: Overloaded) -> HTTPException:
+    telemetry.inc("server_requests_total", endpoint=endpoint, outcome="shed")
+    logger.warning("Shedding %s request: %s", endpoint, e)
+    return HTTPException(status_code=503, detail="Server overloaded, retry later.", headers={"Retry-After": str(SERVER_RETRY_AFTER)})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.admission = AdmissionController()
+    app.state.coalescer = ClaimCoalescer(app.state.admission)
+    retriever.warm_up(background=True)
+    yield
+    await app.state.coalescer.shutdown()
+    await retriever.close_http_client()
+
+app = FastAPI(title="Adaptive Truth", lifespan=lifespan)
+
+@app.post("/verify", response_model=VerificationResult)
+async def verify(request: ClaimRequest):
+    if not request.claim.strip():
+        raise HTTPException(status_code=422, detail="Empty claim.")
+    try:
+        [future] = app.state.coalescer.futures_for([request.claim], _timeout(request.timeout))
+    except Overloaded as e:
+        raise _overloaded("verify", e)
+
+    try:
+        result = await asyncio.wait_for(asyncio.shield(future), _timeout(request.timeout))
+    except asyncio.TimeoutError:
+        telemetry.inc("server_requests_total", endpoint="verify", outcome="timeout")
+        raise HTTPException(status_code=504, detail="Verification deadline exceeded.")
+    except Exception as e:
+        telemetry.inc("server_requests_total", endpoint="verify", outcome="error")
+        logger.error("Verification failed: %s", e)
+        raise HTTPException(status_code=500, detail=f"Verification failed: {e}")
+    telemetry.inc("server_requests_total", endpoint="verify", outcome="incomplete" if result.incomplete else "ok")
+    # Coalesced waiters share one result object; the echoed claim is each caller's own text
+    return result.model_copy(update={"claim": request.claim})
+
+@app.post("/verify/batch", response_model=List[VerificationResult])
+async def verify_batch(request: BatchClaimRequest):
+    """Results in input order. Blank claims and claims that miss the deadline or fail come back with verdict "Error"."""
+    claims = [c for c in request.claims if c.strip()]
+    if len(claims) > SERVER_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {SERVER_MAX_BATCH} claims per batch.")
+    futures = []
+    if claims:
+        try:
+            futures = app.state.coalescer.futures_for(claims, _timeout(request.timeout))
+        except Overloaded as e:
+            raise _overloaded("batch", e)
+        await asyncio.wait(set(futures), timeout=_timeout(request.timeout))
+
+    results = []
+    pending = iter(futures)
+    for claim in request.claims:
+        if not claim.strip():
+            results.append(VerificationResult(claim=claim, verdict="Error", reasoning="Empty claim.", evidence=[]))
+            continue
+        future = next(pending)
+        if not future.done():
+            reasoning = "Deadline exceeded before a verdict was reached."
+        elif future.exception() is not None:
+            reasoning = f"Verification failed: {future.exception()}"
+        else:
+            results.append(future.result().model_copy(update={"claim": claim}))
+            continue
+        results.append(VerificationResult(claim=claim, verdict="Error", reasoning=reasoning, evidence=[]))
+    outcome = "ok" if all(r.verdict != "Error" for r in results) else "partial"
+    telemetry.inc("server_requests_total", endpoint="batch", outcome=outcome)
+    return results
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok",
+        "local_store_error": retriever.get_init_error(),
+        "admission": app.state.admission.stats(),
+        "circuits": deadlines.get_breaker_stats(),
+        "web_fallback_rate": web_memory.get_web_memory_stats()["fallback_rate"],
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return telemetry.render_prometheus()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Adaptive Truth verification API.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    import uvicorn
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s: %(message)s")
+    # A single event loop per process: coalescing and admission limits are per worker
+    uvicorn.run(app, host=args.host, port=args.port)
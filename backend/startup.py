@@ -0,0 +1,21 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Wall-clock seconds spent importing / initializing each heavy component, in first-use order
+STARTUP_TIMINGS: dict = {}
+_lock = threading.Lock()
+
+@contextmanager
+def timed(component: str):
+    """Records how long the first successful initialization of a component took."""
+    start = time.perf_counter()
+    yield
+    with _lock:
+        STARTUP_TIMINGS.setdefault(component, time.perf_counter() - start)
+
+def startup_report() -> dict:
+    with _lock:
+        timings = {name: round(seconds, 3) for name, seconds in STARTUP_TIMINGS.items()}
+    timings["total"] = round(sum(timings.values()), 3)
+    return timings
@@ -0,0 +1,187 @@
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Optional, Tuple
+
+# In-process metrics (counters + histograms) with a Prometheus text exporter, and lightweight
+# spans that time pipeline stages. Spans also feed the per-claim timing breakdown of the
+# currently active trace (see start_trace), which survives asyncio tasks and to_thread hops.
+
+METRIC_PREFIX = "adaptive_truth_"
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144)
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, tuple], float] = {}
+_histograms: Dict[Tuple[str, tuple], dict] = {}
+_gauges: Dict[Tuple[str, tuple], float] = {}
+_help: Dict[str, str] = {}
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("verification_trace", default=None)
+
+def _key(name: str, labels: dict) -> Tuple[str, tuple]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def describe(name: str, text: str):
+    _help[name] = text
+
+def inc(name: str, value: float = 1.0, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+def set_gauge(name: str, value: float, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = float(value)
+
+def observe(name: str, value: float, buckets: tuple = SECONDS_BUCKETS, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(hist["buckets"]):
+            if value <= bound:
+                hist["counts"][i] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+
+@contextmanager
+def span(stage: str, **labels):
+    """Times a pipeline stage: stage_seconds histogram, error counter and the active trace."""
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        record_stage(stage, time.perf_counter() - start, error=status == "error", **labels)
+
+def record_stage(stage: str, seconds: float, error: bool = False, **labels):
+    """What span records, for stages timed by hand (e.g. interleaved with a consumer, as in streaming)."""
+    observe("stage_seconds", seconds, stage=stage, **labels)
+    if error:
+        inc("stage_errors_total", stage=stage, **labels)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace[stage] = trace.get(stage, 0.0) + seconds * 1000
+
+def start_trace() -> contextvars.Token:
+    """Begins collecting per-stage milliseconds for the current claim (this task and its children)."""
+    return _current_trace.set({})
+
+def end_trace(token: contextvars.Token) -> Dict[str, float]:
+    trace = _current_trace.get() or {}
+    try:
+        _current_trace.reset(token)
+    except ValueError:
+        pass # ended from another context, e.g. an abandoned async generator finalized by the loop
+    return {stage: round(ms, 2) for stage, ms in trace.items()}
+
+def snapshot() -> dict:
+    """Plain-dict view of every metric (for logs, tests and benchmarks)."""
+    with _lock:
+        counters = {_format_name(name, labels): value for (name, labels), value in _counters.items()}
+        gauges = {_format_name(name, labels): value for (name, labels), value in _gauges.items()}
+        histograms = {
+            _format_name(name, labels): {"count": h["count"], "sum": round(h["sum"], 6)}
+            for (name, labels), h in _histograms.items()
+        }
+    return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+def _format_labels(labels: tuple, extra: Optional[tuple] = None) -> str:
+    items = list(labels) + (list(extra) if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+def _format_name(name: str, labels: tuple) -> str:
+    return name + _format_labels(labels)
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        counter_names = sorted({name for name, _ in _counters})
+        for name in counter_names:
+            full = METRIC_PREFIX + name
+            if name in _help:
+                lines.append(f"# HELP {full} {_help[name]}")
+            lines.append(f"# TYPE {full} counter")
+            for (n, labels), value in sorted(_counters.items()):
+                if n == name:
+                    lines.append(f"{full}{_format_labels(labels)} {value}")
+        gauge_names = sorted({name for name, _ in _gauges})
+        for name in gauge_names:
+            full = METRIC_PREFIX + name
+            if name in _help:
+                lines.append(f"# HELP {full} {_help[name]}")
+            lines.append(f"# TYPE {full} gauge")
+            for (n, labels), value in sorted(_gauges.items()):
+                if n == name:
+                    lines.append(f"{full}{_format_labels(labels)} {value}")
+        histogram_names = sorted({name for name, _ in _histograms})
+        for name in histogram_names:
+            full = METRIC_PREFIX + name
+            if name in _help:
+                lines.append(f"# HELP {full} {_help[name]}")
+            lines.append(f"# TYPE {full} histogram")
+            for (n, labels), h in sorted(_histograms.items()):
+                if n != name:
+                    continue
+                for bound, count in zip(h["buckets"], h["counts"]):
+                    lines.append(f"{full}_bucket{_format_labels(labels, (('le', bound),))} {count}")
+                lines.append(f"{full}_bucket{_format_labels(labels, (('le', '+Inf'),))} {h['count']}")
+                lines.append(f"{full}_sum{_format_labels(labels)} {h['sum']}")
+                lines.append(f"{full}_count{_format_labels(labels)} {h['count']}")
+    return "\n".join(lines) + "\n"
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+_metrics_server: Optional[ThreadingHTTPServer] = None
+
+def start_metrics_server(port: int = int(os.getenv("METRICS_PORT", "9464")), host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serves /metrics for Prometheus on a background thread (idempotent)."""
+    global _metrics_server
+    if _metrics_server is not None:
+        return _metrics_server
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    _metrics_server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _metrics_server
+
+describe("stage_seconds", "Wall time per pipeline stage.")
+describe("stage_errors_total", "Pipeline stages that raised.")
+describe("claims_total", "Verified claims by how the verdict was reached.")
+describe("claim_seconds", "End-to-end verify_claim latency by how the verdict was reached.")
+describe("llm_calls_total", "Adjudicator LLM requests.")
+describe("llm_prompt_chars", "Adjudicator prompt size in characters.")
+describe("llm_response_chars", "Adjudicator response size in characters.")
+describe("llm_first_token_seconds", "Time to the first streamed adjudicator token.")
+describe("web_searches_total", "Web search lookups by result (network, cache, error, unavailable).")
+describe("local_search_total", "Local retrieval queries by path (exact, lexical, dense).")
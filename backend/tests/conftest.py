@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+
+# Backend modules import each other by bare name (they run from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Module-level caches (cache/*.sqlite) are created relative to the working directory on first use
+os.chdir(tempfile.mkdtemp(prefix="adaptive-truth-tests-"))
+
+import cache
+import retriever
+import telemetry
+
+class StubResponse:
+    def __init__(self, status: int = 200, body: bytes = b"", headers: dict = None, delay: float = 0.0):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+        self.delay = delay
+
+class StubServer:
+    """Local HTTP server answering each path from a script: a list of StubResponses played in
+    order (the last one repeats) or a callable taking the request headers. Requests are recorded
+    with lower-cased header names."""
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                stub.requests.append((path, {k.lower(): v for k, v in self.headers.items()}))
+                route = stub.routes.get(path)
+                if route is None:
+                    response = StubResponse(404)
+                elif callable(route):
+                    response = route(self.headers)
+                else:
+                    response = route.pop(0) if len(route) > 1 else route[0]
+                if response.delay:
+                    time.sleep(response.delay)
+                try:
+                    self.send_response(response.status)
+                    for name, value in response.headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(response.body)))
+                    self.end_headers()
+                    if response.body:
+                        self.wfile.write(response.body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass # client gave up (timeout tests)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def hits(self, path: str) -> list:
+        return [headers for p, headers in self.requests if p == path]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class Clock:
+    """Stands in for time.time in cache.py, so TTLs can be stepped through."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    return clock
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    yield server
+    server.close()
+
+def run(coro):
+    """Runs a coroutine on a fresh loop and closes the shared HTTP pool bound to it."""
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await retriever.close_http_client()
+    return asyncio.run(_main())
+
+def counter(name: str, **labels) -> float:
+    return telemetry.snapshot()["counters"].get(telemetry._format_name(name, telemetry._key(name, labels)[1]), 0.0)
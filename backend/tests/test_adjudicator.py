@@ -0,0 +1,95 @@
+import pytest
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+import deadlines
+from adjudicator import Adjudicator, split_batch_response
+from models import Evidence
+from conftest import run
+
+def _items(*claims) -> list:
+    return [(claim, [Evidence(text=f"Evidence for {claim}", source="Local (ChromaDB)", confidence=0.8)], "Local") for claim in claims]
+
+def _block(n: int, verdict: str) -> str:
+    return f"### Claim {n}\nVerdict: {verdict}\nReasoning: Reason {n}."
+
+class BadRequest(Exception):
+    code = 400
+
+class FailingChatModel:
+    """Chat model whose batched call fails with a non-retryable error; single-claim calls answer."""
+
+    def __init__(self, answer: str):
+        self.answer = answer
+        self.calls = 0
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        if "numbered claims" in messages[0].content:
+            raise BadRequest("malformed request")
+        return AIMessage(content=self.answer)
+
+@pytest.fixture(autouse=True)
+def fresh_breaker(monkeypatch):
+    monkeypatch.setattr(deadlines, "LLM_BREAKER", deadlines.CircuitBreaker("llm"))
+
+def test_split_batch_response():
+    content = "\n".join([
+        "Here are the verdicts.",
+        "### Claim 1", "Verdict: Supported", "Reasoning: One.",
+        "Claim 2:", "Verdict: Refuted", "Reasoning: Two.",
+        "Claim 2", "Verdict: Supported", # a repeated header keeps the first block
+        "### Claim 7", "Verdict: Supported", # out of range
+    ])
+    blocks = split_batch_response(content, 3)
+
+    assert sorted(blocks) == [0, 1]
+    assert blocks[0] == "Verdict: Supported\nReasoning: One."
+    assert blocks[1] == "Verdict: Refuted\nReasoning: Two."
+
+def test_packed_response_is_split_per_claim():
+    llm = FakeListChatModel(responses=["\n".join([_block(1, "Supported"), _block(2, "Refuted"), _block(3, "NotEnoughInfo")])])
+    adjudicator = Adjudicator(llm=llm, batch_size=8)
+    results = run(adjudicator.adjudicate_many(_items("a is true", "b is true", "c is true")))
+
+    assert [r.claim for r in results] == ["a is true", "b is true", "c is true"]
+    assert [r.verdict for r in results] == ["Supported", "Refuted", "NotEnoughInfo"]
+    assert results[1].reasoning == "Reason 2."
+    stats = adjudicator.get_stats()
+    assert (stats["llm_calls"], stats["batched_calls"], stats["single_retries"], stats["claims"]) == (1, 1, 0, 3)
+    assert stats["llm_calls_per_claim"] == pytest.approx(1 / 3)
+
+@pytest.mark.parametrize("second_block", ["", "### Claim 2\nI am not sure about this one."])
+def test_missing_or_garbled_block_is_retried_alone(second_block):
+    batched = "\n".join([_block(1, "Supported"), second_block, _block(3, "Refuted")])
+    llm = FakeListChatModel(responses=[batched, "Verdict: Refuted\nReasoning: Retried on its own."])
+    adjudicator = Adjudicator(llm=llm, batch_size=8)
+    results = run(adjudicator.adjudicate_many(_items("a", "b", "c")))
+
+    assert [r.verdict for r in results] == ["Supported", "Refuted", "Refuted"]
+    assert results[1].reasoning == "Retried on its own."
+    stats = adjudicator.get_stats()
+    assert (stats["llm_calls"], stats["batched_calls"], stats["single_retries"], stats["claims"]) == (2, 1, 1, 3)
+
+def test_failed_batched_call_falls_back_to_single_claims():
+    llm = FailingChatModel("Verdict: Supported\nReasoning: Fine on its own.")
+    adjudicator = Adjudicator(llm=llm, batch_size=8)
+    results = run(adjudicator.adjudicate_many(_items("a", "b")))
+
+    assert [r.verdict for r in results] == ["Supported", "Supported"]
+    assert llm.calls == 3
+    stats = adjudicator.get_stats()
+    assert (stats["llm_calls"], stats["batched_calls"], stats["single_retries"]) == (3, 0, 2)
+
+def test_claims_are_packed_up_to_batch_size_and_empty_evidence_skips_the_llm():
+    llm = FakeListChatModel(responses=[
+        "\n".join([_block(1, "Supported"), _block(2, "Supported")]),
+        "Verdict: Refuted\nReasoning: Last one.",
+    ])
+    adjudicator = Adjudicator(llm=llm, batch_size=2)
+    items = _items("a", "b") + [("no evidence", [], "Local")] + _items("c")
+    results = run(adjudicator.adjudicate_many(items))
+
+    assert [r.verdict for r in results] == ["Supported", "Supported", "NotEnoughInfo", "Refuted"]
+    assert results[2].reasoning == "No evidence found in Local."
+    stats = adjudicator.get_stats()
+    assert (stats["llm_calls"], stats["batched_calls"], stats["claims"]) == (2, 1, 4)
@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from langchain_core.language_models import FakeListChatModel
+import agent
+import adjudicator
+import deadlines
+import verdict_cache
+from cache import SQLiteCache
+from models import Evidence, VerificationResult
+from conftest import run
+
+NOT_ENOUGH_INFO = "Verdict: NotEnoughInfo\nReasoning: The local evidence does not mention it."
+
+def _local_evidence(claim: str) -> list:
+    return [Evidence(text=f"Something unrelated to {claim}", source="Local (ChromaDB)", confidence=0.2)]
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    """Agent wired to a fake LLM, stubbed local search and a temporary verdict cache."""
+    monkeypatch.setenv("GOOGLE_SEARCH_API_KEY", "test-key")
+    monkeypatch.setenv("GOOGLE_CSE_ID", "test-cse")
+    monkeypatch.setattr(agent, "search_local", _local_evidence)
+    monkeypatch.setattr(agent, "search_local_batch", lambda claims: [_local_evidence(c) for c in claims])
+    monkeypatch.setattr(verdict_cache, "_cache", SQLiteCache(str(tmp_path / "verdicts.sqlite")))
+    monkeypatch.setattr(deadlines, "LLM_BREAKER", deadlines.CircuitBreaker("llm"))
+    monkeypatch.setattr(deadlines, "SEARCH_BREAKER", deadlines.CircuitBreaker("web_search", failure_threshold=1, reset_seconds=60))
+    llm = FakeListChatModel(responses=[NOT_ENOUGH_INFO])
+    adjudicator.set_adjudicator(adjudicator.Adjudicator(llm=llm, batch_size=1))
+    yield adjudicator.get_adjudicator()
+    adjudicator.set_adjudicator(None)
+
+def test_open_search_circuit_returns_the_local_verdict_incomplete(pipeline):
+    deadlines.SEARCH_BREAKER.record_failure()
+    result = run(agent.verify_claim("The moon is made of cheese."))
+
+    assert result.verdict == "NotEnoughInfo"
+    assert result.source_type == "Local"
+    assert "circuit open" in result.incomplete
+    assert pipeline.get_stats()["llm_calls"] == 1 # no second adjudication on the same local evidence
+    assert verdict_cache.get_cached_verdict("The moon is made of cheese.") is None
+
+def test_open_search_circuit_in_a_batch_is_not_cached(pipeline):
+    deadlines.SEARCH_BREAKER.record_failure()
+    claims = ["First claim about cheese.", "Second claim about cheese."]
+    results = run(agent.verify_claims(claims))
+
+    assert [r.claim for r in results] == claims
+    assert all(r.verdict == "NotEnoughInfo" and r.source_type == "Local" and r.incomplete for r in results)
+    assert pipeline.get_stats()["llm_calls"] == 2
+    assert all(verdict_cache.get_cached_verdict(c) is None for c in claims)
+
+class FakeAdjudicator:
+    """adjudicate_many stand-in: later chunks finish first, and a chunk holding a "boom" claim raises."""
+
+    batch_size = 2
+
+    def __init__(self):
+        self.chunks = []
+
+    async def adjudicate_many(self, items):
+        self.chunks.append([claim for claim, _, _ in items])
+        await asyncio.sleep(0.05 / len(self.chunks))
+        if any("boom" in claim for claim, _, _ in items):
+            raise RuntimeError("LLM exploded")
+        return [VerificationResult(claim=claim, verdict="Supported", reasoning=f"Checked {claim}.", evidence=evidence, source_type=source_type)
+                for claim, evidence, source_type in items]
+
+@pytest.fixture
+def fake_adjudicator(pipeline):
+    fake = FakeAdjudicator()
+    adjudicator.set_adjudicator(fake)
+    return fake
+
+def test_batch_results_come_back_in_input_order(fake_adjudicator):
+    claims = [f"Claim number {i}." for i in range(7)]
+    results = run(agent.verify_claims(claims, max_concurrency=4))
+
+    assert [r.claim for r in results] == claims
+    assert [r.reasoning for r in results] == [f"Checked {c}." for c in claims]
+    assert all(r.evidence[0].text == f"Something unrelated to {c}" for r, c in zip(results, claims))
+    assert len(fake_adjudicator.chunks) == 4
+
+def test_failing_chunk_only_affects_its_own_claims(fake_adjudicator):
+    claims = ["First.", "Second.", "Third goes boom.", "Fourth.", "Fifth."]
+    results = run(agent.verify_claims(claims))
+
+    assert [r.claim for r in results] == claims
+    assert [r.verdict for r in results] == ["Supported", "Supported", "Error", "Error", "Supported"]
+    assert "LLM exploded" in results[2].reasoning
+    assert verdict_cache.get_cached_verdict("Fourth.") is None
+    assert verdict_cache.get_cached_verdict("Fifth.").verdict == "Supported"
@@ -0,0 +1,57 @@
+from cache import SQLiteCache
+
+def test_entry_expires_after_ttl(tmp_path, clock):
+    store = SQLiteCache(str(tmp_path / "c.sqlite"), default_ttl=60)
+    store.set("short", {"v": 1}, ttl=10)
+    store.set("default", {"v": 2})
+
+    clock.now += 9
+    assert store.get("short") == {"v": 1}
+    clock.now += 2
+    assert store.get("short") is None
+    assert store.get("default") == {"v": 2}
+    clock.now += 60
+    assert store.get("default") is None
+
+    assert len(store) == 0 # expired entries are deleted on read
+    assert store.stats()["hits"] == 2
+    assert store.stats()["misses"] == 2
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    store = SQLiteCache(str(tmp_path / "c.sqlite"), max_entries=2)
+    store.set("a", 1)
+    clock.now += 1
+    store.set("b", 2)
+    clock.now += 1
+    assert store.get("a") == 1 # a is now more recent than b
+    clock.now += 1
+    store.set("c", 3)
+
+    assert store.get("b") is None
+    assert store.get("a") == 1
+    assert store.get("c") == 3
+    assert store.stats()["evictions"] == 1
+
+def test_expired_entries_are_evicted_before_live_ones(tmp_path, clock):
+    store = SQLiteCache(str(tmp_path / "c.sqlite"), max_entries=2)
+    store.set("stale", 1, ttl=5)
+    clock.now += 1
+    store.set("live", 2)
+    clock.now += 10
+    store.set("new", 3)
+
+    assert len(store) == 2
+    assert store.get("live") == 2
+    assert store.get("new") == 3
+
+def test_entries_persist_across_instances(tmp_path, clock):
+    path = str(tmp_path / "c.sqlite")
+    SQLiteCache(path).set("key", ["value"])
+    assert SQLiteCache(path).get("key") == ["value"]
+
+def test_file_is_created_on_first_use(tmp_path):
+    path = tmp_path / "lazy" / "c.sqlite"
+    store = SQLiteCache(str(path))
+    assert not path.parent.exists()
+    assert store.get("missing") is None
+    assert path.exists()
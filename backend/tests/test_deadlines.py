@@ -0,0 +1,77 @@
+import time
+import asyncio
+import pytest
+import deadlines
+from adjudicator import _retryable_llm_error
+from deadlines import CircuitBreaker, CircuitOpen, DeadlineExceeded
+
+class StatusError(Exception):
+    def __init__(self, code: int):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(deadlines, "RETRY_BASE_DELAY", 0.001)
+
+def test_breaker_opens_after_threshold_and_half_opens_after_reset():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow() # the half-open trial
+    assert not breaker.allow() # only one at a time
+    breaker.release()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+def test_call_retries_until_success():
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise StatusError(503)
+        return "ok"
+
+    breaker = CircuitBreaker("test")
+    assert asyncio.run(deadlines.call("test", breaker, flaky)) == "ok"
+    assert len(attempts) == 3
+    assert breaker.state == "closed" and breaker.failures == 0
+
+@pytest.mark.parametrize("code, calls", [(400, 1), (401, 1), (429, 1), (408, 3), (503, 3)])
+def test_only_transient_llm_errors_are_retried(code, calls):
+    attempts = []
+
+    async def fail():
+        attempts.append(1)
+        raise StatusError(code)
+
+    breaker = CircuitBreaker("test", failure_threshold=10)
+    with pytest.raises(StatusError):
+        asyncio.run(deadlines.call("test", breaker, fail, retryable=_retryable_llm_error))
+    assert len(attempts) == calls
+    assert breaker.failures == (calls if calls > 1 else 0)
+
+def test_open_breaker_fails_fast():
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    breaker.record_failure()
+
+    async def never():
+        raise AssertionError("called through an open circuit")
+
+    with pytest.raises(CircuitOpen):
+        asyncio.run(deadlines.call("test", breaker, never))
+
+def test_zero_deadline_leaves_no_time():
+    token = deadlines.start_deadline(0)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            deadlines.check_time("web_search")
+    finally:
+        deadlines.end_deadline(token)
+    assert deadlines.current_deadline() is None
@@ -0,0 +1,72 @@
+import pytest
+import evidence_budget
+from evidence_budget import budget_many, dedupe, estimate_tokens, evidence_line, pack
+from models import Evidence
+
+def _e(text: str, confidence: float = 0.5, source: str = "Local (ChromaDB)") -> Evidence:
+    return Evidence(text=text, source=source, confidence=confidence)
+
+def _tokens(evidence) -> int:
+    return sum(estimate_tokens(evidence_line(e)) for e in evidence)
+
+LONG = " ".join(f"word{i}" for i in range(200))
+
+def test_dedupe_keeps_the_most_confident_copy_in_order():
+    evidence = [
+        _e("The Eiffel Tower is in Paris.", 0.6),
+        _e("Mount Everest is the highest mountain.", 0.7),
+        _e("the eiffel tower is in paris", 0.9),
+        _e("The Eiffel Tower, in Paris, France.", 0.8), # contains every term of the others
+    ]
+    kept = dedupe(evidence)
+    assert [e.confidence for e in kept] == [0.7, 0.9]
+
+def test_everything_fits():
+    evidence = [_e("Short one."), _e("Short two.")]
+    packed, truncated = pack(evidence, budget=100)
+    assert packed == evidence and truncated == 0
+
+def test_overflowing_item_is_truncated_at_a_word_boundary():
+    evidence = [_e("Short one."), _e(LONG)]
+    packed, truncated = pack(evidence, budget=60)
+
+    assert truncated == 1
+    assert packed[0] == evidence[0]
+    assert packed[1].text.endswith("…")
+    assert LONG.startswith(packed[1].text[:-1]) and packed[1].text[-2] != " "
+    assert _tokens(packed) <= 60
+
+def test_item_is_dropped_when_too_little_room_is_left():
+    evidence = [_e(LONG[:300]), _e(LONG[:300]), _e("Tail.")]
+    budget = _tokens(evidence[:1]) + evidence_budget.MIN_TRUNCATED_TOKENS - 1
+    packed, truncated = pack(evidence, budget)
+    assert packed == [evidence[0], evidence[2]] # a smaller later item still fits
+    assert truncated == 0
+
+def test_first_item_is_always_kept():
+    packed, truncated = pack([_e(LONG), _e("Second.")], budget=0)
+    assert len(packed) == 1 and truncated == 1
+    assert _tokens(packed) <= evidence_budget.MIN_TRUNCATED_TOKENS
+
+def test_budget_many_reports_what_was_removed(monkeypatch):
+    monkeypatch.setattr(evidence_budget, "EVIDENCE_RERANK", False)
+    evidence = [
+        _e("Local DB not initialized.", 0.0, source="System"),
+        _e("The Eiffel Tower is in Paris.", 0.6),
+        _e("the eiffel tower is in paris", 0.9),
+        _e("Mount Everest is the highest mountain.", 0.7),
+    ]
+    [(packed, report)] = budget_many(["Where is the Eiffel Tower?"], [evidence], budget=100)
+
+    assert [e.confidence for e in packed] == [0.9, 0.7] # confidence order
+    assert report["items_before"] == 4 and report["items_after"] == 2
+    assert report["dropped_system"] == 1 and report["duplicates"] == 1
+    assert report["tokens_saved"] == report["tokens_before"] - report["tokens_after"]
+
+@pytest.mark.parametrize("budget, expected", [(None, 2), (0, 1)])
+def test_explicit_zero_budget_is_honoured(monkeypatch, budget, expected):
+    monkeypatch.setattr(evidence_budget, "EVIDENCE_RERANK", False)
+    monkeypatch.setattr(evidence_budget, "EVIDENCE_TOKEN_BUDGET", 1000)
+    [(packed, report)] = budget_many(["claim"], [[_e(LONG, 0.9), _e("Mount Everest is high.", 0.5)]], budget=budget)
+    assert len(packed) == expected
+    assert report["truncated"] == (budget == 0)
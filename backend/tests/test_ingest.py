@@ -0,0 +1,75 @@
+import os
+import json
+import pytest
+import embedding_service
+import ingest
+
+class Embedder:
+    """Records every batch it embeds; raises on call number `fail_on` to simulate a crash mid-run."""
+
+    def __init__(self, fail_on: int = 0):
+        self.batches = []
+        self.fail_on = fail_on
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        if len(self.batches) == self.fail_on:
+            raise RuntimeError("embedding worker died")
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+    @property
+    def documents(self) -> list:
+        return [t for batch in self.batches for t in batch]
+
+def _claims(count: int) -> list:
+    return [f"Fact number {i} is true." for i in range(count)]
+
+@pytest.fixture
+def dataset(monkeypatch, tmp_path):
+    """Ingestion into a temporary Chroma store, with the model and index export stubbed out."""
+    monkeypatch.setattr(ingest, "CHROMA_DB_PATH", str(tmp_path / "chroma"))
+    monkeypatch.setattr(ingest, "CHECKPOINT_FILE", str(tmp_path / "chroma" / "checkpoint.json"))
+    monkeypatch.setattr(ingest, "LEXICAL_INDEX_DIR", str(tmp_path / "lexical"))
+    monkeypatch.setattr(ingest, "refresh_export", lambda collection, path: None)
+    monkeypatch.setattr(ingest, "invalidate_verdict_cache", lambda: None)
+    monkeypatch.setattr(ingest, "invalidate_semantic_cache", lambda: None)
+    monkeypatch.setattr(embedding_service, "collection_embedding_function", lambda: None)
+    path = tmp_path / "claims.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for i, claim in enumerate(_claims(10)):
+            f.write(json.dumps({"id": i, "claim": claim, "label": "SUPPORTS"}) + "\n")
+        f.write(json.dumps({"id": 99, "claim": "Refuted.", "label": "REFUTES"}) + "\n")
+    return str(path)
+
+def _ingest(monkeypatch, path: str, embedder: Embedder, **kwargs) -> dict:
+    monkeypatch.setattr(embedding_service, "get_embedder", lambda: embedder)
+    return ingest.ingest_data(path, embed_workers=1, batch_size=2, **kwargs)
+
+def test_interrupted_run_resumes_after_the_last_stored_batch(monkeypatch, dataset):
+    with pytest.raises(RuntimeError, match="embedding worker died"):
+        _ingest(monkeypatch, dataset, Embedder(fail_on=4))
+    with open(ingest.CHECKPOINT_FILE, encoding="utf-8") as f:
+        assert json.load(f)["rows_done"] == 6 # three full batches stored before the crash
+
+    resumed = Embedder()
+    report = _ingest(monkeypatch, dataset, resumed)
+
+    assert resumed.documents == _claims(10)[6:]
+    assert report["rows_upserted"] == 4
+    assert report["rows_unchanged"] == 0 # stored rows were never even re-read
+    assert not os.path.exists(ingest.CHECKPOINT_FILE)
+
+def test_unchanged_rows_are_skipped_by_content_hash(monkeypatch, dataset):
+    _ingest(monkeypatch, dataset, Embedder())
+    again = Embedder()
+    report = _ingest(monkeypatch, dataset, again)
+
+    assert again.documents == []
+    assert (report["rows_upserted"], report["rows_unchanged"]) == (0, 10)
+
+def test_no_resume_starts_over(monkeypatch, dataset):
+    with pytest.raises(RuntimeError):
+        _ingest(monkeypatch, dataset, Embedder(fail_on=2))
+
+    report = _ingest(monkeypatch, dataset, Embedder(), resume=False)
+    assert (report["rows_upserted"], report["rows_unchanged"]) == (8, 2)
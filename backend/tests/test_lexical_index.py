@@ -0,0 +1,122 @@
+import pickle
+import numpy as np
+import pytest
+import lexical_index
+import retriever
+from lexical_index import LexicalIndex, SegmentWriter, _build_segment
+from models import Evidence
+
+DOCUMENTS = [
+    "The Eiffel Tower is located in Paris.",
+    "Paris is the capital city of France.",
+    "The Great Wall of China is visible from low orbit.",
+    "Mount Everest is the highest mountain above sea level.",
+    "The Amazon river flows through Brazil and Peru.",
+]
+IDS = [f"row-{i}" for i in range(len(DOCUMENTS))]
+
+def _documents(index: LexicalIndex, hits) -> list:
+    return [index.documents[doc] for doc, _, _ in hits]
+
+def test_later_segment_replaces_a_reingested_id():
+    first = _build_segment(IDS[:3], DOCUMENTS[:3])
+    second = _build_segment(["row-1", "row-9"], ["Paris is the capital and largest city of France.", "Kyoto was the capital of Japan."])
+    index = LexicalIndex.from_segments([first, second])
+
+    assert index.count == 4
+    assert sorted(index.ids) == ["row-0", "row-1", "row-2", "row-9"]
+    assert index.exact_match(DOCUMENTS[1]) is None # the replaced text is gone, from every table
+    assert index.exact_match("paris is the capital and LARGEST city of france") == index.ids.index("row-1")
+    assert DOCUMENTS[1] not in _documents(index, index.search("capital city France", k=10))
+    # Scores match an index built from the surviving rows directly
+    rebuilt = LexicalIndex.build(index.documents, index.ids)
+    assert index.search("capital of France", k=4) == rebuilt.search("capital of France", k=4)
+
+def test_segments_load_and_compact(tmp_path):
+    path = str(tmp_path / "lexical")
+    writer = SegmentWriter(path, segment_rows=2)
+    for row_id, document in zip(IDS, DOCUMENTS):
+        writer.add([row_id], [document])
+    writer.flush()
+    assert writer.rows == len(DOCUMENTS)
+    assert len(lexical_index._segment_files(path)) == 3
+
+    expected = LexicalIndex.build(DOCUMENTS, IDS).search("highest mountain", k=3)
+    assert LexicalIndex.load(path).search("highest mountain", k=3) == expected
+    assert lexical_index.compact(path) == len(DOCUMENTS)
+    assert lexical_index._segment_files(path) == []
+    assert LexicalIndex.load(path).search("highest mountain", k=3) == expected
+
+def test_base_without_ids_still_loads(tmp_path):
+    path = tmp_path / "lexical"
+    path.mkdir()
+    base = _build_segment(IDS, DOCUMENTS)
+    del base["ids"]
+    with open(path / lexical_index.LEXICAL_INDEX_FILE, "wb") as f:
+        pickle.dump(base, f)
+
+    index = LexicalIndex.load(str(path))
+    assert index.ids == [None] * len(DOCUMENTS)
+    assert index.exact_match(DOCUMENTS[3]) == 3
+
+def test_missing_index_raises(tmp_path):
+    assert not lexical_index.index_exists(str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        LexicalIndex.load(str(tmp_path))
+
+class FakeDense:
+    def __init__(self, fail: bool = False):
+        self.queries = []
+        self.fail = fail
+
+    def __call__(self, queries, k):
+        self.queries.extend(queries)
+        if self.fail:
+            raise RuntimeError("vector store down")
+        evidence = [[Evidence(text=f"Dense hit for {q}", source="Local (ChromaDB)", confidence=0.5)] for q in queries]
+        return evidence, np.zeros((len(queries), 4), dtype=np.float32)
+
+@pytest.fixture
+def local(monkeypatch):
+    index = LexicalIndex.build(DOCUMENTS, IDS)
+    monkeypatch.setattr(retriever, "get_lexical_index", lambda: index)
+    dense = FakeDense()
+    monkeypatch.setattr(retriever, "_dense_query", dense)
+    return dense
+
+def test_exact_match_skips_dense_search(local):
+    [evidence] = retriever._query_local(["the eiffel tower is located in PARIS"])
+
+    assert evidence[0].source == "Local (Exact Match)"
+    assert evidence[0].text == DOCUMENTS[0]
+    assert evidence[0].confidence == 1.0
+    assert local.queries == []
+
+def test_high_overlap_hit_skips_dense_search(local):
+    # Same content words in another order: not an exact match, overlap 1.0
+    [evidence] = retriever._query_local(["The capital city of France is Paris"])
+
+    assert evidence[0].source == "Local (BM25)"
+    assert evidence[0].text == DOCUMENTS[1]
+    assert evidence[0].confidence >= retriever.LEXICAL_SKIP_THRESHOLD
+    assert local.queries == []
+
+def test_low_overlap_hit_goes_to_dense_search(local):
+    query = "Paris hosts many museums"
+    [evidence] = retriever._query_local([query])
+
+    assert local.queries == [query]
+    assert "Dense hit for " + query in [e.text for e in evidence]
+    assert len(evidence) == retriever.LOCAL_TOP_K
+
+def test_threshold_decides_the_skip(local, monkeypatch):
+    monkeypatch.setattr(retriever, "LEXICAL_SKIP_THRESHOLD", 1.01)
+    retriever._query_local(["The capital city of France is Paris"])
+    assert local.queries == ["The capital city of France is Paris"]
+
+def test_dense_failure_keeps_bm25_hits(monkeypatch, local):
+    monkeypatch.setattr(retriever, "_dense_query", FakeDense(fail=True))
+    [evidence, nothing] = retriever._query_local(["Paris hosts many museums", "quantum chromodynamics"])
+
+    assert evidence[0].source == "Local (BM25)"
+    assert [e.source for e in nothing] == ["System Error"]
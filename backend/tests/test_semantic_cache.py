@@ -0,0 +1,76 @@
+import uuid
+import numpy as np
+import chromadb
+import pytest
+import retriever
+import semantic_cache
+from models import VerificationResult
+
+ORIGINAL = "The Eiffel Tower is in Paris."
+
+def _vector(similarity: float) -> list:
+    # Unit vector at the given cosine similarity to ORIGINAL's embedding (the first axis)
+    return [similarity, float(np.sqrt(1 - similarity ** 2)), 0.0, 0.0]
+
+EMBEDDINGS = {
+    ORIGINAL: _vector(1.0),
+    "Paris is where the Eiffel Tower stands.": _vector(0.97),
+    "The Eiffel Tower is in Lyon.": _vector(0.90),   # within the near-miss margin below 0.92
+    "Bananas are berries.": _vector(0.10),
+}
+
+class Embedder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [EMBEDDINGS[t] for t in texts]
+
+@pytest.fixture
+def embedder(monkeypatch):
+    collection = chromadb.EphemeralClient().create_collection(name=f"claim-cache-{uuid.uuid4().hex}", metadata={"hnsw:space": "cosine"})
+    monkeypatch.setattr(semantic_cache, "_collection", collection)
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_THRESHOLD", 0.92)
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_NEAR_MISS_MARGIN", 0.05)
+    monkeypatch.setattr(semantic_cache, "_STATS", {"lookups": 0, "hits": 0, "near_misses": 0, "misses": 0})
+    embedder = Embedder()
+    monkeypatch.setattr(retriever, "get_embed_fn", lambda: embedder)
+    return embedder
+
+def _result(claim: str, verdict: str = "Supported", **fields) -> VerificationResult:
+    return VerificationResult(claim=claim, verdict=verdict, reasoning="It is.", evidence=[], source_type="Local", **fields)
+
+def test_paraphrase_above_threshold_is_reused(embedder):
+    semantic_cache.store([_result(ORIGINAL)])
+    hit = semantic_cache.lookup("Paris is where the Eiffel Tower stands.")
+
+    assert hit.verdict == "Supported"
+    assert hit.claim == "Paris is where the Eiffel Tower stands."
+    assert f'matched "{ORIGINAL}"' in hit.reasoning
+
+def test_claims_below_threshold_miss(embedder):
+    semantic_cache.store([_result(ORIGINAL)])
+    assert semantic_cache.lookup_many(["The Eiffel Tower is in Lyon.", "Bananas are berries."]) == [None, None]
+
+    stats = semantic_cache.get_semantic_cache_stats()
+    assert (stats["lookups"], stats["hits"], stats["near_misses"], stats["misses"]) == (2, 0, 1, 1)
+    assert stats["recent_near_misses"][-1]["cached_claim"] == ORIGINAL
+
+def test_lookup_embeddings_are_reused_by_store(embedder):
+    semantic_cache.lookup("Bananas are berries.")
+    semantic_cache.store([_result("Bananas are berries.")])
+    assert embedder.calls == [["Bananas are berries."]]
+
+@pytest.mark.parametrize("result", [
+    _result(ORIGINAL, verdict="Error"),
+    _result(ORIGINAL, verdict="NotEnoughInfo", incomplete="web_search did not finish"),
+])
+def test_errors_and_incomplete_results_are_not_stored(embedder, result):
+    semantic_cache.store([result])
+    assert semantic_cache.lookup(ORIGINAL) is None
+
+def test_expired_entries_are_not_served(embedder, monkeypatch):
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_TTL", -1)
+    semantic_cache.store([_result(ORIGINAL)])
+    assert semantic_cache.lookup(ORIGINAL) is None
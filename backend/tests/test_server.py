@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+import agent
+import retriever
+import server
+from models import VerificationResult
+from server import AdmissionController, ClaimCoalescer, Overloaded
+from conftest import counter
+
+def _result(claim: str) -> VerificationResult:
+    return VerificationResult(claim=claim, verdict="Supported", reasoning="Fake.", evidence=[], source_type="Local")
+
+class FakePipeline:
+    """Stands in for agent.verify_claim(s); calls wait for `release` and are recorded."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = asyncio.Event()
+
+    async def verify_claim(self, claim, timeout=None):
+        self.calls.append([claim])
+        await self.release.wait()
+        return _result(claim)
+
+    async def verify_claims(self, claims, timeout=None):
+        self.calls.append(list(claims))
+        await self.release.wait()
+        return [_result(c) for c in claims]
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    fake = FakePipeline()
+    monkeypatch.setattr(agent, "verify_claim", fake.verify_claim)
+    monkeypatch.setattr(agent, "verify_claims", fake.verify_claims)
+    return fake
+
+def test_identical_claims_share_one_computation(pipeline):
+    async def scenario():
+        coalescer = ClaimCoalescer(AdmissionController(max_in_flight=4, max_queue=4))
+        coalesced = counter("server_coalesced_total")
+        [first] = coalescer.futures_for(["The sky is blue."])
+        second, other = coalescer.futures_for(["the sky is BLUE", "Grass is green."])
+        assert second is first
+        assert counter("server_coalesced_total") == coalesced + 1
+
+        pipeline.release.set()
+        results = await asyncio.gather(first, other)
+        assert [r.claim for r in results] == ["The sky is blue.", "Grass is green."]
+        assert pipeline.calls == [["The sky is blue."], ["Grass is green."]]
+
+        # Finished claims are no longer in flight: the next request computes again
+        [again] = coalescer.futures_for(["The sky is blue."])
+        await again
+        assert len(pipeline.calls) == 3
+
+    asyncio.run(scenario())
+
+def test_admission_is_counted_per_claim(pipeline):
+    async def scenario():
+        admission = AdmissionController(max_in_flight=2, max_queue=2)
+        coalescer = ClaimCoalescer(admission)
+        coalescer.futures_for(["a", "b", "c"])
+        with pytest.raises(Overloaded):
+            coalescer.futures_for(["d", "e"])
+        futures = coalescer.futures_for(["d"])
+        with pytest.raises(Overloaded):
+            coalescer.futures_for(["e"])
+        assert coalescer.futures_for(["a"]) # coalesced claims cost nothing
+
+        await asyncio.sleep(0)
+        assert admission.running == 2 # the batch holds every running slot; "d" waits its turn
+        assert admission.waiting == 1
+        pipeline.release.set()
+        await asyncio.gather(*futures)
+        assert admission.running == admission.waiting == 0
+
+    asyncio.run(scenario())
+
+def test_oversized_batch_runs_on_an_idle_server(pipeline):
+    async def scenario():
+        admission = AdmissionController(max_in_flight=2, max_queue=2)
+        futures = ClaimCoalescer(admission).futures_for([f"claim {i}" for i in range(10)])
+        pipeline.release.set()
+        assert len(await asyncio.gather(*futures)) == 10
+        assert admission.running == admission.waiting == 0
+
+    asyncio.run(scenario())
+
+@pytest.fixture
+def client(monkeypatch, pipeline):
+    monkeypatch.setattr(retriever, "warm_up", lambda background=False: None)
+    pipeline.release.set()
+    with TestClient(server.app) as client:
+        yield client
+
+def test_overloaded_server_sheds_with_503(client):
+    server.app.state.admission = AdmissionController(max_in_flight=1, max_queue=1)
+    server.app.state.coalescer = ClaimCoalescer(server.app.state.admission)
+    server.app.state.admission.admit()
+    shed = counter("server_requests_total", endpoint="batch", outcome="shed")
+
+    response = client.post("/verify/batch", json={"claims": ["a", "b"]})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(server.SERVER_RETRY_AFTER)
+    assert counter("server_requests_total", endpoint="batch", outcome="shed") == shed + 1
+    assert client.post("/verify", json={"claim": "a"}).status_code == 200
+
+def test_batch_results_keep_request_order(client):
+    response = client.post("/verify/batch", json={"claims": ["a", " ", "b", "A"]})
+    assert response.status_code == 200
+    assert [(r["claim"], r["verdict"]) for r in response.json()] == [("a", "Supported"), (" ", "Error"), ("b", "Supported"), ("A", "Supported")]
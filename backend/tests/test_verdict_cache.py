@@ -0,0 +1,53 @@
+import pytest
+import verdict_cache
+from cache import SQLiteCache
+from models import VerificationResult
+from verdict_cache import cache_verdict, get_cached_verdict, invalidate_verdict_cache
+
+@pytest.fixture(autouse=True)
+def verdicts(monkeypatch, tmp_path):
+    monkeypatch.setattr(verdict_cache, "_cache", SQLiteCache(str(tmp_path / "verdicts.sqlite")))
+
+def _result(claim: str, verdict: str = "Supported", source_type: str = "Local", **fields) -> VerificationResult:
+    return VerificationResult(claim=claim, verdict=verdict, reasoning="Because.", evidence=[], source_type=source_type, **fields)
+
+def test_ttl_follows_the_evidence_source(clock, monkeypatch):
+    monkeypatch.setattr(verdict_cache, "LOCAL_VERDICT_TTL", 100)
+    monkeypatch.setattr(verdict_cache, "WEB_VERDICT_TTL", 10)
+    cache_verdict(_result("Local claim."))
+    cache_verdict(_result("Web claim.", source_type="Web+Local"))
+
+    clock.now += 11
+    assert get_cached_verdict("Local claim.") is not None
+    assert get_cached_verdict("Web claim.") is None
+    clock.now += 90
+    assert get_cached_verdict("Local claim.") is None
+
+def test_lookup_is_normalized_and_echoes_the_callers_text():
+    cache_verdict(_result("The sky is blue."))
+    hit = get_cached_verdict("the SKY is blue")
+
+    assert hit.verdict == "Supported"
+    assert hit.claim == "the SKY is blue"
+
+@pytest.mark.parametrize("result", [
+    _result("Errored.", verdict="Error"),
+    _result("Cut short.", verdict="NotEnoughInfo", incomplete="web_search did not finish"),
+])
+def test_errors_and_incomplete_results_are_not_cached(result):
+    cache_verdict(result)
+    assert get_cached_verdict(result.claim) is None
+
+def test_timings_are_not_stored():
+    cache_verdict(_result("Timed.", timings={"total": 12.0}, evidence_budget={"tokens_in": 10}))
+    hit = get_cached_verdict("Timed.")
+    assert hit.timings is None and hit.evidence_budget is None
+
+def test_invalidate_clears_every_entry():
+    cache_verdict(_result("One."))
+    cache_verdict(_result("Two.", source_type="Web+Local"))
+    invalidate_verdict_cache()
+
+    assert get_cached_verdict("One.") is None
+    assert get_cached_verdict("Two.") is None
+    assert verdict_cache.get_verdict_cache_stats()["entries"] == 0
@@ -0,0 +1,108 @@
+import zlib
+import numpy as np
+import pytest
+import retriever
+import web_pages
+from cache import SQLiteCache
+from models import Evidence
+from conftest import StubResponse, run, counter
+
+CLAIM = "The Eiffel Tower was completed in 1889 in Paris."
+# Paragraphs over half of PASSAGE_MAX_CHARS, so extraction keeps each one as its own passage
+RELEVANT = " ".join(["The Eiffel Tower in Paris was completed in 1889 for the World's Fair."] * 5)
+FILLER = " ".join(["Unrelated filler paragraph about gardening, weather and local football results."] * 5)
+END_MARKER = " ".join(["Closing paragraph that only appears at the very end of the page body."] * 5)
+
+def _embed(texts):
+    # Deterministic bag-of-words vectors, so ranking follows word overlap with the claim
+    vectors = np.zeros((len(texts), 256), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[row, zlib.crc32(word.strip(".,'").encode()) % 256] += 1.0
+    return vectors
+
+def _html(*paragraphs) -> bytes:
+    return ("<html><body>" + "".join(f"<p>{p}</p>" for p in paragraphs) + "</body></html>").encode()
+
+def _page(*paragraphs, **headers) -> StubResponse:
+    return StubResponse(200, _html(*paragraphs), {"Content-Type": "text/html; charset=utf-8", **headers})
+
+def _snippet(url: str) -> Evidence:
+    return Evidence(text="Eiffel Tower ... 1889 ...", source="example.org", url=url, confidence=0.7)
+
+@pytest.fixture
+def pages(stub_server, monkeypatch, tmp_path):
+    monkeypatch.setattr(web_pages, "_page_cache", SQLiteCache(str(tmp_path / "web_pages.sqlite")))
+    monkeypatch.setattr(retriever, "get_embed_fn", lambda: _embed)
+    return stub_server
+
+def test_snippet_is_replaced_by_the_closest_passages(pages):
+    pages.routes["/page"] = [_page(FILLER, RELEVANT, FILLER.replace("gardening", "cooking"))]
+    evidence = run(web_pages.enrich_web_evidence(CLAIM, [_snippet(pages.url + "/page")]))
+
+    assert evidence[0].text == RELEVANT
+    assert len(evidence) == web_pages.PASSAGES_PER_PAGE
+    assert all(e.url == pages.url + "/page" and e.source == "example.org" for e in evidence)
+
+def test_large_page_is_truncated(pages, monkeypatch):
+    monkeypatch.setattr(web_pages, "PAGE_MAX_BYTES", 200)
+    pages.routes["/big"] = [_page(RELEVANT, *[FILLER] * 200, END_MARKER)]
+    truncated = counter("page_truncated_total")
+    evidence = run(web_pages.enrich_web_evidence(CLAIM, [_snippet(pages.url + "/big")]))
+
+    assert RELEVANT.startswith(evidence[0].text)
+    assert not any(END_MARKER in e.text for e in evidence)
+    assert counter("page_truncated_total") == truncated + 1
+
+def test_slow_page_keeps_the_snippet(pages, monkeypatch):
+    monkeypatch.setattr(web_pages, "PAGE_FETCH_TIMEOUT", 0.3)
+    pages.routes["/slow"] = [StubResponse(200, _html(RELEVANT), {"Content-Type": "text/html"}, delay=1.0)]
+    errors = counter("page_fetch_total", result="error")
+    snippet = _snippet(pages.url + "/slow")
+
+    assert run(web_pages.enrich_web_evidence(CLAIM, [snippet])) == [snippet]
+    assert counter("page_fetch_total", result="error") == errors + 1
+
+def test_non_html_page_is_skipped(pages):
+    pages.routes["/paper.pdf"] = [StubResponse(200, b"%PDF-1.4 " + RELEVANT.encode(), {"Content-Type": "application/pdf"})]
+    skipped = counter("page_fetch_total", result="skipped")
+    snippet = _snippet(pages.url + "/paper.pdf")
+
+    assert run(web_pages.fetch_passages(snippet.url)) is None
+    assert run(web_pages.enrich_web_evidence(CLAIM, [snippet])) == [snippet]
+    assert counter("page_fetch_total", result="skipped") == skipped + 2
+
+def test_stale_page_is_revalidated_with_its_etag(pages, monkeypatch):
+    monkeypatch.setattr(web_pages, "PAGE_FRESH_SECONDS", 0)
+
+    def respond(headers):
+        if headers.get("If-None-Match") == '"v1"':
+            return StubResponse(304)
+        return _page(RELEVANT, FILLER, ETag='"v1"')
+
+    pages.routes["/etag"] = respond
+    url = pages.url + "/etag"
+    not_modified = counter("page_fetch_total", result="not_modified")
+    first = run(web_pages.enrich_web_evidence(CLAIM, [_snippet(url)]))
+    second = run(web_pages.enrich_web_evidence(CLAIM, [_snippet(url)]))
+
+    assert second == first
+    requests = pages.hits("/etag")
+    assert len(requests) == 2
+    assert "if-none-match" not in requests[0]
+    assert requests[1]["if-none-match"] == '"v1"'
+    assert counter("page_fetch_total", result="not_modified") == not_modified + 1
+
+def test_fresh_page_is_served_from_cache(pages):
+    pages.routes["/fresh"] = [_page(RELEVANT, FILLER)]
+    url = pages.url + "/fresh"
+    first = run(web_pages.enrich_web_evidence(CLAIM, [_snippet(url)]))
+    second = run(web_pages.enrich_web_evidence(CLAIM, [_snippet(url)]))
+
+    assert second == first
+    assert len(pages.hits("/fresh")) == 1
+
+def test_evidence_without_url_passes_through(pages):
+    evidence = [Evidence(text="Mock web evidence", source="Web", confidence=0.5)]
+    assert run(web_pages.enrich_web_evidence(CLAIM, evidence)) is evidence
+    assert pages.requests == []
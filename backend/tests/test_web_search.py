@@ -0,0 +1,105 @@
+import json
+import time
+import asyncio
+import pytest
+import deadlines
+import retriever
+from cache import SQLiteCache
+from conftest import StubResponse, run, counter
+
+def _results(*snippets) -> StubResponse:
+    items = [{"snippet": s, "displayLink": "example.org", "link": f"https://example.org/{i}"} for i, s in enumerate(snippets)]
+    return StubResponse(200, json.dumps({"items": items}).encode(), {"Content-Type": "application/json"})
+
+@pytest.fixture
+def search(stub_server, monkeypatch, tmp_path):
+    monkeypatch.setenv("GOOGLE_SEARCH_API_KEY", "test-key")
+    monkeypatch.setenv("GOOGLE_CSE_ID", "test-cse")
+    monkeypatch.setattr(retriever, "SEARCH_API_URL", stub_server.url + "/search")
+    monkeypatch.setattr(retriever, "_web_cache", SQLiteCache(str(tmp_path / "web_search.sqlite")))
+    monkeypatch.setattr(deadlines, "SEARCH_BREAKER", deadlines.CircuitBreaker("web_search", failure_threshold=3, reset_seconds=0.2))
+    monkeypatch.setattr(deadlines, "RETRY_BASE_DELAY", 0.001)
+    return stub_server
+
+def test_top_results_become_evidence(search):
+    search.routes["/search"] = [_results("one", "two", "three", "four")]
+    evidence = run(retriever.search_web_async("top results"))
+
+    assert [e.text for e in evidence] == ["one", "two", "three"]
+    assert [e.url for e in evidence] == [f"https://example.org/{i}" for i in range(3)]
+    assert all(e.source == "example.org" and e.confidence == 0.7 for e in evidence)
+
+def test_results_are_served_from_cache(search):
+    search.routes["/search"] = [_results("cached")]
+    first = run(retriever.search_web_async("Cache Me"))
+    second = run(retriever.search_web_async("cache me")) # same normalized query
+
+    assert [e.text for e in second] == [e.text for e in first] == ["cached"]
+    assert len(search.hits("/search")) == 1
+
+def test_failed_search_is_not_cached(search):
+    search.routes["/search"] = [StubResponse(400), _results("later")]
+    assert run(retriever.search_web_async("flaky"))[0].source == "System Error"
+    assert [e.text for e in run(retriever.search_web_async("flaky"))] == ["later"]
+
+def test_missing_credentials_return_mock_evidence(search, monkeypatch):
+    monkeypatch.delenv("GOOGLE_SEARCH_API_KEY")
+    evidence = run(retriever.search_web_async("offline"))
+
+    assert [e.text for e in evidence] == ["Mock web evidence for offline"]
+    assert search.requests == []
+
+def test_one_connection_pool_per_event_loop():
+    async def _clients():
+        return retriever._get_http_client(), retriever._get_http_client()
+
+    first, again = run(_clients())
+    second, _ = run(_clients())
+    assert first is again
+    assert second is not first
+    assert first.is_closed and second.is_closed
+
+def test_transient_errors_are_retried(search):
+    search.routes["/search"] = [StubResponse(503), StubResponse(503), _results("first", "second")]
+    evidence = run(retriever.search_web_async("retry me"))
+
+    assert [e.text for e in evidence] == ["first", "second"]
+    assert evidence[0].url == "https://example.org/0"
+    assert len(search.hits("/search")) == 3
+    assert deadlines.SEARCH_BREAKER.state == "closed"
+
+def test_rejected_request_is_not_retried(search):
+    search.routes["/search"] = [StubResponse(400), _results("never")]
+    evidence = run(retriever.search_web_async("bad request"))
+
+    assert [e.source for e in evidence] == ["System Error"]
+    assert len(search.hits("/search")) == 1
+    assert deadlines.SEARCH_BREAKER.failures == 0
+
+def test_circuit_opens_then_recovers(search):
+    search.routes["/search"] = [StubResponse(503)]
+    assert run(retriever.search_web_async("down"))[0].source == "System Error"
+    assert len(search.hits("/search")) == 3 # the third failure opens the circuit
+    assert deadlines.SEARCH_BREAKER.state == "open"
+
+    rejected = counter("circuit_rejections_total", upstream="web_search")
+    with pytest.raises(deadlines.CircuitOpen):
+        run(retriever.search_web_async("still down"))
+    assert len(search.hits("/search")) == 3 # failed fast, no request sent
+    assert counter("circuit_rejections_total", upstream="web_search") == rejected + 1
+
+    time.sleep(0.25)
+    search.routes["/search"] = [_results("back")]
+    assert [e.text for e in run(retriever.search_web_async("recovered"))] == ["back"]
+    assert deadlines.SEARCH_BREAKER.state == "closed"
+
+def test_slow_upstream_is_cut_at_the_stage_budget(search, monkeypatch):
+    monkeypatch.setitem(deadlines.STAGE_BUDGETS, "web_search", 0.6)
+    monkeypatch.setattr(deadlines, "UPSTREAM_MAX_ATTEMPTS", 1)
+    search.routes["/search"] = [StubResponse(200, b"{}", delay=1.5)]
+
+    started = time.monotonic()
+    with pytest.raises(deadlines.DeadlineExceeded):
+        run(retriever.search_web_async("slow"))
+    assert time.monotonic() - started < 1.2
+    assert deadlines.SEARCH_BREAKER.failures == 1
@@ -0,0 +1,228 @@
+import os
+import json
+import shutil
+import argparse
+import numpy as np
+from typing import List, Optional, Tuple
+
+# Exported copy of the Chroma collection: one contiguous float32 matrix + row metadata
+INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "vector_index")
+MATRIX_FILE = "embeddings.f32"
+META_FILE = "meta.json"
+DOCS_FILE = "documents.jsonl"
+
+# Optional compact scoring copies: float16, or int8 with one float32 scale per row
+QUANTIZED_FILES = {"float16": "embeddings.f16", "int8": "embeddings.i8"}
+SCALES_FILE = "scales.f32"
+STORAGE_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+INDEX_DTYPE = os.getenv("VECTOR_INDEX_DTYPE", "float32")
+
+# Quantized search re-scores this many candidates per result at full precision (when available)
+RESCORE = os.getenv("VECTOR_INDEX_RESCORE", "1") == "1"
+RESCORE_CANDIDATES_FACTOR = int(os.getenv("VECTOR_INDEX_RESCORE_FACTOR", "4"))
+
+# Rows scored per matrix product; bounds the temporary score matrix for large corpora
+SCORE_BLOCK_ROWS = 65536
+
+def _distance_from_similarity(similarity: np.ndarray, space: str) -> np.ndarray:
+    # Report distances in the same space as the source collection so confidences (1 - distance)
+    # match what search_local returns from Chroma. Rows are unit-normalized, so l2^2 = 2 - 2cos.
+    if space == "l2":
+        return 2.0 - 2.0 * similarity
+    return 1.0 - similarity
+
+class MmapVectorIndex:
+    """Read-only top-k index over a memory-mapped, row-normalized embedding matrix.
+
+    The matrix is mapped with MAP_SHARED semantics, so worker processes opening the same
+    index share its pages through the OS page cache instead of each holding a copy.
+    Indexes stored as float16/int8 are scored on the compact copy; the float32 matrix, if kept,
+    is only touched for the few candidate rows that get re-scored.
+    """
+
+    def __init__(self, path: str = INDEX_DIR, rescore: bool = RESCORE):
+        self.path = path
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.count = self.meta["count"]
+        self.dim = self.meta["dim"]
+        self.space = self.meta.get("space", "l2")
+        self.dtype = self.meta.get("dtype", "float32")
+
+        shape = (self.count, self.dim)
+        full_path = os.path.join(path, MATRIX_FILE)
+        self.matrix = np.memmap(full_path, dtype=np.float32, mode="r", shape=shape) if os.path.exists(full_path) else None
+        self.scales = None
+        if self.dtype == "float32":
+            self.scoring_matrix = self.matrix
+        else:
+            self.scoring_matrix = np.memmap(os.path.join(path, QUANTIZED_FILES[self.dtype]), dtype=STORAGE_DTYPES[self.dtype], mode="r", shape=shape)
+            if self.dtype == "int8":
+                self.scales = np.fromfile(os.path.join(path, SCALES_FILE), dtype=np.float32)
+        self.rescore = rescore and self.dtype != "float32" and self.matrix is not None
+
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        with open(os.path.join(path, DOCS_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                row_id, document = json.loads(line)
+                self.ids.append(row_id)
+                self.documents.append(document)
+
+    def scoring_bytes(self) -> int:
+        """Bytes that must stay resident to score queries (the re-score matrix is only sampled)."""
+        size = self.scoring_matrix.nbytes
+        if self.scales is not None:
+            size += self.scales.nbytes
+        return size
+
+    def _block_scores(self, queries: np.ndarray, start: int) -> np.ndarray:
+        block = self.scoring_matrix[start:start + SCORE_BLOCK_ROWS]
+        if self.dtype == "float32":
+            return queries @ block.T
+        # Dequantize one block at a time so the float copy never exceeds SCORE_BLOCK_ROWS rows
+        scores = queries @ block.astype(np.float32).T
+        if self.scales is not None:
+            scores *= self.scales[start:start + SCORE_BLOCK_ROWS]
+        return scores
+
+    def _top_candidates(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, self.count, SCORE_BLOCK_ROWS):
+            scores = self._block_scores(queries, start)
+            # Keep only this block's top-k, then merge with the running top-k
+            take = min(k, scores.shape[1])
+            top = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        return best_scores, best_rows
+
+    def search(self, query_embeddings, k: int = 2) -> List[List[Tuple[str, float]]]:
+        """Top-k (document, distance) per query, best first. Accepts one vector or a (B, dim) batch."""
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1.0, norms)
+        k = min(k, self.count)
+        if k == 0:
+            return [[] for _ in range(len(queries))]
+
+        candidates = min(self.count, k * RESCORE_CANDIDATES_FACTOR) if self.rescore else k
+        best_scores, best_rows = self._top_candidates(queries, candidates)
+        if self.rescore:
+            # Exact float32 scores for the shortlisted rows only
+            best_scores = np.einsum("bd,bkd->bk", queries, self.matrix[best_rows.ravel()].reshape(*best_rows.shape, self.dim))
+
+        order = np.argsort(-best_scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        distances = _distance_from_similarity(best_scores, self.space)
+        return [
+            [(self.documents[row], float(distance)) for row, distance in zip(rows, dists)]
+            for rows, dists in zip(best_rows, distances)
+        ]
+
+def quantize_index(path: str = INDEX_DIR, dtype: str = "int8", keep_full_precision: bool = True):
+    """Adds a float16/int8 scoring copy to an exported index (streamed in blocks) and switches it over.
+
+    With keep_full_precision=False the float32 matrix is deleted, which disables re-scoring.
+    """
+    if dtype not in QUANTIZED_FILES:
+        raise ValueError(f"Unsupported index dtype: {dtype}")
+    with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    full = np.memmap(os.path.join(path, MATRIX_FILE), dtype=np.float32, mode="r", shape=(meta["count"], meta["dim"]))
+
+    with open(os.path.join(path, QUANTIZED_FILES[dtype]), "wb") as out:
+        scales = []
+        for start in range(0, meta["count"], SCORE_BLOCK_ROWS):
+            block = np.asarray(full[start:start + SCORE_BLOCK_ROWS])
+            if dtype == "float16":
+                out.write(block.astype(np.float16).tobytes())
+                continue
+            # Symmetric per-row scalar quantization: v ~= q * scale, q in [-127, 127]
+            scale = np.abs(block).max(axis=1) / 127.0
+            scale[scale == 0] = 1.0
+            out.write(np.clip(np.rint(block / scale[:, None]), -127, 127).astype(np.int8).tobytes())
+            scales.append(scale.astype(np.float32))
+    if dtype == "int8":
+        (np.concatenate(scales) if scales else np.zeros(0, dtype=np.float32)).tofile(os.path.join(path, SCALES_FILE))
+
+    meta["dtype"] = dtype
+    with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    del full
+    if not keep_full_precision:
+        os.remove(os.path.join(path, MATRIX_FILE))
+
+def export_from_chroma(collection, path: str = INDEX_DIR, page_size: int = 5000, dtype: str = INDEX_DTYPE, keep_full_precision: bool = True) -> int:
+    """Streams every embedding in a Chroma collection into a new mmap index. Returns the row count.
+
+    The index is written to a temporary directory and swapped in at the end, so processes
+    that already have the old one mapped keep working.
+    """
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    count = 0
+    dim = None
+    with open(os.path.join(tmp_path, MATRIX_FILE), "wb") as matrix_file, \
+         open(os.path.join(tmp_path, DOCS_FILE), "w", encoding="utf-8") as docs_file:
+        offset = 0
+        while True:
+            page = collection.get(include=["embeddings", "documents"], limit=page_size, offset=offset)
+            if not len(page["ids"]):
+                break
+            vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1.0, norms)
+            dim = vectors.shape[1]
+            matrix_file.write(np.ascontiguousarray(vectors).tobytes())
+            for row_id, document in zip(page["ids"], page["documents"]):
+                docs_file.write(json.dumps([row_id, document]) + "\n")
+            count += len(page["ids"])
+            offset += len(page["ids"])
+
+    space = (getattr(collection, "metadata", None) or {}).get("hnsw:space", "l2")
+    with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"count": count, "dim": dim or 0, "dtype": "float32", "space": space, "collection": collection.name}, f)
+    if dtype != "float32":
+        quantize_index(tmp_path, dtype, keep_full_precision)
+
+    old_path = path + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return count
+
+def refresh_export(collection, path: str = INDEX_DIR) -> Optional[int]:
+    """Re-exports an existing index after its collection changed, keeping its dtype and whether the
+    float32 matrix is kept. Returns the new row count, or None when there is no index to refresh."""
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    keep_full_precision = os.path.exists(os.path.join(path, MATRIX_FILE))
+    return export_from_chroma(collection, path, dtype=meta.get("dtype", "float32"), keep_full_precision=keep_full_precision)
+
+if __name__ == "__main__":
+    import chromadb
+    from ingest import CHROMA_DB_PATH, COLLECTION_NAME
+
+    parser = argparse.ArgumentParser(description="Export the Chroma collection to a memory-mapped vector index.")
+    parser.add_argument("--out", default=INDEX_DIR)
+    parser.add_argument("--dtype", default=INDEX_DTYPE, choices=list(STORAGE_DTYPES), help="Storage/scoring precision")
+    parser.add_argument("--drop-full-precision", action="store_true", help="Delete the float32 matrix (disables re-scoring)")
+    args = parser.parse_args()
+
+    client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+    rows = export_from_chroma(client.get_collection(name=COLLECTION_NAME), args.out, dtype=args.dtype, keep_full_precision=not args.drop_full_precision)
+    print(f"Exported {rows} vectors to {args.out} ({args.dtype})")
@@ -0,0 +1,40 @@
+import os
+from typing import Optional
+from models import VerificationResult
+from cache import CACHE_DIR, SQLiteCache, normalize_text
+
+VERDICT_CACHE_PATH = os.path.join(CACHE_DIR, "verdicts.sqlite")
+VERDICT_CACHE_ENABLED = os.getenv("VERDICT_CACHE_ENABLED", "1") == "1"
+VERDICT_CACHE_MAX_ENTRIES = int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", "50000"))
+
+# Local verdicts only change when FEVER is re-ingested; web-backed ones go stale much faster
+LOCAL_VERDICT_TTL = float(os.getenv("LOCAL_VERDICT_TTL", str(7 * 24 * 3600)))
+WEB_VERDICT_TTL = float(os.getenv("WEB_VERDICT_TTL", str(6 * 3600)))
+
+# Verdicts worth caching; "Error" results should be retried
+CACHEABLE_VERDICTS = {"Supported", "Refuted", "NotEnoughInfo"}
+
+_cache = SQLiteCache(VERDICT_CACHE_PATH, max_entries=VERDICT_CACHE_MAX_ENTRIES, default_ttl=LOCAL_VERDICT_TTL)
+
+def get_cached_verdict(claim: str) -> Optional[VerificationResult]:
+    """Returns the stored result for a (normalized) claim, re-labelled with the caller's claim text."""
+    data = _cache.get(normalize_text(claim))
+    if data is None:
+        return None
+    result = VerificationResult(**data)
+    result.claim = claim
+    return result
+
+def cache_verdict(result: VerificationResult):
+    # Best-effort verdicts from a timed-out run must not outlive the outage
+    if result.verdict not in CACHEABLE_VERDICTS or result.incomplete:
+        return
+    ttl = WEB_VERDICT_TTL if result.source_type and "Web" in result.source_type else LOCAL_VERDICT_TTL
+    _cache.set(normalize_text(result.claim), result.model_dump(exclude={"timings", "evidence_budget"}), ttl=ttl)
+
+def invalidate_verdict_cache():
+    """Drops every cached verdict. Called after the local collection is re-ingested."""
+    _cache.clear()
+
+def get_verdict_cache_stats() -> dict:
+    return _cache.stats()
@@ -0,0 +1,228 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import deque
+from typing import List, Optional, Tuple
+from models import Evidence, VerificationResult
+from telemetry import inc, set_gauge, describe, span
+import embedding_service
+import evidence_budget
+import retriever
+
+logger = logging.getLogger(__name__)
+
+# Write-back of web evidence. When a web fallback ends in a conclusive verdict, the web items
+# it was judged on (the ones with a URL) are stored in their own Chroma collection. They carry
+# provenance (URL, site, originating claim and verdict), a write time and an expiry.
+# search_local queries this collection alongside the FEVER store on its dense path, so the next
+# similar claim can be settled locally without a second web search and LLM call. Items are
+# labelled "Web Memory (...)", never "Local", so the FEVER-only fast path ignores them.
+# Off by default: it lets earlier web results shape later verdicts.
+WEB_WRITEBACK_ENABLED = os.getenv("WEB_WRITEBACK_ENABLED", "0") == "1"
+WEB_MEMORY_COLLECTION = "web-evidence"
+WEB_MEMORY_TTL = float(os.getenv("WEB_MEMORY_TTL", str(30 * 24 * 3600)))
+WEB_MEMORY_TOP_K = int(os.getenv("WEB_MEMORY_TOP_K", "2"))
+# Hits below this cosine similarity to the query are not served
+WEB_MEMORY_MIN_SIMILARITY = float(os.getenv("WEB_MEMORY_MIN_SIMILARITY", "0.6"))
+WEB_MEMORY_MAX_ENTRIES = int(os.getenv("WEB_MEMORY_MAX_ENTRIES", "50000"))
+WEB_MEMORY_COMPACT_INTERVAL = float(os.getenv("WEB_MEMORY_COMPACT_INTERVAL", "3600"))
+
+CONCLUSIVE_VERDICTS = {"Supported", "Refuted"}
+SOURCE_PREFIX = "Web Memory"
+
+# Web fallback rate over the last FALLBACK_WINDOW claims that reached the local stage, sampled
+# every FALLBACK_SAMPLE_EVERY claims so its trend can be followed as the memory fills up
+FALLBACK_WINDOW = int(os.getenv("FALLBACK_WINDOW", "200"))
+FALLBACK_SAMPLE_EVERY = 50
+
+_STATS = {"writes": 0, "items_written": 0, "lookups": 0, "hits": 0, "compactions": 0, "expired_removed": 0, "evicted": 0}
+_collection = None
+_has_entries = False
+_lock = threading.Lock()
+_compactor: Optional[threading.Thread] = None
+
+_recent_outcomes: deque = deque(maxlen=FALLBACK_WINDOW)
+_fallback_history: deque = deque(maxlen=500)  # (unix time, claims so far, windowed fallback rate)
+_claims_seen = 0
+
+describe("web_memory_items_written_total", "Web evidence items written back to the local web-evidence collection.")
+describe("web_memory_lookups_total", "Web memory lookups on the dense local path, by result (hit, miss).")
+describe("web_memory_removed_total", "Web memory entries removed by compaction, by reason (expired, evicted).")
+describe("web_memory_entries", "Entries in the web-evidence collection after the last write or compaction.")
+describe("web_fallback_rate", "Share of the last FALLBACK_WINDOW locally adjudicated claims that fell back to the web.")
+
+def _get_collection():
+    global _collection, _has_entries
+    if _collection is None:
+        with _lock:
+            if _collection is None:
+                try:
+                    _collection = retriever.get_chroma_client().get_or_create_collection(
+                        name=WEB_MEMORY_COLLECTION,
+                        embedding_function=embedding_service.collection_embedding_function(),
+                        metadata={"hnsw:space": "cosine"}
+                    )
+                    _has_entries = _collection.count() > 0
+                    _start_compactor()
+                except Exception as e:
+                    logger.error("Web Memory Init Error: %s", e)
+    return _collection
+
+def _entry_id(e: Evidence) -> str:
+    return hashlib.sha1(f"{e.url}\n{e.text}".encode("utf-8")).hexdigest()
+
+def _is_writable(e: Evidence) -> bool:
+    # Only real web results: mock data and placeholders have no URL; memory hits are not re-written
+    return bool(e.url) and not evidence_budget.is_placeholder(e) and not e.source.startswith(SOURCE_PREFIX)
+
+def write_back_many(items: List[Tuple[VerificationResult, List[Evidence]]]):
+    """Stores the web evidence behind conclusive web verdicts. items: (result, web evidence) pairs.
+
+    Only web items the verdict was actually judged on (after evidence budgeting) are kept.
+    """
+    global _has_entries
+    if not WEB_WRITEBACK_ENABLED:
+        return
+    entries = {}
+    now = time.time()
+    for result, web_evidence in items:
+        if result.verdict not in CONCLUSIVE_VERDICTS or result.incomplete or "Web" not in (result.source_type or ""):
+            continue
+        judged = {e.text for e in result.evidence}
+        for e in web_evidence:
+            if e.text in judged and _is_writable(e):
+                entries[_entry_id(e)] = (e, {
+                    "source": e.source,
+                    "url": e.url,
+                    "claim": result.claim,
+                    "verdict": result.verdict,
+                    "confidence": e.confidence,
+                    "written_at": now,
+                    "expires_at": now + WEB_MEMORY_TTL,
+                })
+    collection = _get_collection() if entries else None
+    if collection is None:
+        return
+
+    evidence = [e for e, _ in entries.values()]
+    try:
+        collection.upsert(
+            ids=list(entries),
+            embeddings=retriever.get_embed_fn()([e.text for e in evidence]),
+            documents=[e.text for e in evidence],
+            metadatas=[metadata for _, metadata in entries.values()]
+        )
+    except Exception as e:
+        logger.error("Web Memory Write Error: %s", e)
+        return
+    _has_entries = True
+    _STATS["writes"] += 1
+    _STATS["items_written"] += len(entries)
+    inc("web_memory_items_written_total", len(entries))
+
+def write_back(result: VerificationResult, web_evidence: List[Evidence]):
+    write_back_many([(result, web_evidence)])
+
+def search_many(embeddings) -> List[List[Evidence]]:
+    """Unexpired web memory items close to each query embedding (at most WEB_MEMORY_TOP_K each)."""
+    if not WEB_WRITEBACK_ENABLED:
+        return [[] for _ in embeddings]
+    collection = _get_collection()
+    if collection is None or not _has_entries:
+        return [[] for _ in embeddings]
+    try:
+        with span("web_memory"):
+            results = collection.query(
+                query_embeddings=embeddings,
+                n_results=WEB_MEMORY_TOP_K,
+                where={"expires_at": {"$gt": time.time()}} # compaction may not have run yet
+            )
+    except Exception as e:
+        logger.error("Web Memory Search Error: %s", e)
+        return [[] for _ in embeddings]
+
+    found = []
+    for docs, distances, metadatas in zip(results["documents"], results["distances"], results["metadatas"]):
+        hits = [
+            Evidence(text=doc, source=f"{SOURCE_PREFIX} ({metadata.get('source', 'Web')})", url=metadata.get("url"), confidence=1 - distance)
+            for doc, distance, metadata in zip(docs, distances, metadatas)
+            if 1 - distance >= WEB_MEMORY_MIN_SIMILARITY
+        ]
+        _STATS["lookups"] += 1
+        _STATS["hits"] += bool(hits)
+        inc("web_memory_lookups_total", result="hit" if hits else "miss")
+        found.append(hits)
+    return found
+
+def compact() -> int:
+    """Deletes expired entries, then the oldest ones beyond WEB_MEMORY_MAX_ENTRIES. Returns the number removed."""
+    global _has_entries
+    collection = _get_collection()
+    if collection is None:
+        return 0
+    removed = 0
+    try:
+        expired = collection.get(where={"expires_at": {"$lte": time.time()}}, include=[])["ids"]
+        if expired:
+            collection.delete(ids=expired)
+            inc("web_memory_removed_total", len(expired), reason="expired")
+            _STATS["expired_removed"] += len(expired)
+            removed += len(expired)
+        count = collection.count()
+        if count > WEB_MEMORY_MAX_ENTRIES:
+            everything = collection.get(include=["metadatas"])
+            by_age = sorted(zip(everything["ids"], everything["metadatas"]), key=lambda item: item[1].get("written_at", 0))
+            evict = [entry_id for entry_id, _ in by_age[:count - WEB_MEMORY_MAX_ENTRIES]]
+            collection.delete(ids=evict)
+            inc("web_memory_removed_total", len(evict), reason="evicted")
+            _STATS["evicted"] += len(evict)
+            removed += len(evict)
+            count -= len(evict)
+        _has_entries = count > 0
+        set_gauge("web_memory_entries", count)
+        _STATS["compactions"] += 1
+    except Exception as e:
+        logger.error("Web Memory Compaction Error: %s", e)
+    if removed:
+        logger.info("Web memory compaction removed %d entries.", removed)
+    return removed
+
+def _start_compactor():
+    global _compactor
+    if _compactor is not None or WEB_MEMORY_COMPACT_INTERVAL <= 0:
+        return
+
+    def _loop():
+        while True:
+            time.sleep(WEB_MEMORY_COMPACT_INTERVAL)
+            compact()
+
+    _compactor = threading.Thread(target=_loop, name="web-memory-compactor", daemon=True)
+    _compactor.start()
+
+def record_outcomes(fell_back: int, settled_locally: int):
+    """Feeds the fallback-rate window: claims that went to the web vs. were settled locally."""
+    global _claims_seen
+    if not fell_back and not settled_locally:
+        return
+    before = _claims_seen
+    _recent_outcomes.extend([True] * fell_back + [False] * settled_locally)
+    _claims_seen += fell_back + settled_locally
+    rate = sum(_recent_outcomes) / len(_recent_outcomes)
+    set_gauge("web_fallback_rate", rate)
+    if not _fallback_history or _claims_seen // FALLBACK_SAMPLE_EVERY > before // FALLBACK_SAMPLE_EVERY:
+        _fallback_history.append((round(time.time(), 1), _claims_seen, round(rate, 4)))
+
+def get_web_memory_stats() -> dict:
+    lookups = _STATS["lookups"]
+    return {
+        **_STATS,
+        "enabled": WEB_WRITEBACK_ENABLED,
+        "hit_rate": _STATS["hits"] / lookups if lookups else 0.0,
+        "fallback_rate": sum(_recent_outcomes) / len(_recent_outcomes) if _recent_outcomes else 0.0,
+        "fallback_rate_history": [
+            {"time": t, "claims": claims, "fallback_rate": rate} for t, claims, rate in _fallback_history
+        ],
+    }
@@ -0,0 +1,219 @@
+import os
+import re
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+import numpy as np
+from bs4 import BeautifulSoup
+from models import Evidence
+from cache import CACHE_DIR, SQLiteCache
+from lexical_index import tokenize
+from telemetry import span, inc, describe
+import retriever
+
+logger = logging.getLogger(__name__)
+
+# Evidence enrichment: Custom Search snippets are ~150 characters, so for each result we fetch
+# the linked page, extract passages and keep the ones closest to the claim (MiniLM cosine).
+# Pages are cached on disk as extracted passages plus their ETag / Last-Modified validators:
+# within PAGE_FRESH_SECONDS a page is reused as is, after that it is revalidated with a
+# conditional GET (a 304 costs no body and no re-extraction). Off by default: it adds a page
+# download to every web fallback.
+WEB_ENRICH_ENABLED = os.getenv("WEB_ENRICH_ENABLED", "0") == "1"
+PAGE_FETCH_TIMEOUT = float(os.getenv("PAGE_FETCH_TIMEOUT", "5"))        # whole download, seconds
+PAGE_MAX_BYTES = int(os.getenv("PAGE_MAX_BYTES", str(1_500_000)))       # larger bodies are truncated
+PAGE_MAX_CONCURRENCY = int(os.getenv("PAGE_MAX_CONCURRENCY", "8"))
+PAGE_PER_HOST_LIMIT = int(os.getenv("PAGE_PER_HOST_LIMIT", "2"))
+PAGE_FRESH_SECONDS = float(os.getenv("PAGE_FRESH_SECONDS", "3600"))
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", str(7 * 24 * 3600)))
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "2000"))
+PASSAGES_PER_PAGE = int(os.getenv("PASSAGES_PER_PAGE", "2"))
+
+# Passage shaping and the lexical prefilter that bounds embedding work per page
+PASSAGE_MIN_CHARS = 40
+PASSAGE_MAX_CHARS = 600
+PASSAGE_CANDIDATES_PER_PAGE = 30
+USER_AGENT = "AdaptiveTruth/1.0 (fact-checking evidence fetcher)"
+
+_NOISE_TAGS = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "iframe"]
+_BLOCK_TAGS = ["p", "li", "blockquote", "dd", "td"]
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+_page_cache = SQLiteCache(os.path.join(CACHE_DIR, "web_pages.sqlite"), max_entries=PAGE_CACHE_MAX_ENTRIES, default_ttl=PAGE_CACHE_TTL)
+
+# Concurrency limits belong to an event loop (Streamlit starts a fresh one per asyncio.run)
+_limits_loop = None
+_global_limit: Optional[asyncio.Semaphore] = None
+_host_limits: Dict[str, asyncio.Semaphore] = {}
+
+describe("page_fetch_total", "Linked-page lookups by outcome (fetched, not_modified, fresh, stale, skipped, error).")
+describe("page_truncated_total", "Page bodies cut at PAGE_MAX_BYTES.")
+
+def _limits(host: str) -> tuple[asyncio.Semaphore, asyncio.Semaphore]:
+    global _limits_loop, _global_limit, _host_limits
+    loop = asyncio.get_running_loop()
+    if _limits_loop is not loop:
+        _limits_loop = loop
+        _global_limit = asyncio.Semaphore(PAGE_MAX_CONCURRENCY)
+        _host_limits = {}
+    if host not in _host_limits:
+        _host_limits[host] = asyncio.Semaphore(PAGE_PER_HOST_LIMIT)
+    return _global_limit, _host_limits[host]
+
+def _split_long(block: str) -> List[str]:
+    if len(block) <= PASSAGE_MAX_CHARS:
+        return [block]
+    parts, current = [], ""
+    for sentence in _SENTENCE_RE.split(block):
+        if current and len(current) + len(sentence) + 1 > PASSAGE_MAX_CHARS:
+            parts.append(current)
+            current = ""
+        current = f"{current} {sentence}".strip()
+    if current:
+        parts.append(current)
+    return [p[:PASSAGE_MAX_CHARS] for p in parts]
+
+def extract_passages(body: str, content_type: str = "text/html") -> List[str]:
+    """Readable text blocks of a page, short neighbours merged, long ones split at sentence ends."""
+    if "html" in content_type:
+        soup = BeautifulSoup(body, "html.parser")
+        for tag in soup(_NOISE_TAGS):
+            tag.decompose()
+        # Innermost blocks only, so a <li> wrapping a <p> is not counted twice
+        blocks = [el.get_text(" ", strip=True) for el in soup.find_all(_BLOCK_TAGS) if not el.find(_BLOCK_TAGS)]
+        if not blocks:
+            blocks = soup.get_text("\n").split("\n")
+    else:
+        blocks = re.split(r"\n\s*\n", body)
+
+    passages, current = [], ""
+    for block in blocks:
+        block = " ".join(block.split())
+        if not block:
+            continue
+        if current and len(current) + len(block) + 1 > PASSAGE_MAX_CHARS:
+            passages.extend(_split_long(current))
+            current = ""
+        current = f"{current} {block}".strip()
+    if current:
+        passages.extend(_split_long(current))
+    return [p for p in passages if len(p) >= PASSAGE_MIN_CHARS]
+
+async def _download(url: str, headers: dict) -> tuple[int, str, bytes, dict]:
+    """GET with redirects and the size cap. Returns (status, content type, body, validators)."""
+    client = retriever._get_http_client()
+    async with client.stream("GET", url, headers=headers, timeout=PAGE_FETCH_TIMEOUT, follow_redirects=True) as response:
+        if response.status_code == 304:
+            return 304, "", b"", {}
+        response.raise_for_status()
+        content_type = response.headers.get("content-type", "").lower()
+        body = bytearray()
+        if "html" in content_type or "text/plain" in content_type:
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) >= PAGE_MAX_BYTES:
+                    inc("page_truncated_total")
+                    break
+        validators = {"etag": response.headers.get("etag"), "last_modified": response.headers.get("last-modified")}
+        validators["encoding"] = response.encoding or "utf-8"
+        return response.status_code, content_type, bytes(body[:PAGE_MAX_BYTES]), validators
+
+async def fetch_passages(url: str) -> Optional[List[str]]:
+    """Extracted passages of one page, from the disk cache when possible. None if unavailable."""
+    cached = _page_cache.get(url)
+    if cached is not None and time.time() - cached["checked_at"] < PAGE_FRESH_SECONDS:
+        inc("page_fetch_total", result="fresh")
+        return cached["passages"]
+
+    headers = {"User-Agent": USER_AGENT}
+    if cached is not None:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    global_limit, host_limit = _limits(urlparse(url).hostname or "")
+    try:
+        async with global_limit, host_limit:
+            with span("page_fetch"):
+                status, content_type, body, validators = await asyncio.wait_for(_download(url, headers), PAGE_FETCH_TIMEOUT)
+    except Exception as e:
+        logger.warning("Page fetch failed for %s: %s", url, e)
+        if cached is not None:
+            # Better a stale copy than a bare snippet
+            inc("page_fetch_total", result="stale")
+            return cached["passages"]
+        inc("page_fetch_total", result="error")
+        return None
+
+    if status == 304 and cached is not None:
+        cached["checked_at"] = time.time()
+        _page_cache.set(url, cached)
+        inc("page_fetch_total", result="not_modified")
+        return cached["passages"]
+    if not body:
+        inc("page_fetch_total", result="skipped") # not HTML / plain text (PDF, images, ...)
+        return None
+
+    with span("page_extract"):
+        text = body.decode(validators["encoding"], errors="replace")
+        passages = await asyncio.to_thread(extract_passages, text, content_type)
+    _page_cache.set(url, {
+        "passages": passages,
+        "etag": validators["etag"],
+        "last_modified": validators["last_modified"],
+        "checked_at": time.time(),
+    })
+    inc("page_fetch_total", result="fetched")
+    return passages
+
+def _prefilter(claim: str, passages: List[str]) -> List[str]:
+    """Keeps the passages sharing the most content words with the claim (bounds embedding work)."""
+    if len(passages) <= PASSAGE_CANDIDATES_PER_PAGE:
+        return passages
+    terms = set(tokenize(claim))
+    overlap = [len(terms.intersection(tokenize(p))) for p in passages]
+    keep = sorted(range(len(passages)), key=lambda i: -overlap[i])[:PASSAGE_CANDIDATES_PER_PAGE]
+    return [passages[i] for i in sorted(keep)]
+
+def rank_passages(claim: str, passages: List[str]) -> np.ndarray:
+    """Cosine similarity of each passage to the claim (one embedding call for all of them)."""
+    vectors = np.asarray(retriever.get_embed_fn()([claim] + passages), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return vectors[1:] @ vectors[0]
+
+async def enrich_web_evidence(claim: str, evidence: List[Evidence]) -> List[Evidence]:
+    """Replaces each search snippet with the most claim-relevant passages of its page.
+
+    Results whose page cannot be fetched (or yields no text) keep their snippet; evidence
+    without a URL (mock data, errors) passes through unchanged. Order follows the search ranking.
+    """
+    linked = [i for i, e in enumerate(evidence) if e.url]
+    if not linked:
+        return evidence
+    pages = await asyncio.gather(*[fetch_passages(evidence[i].url) for i in linked])
+
+    candidates = []  # (evidence index, passage)
+    for i, passages in zip(linked, pages):
+        candidates.extend((i, p) for p in _prefilter(claim, passages or []))
+    if not candidates:
+        return evidence
+    with span("passage_rank"):
+        scores = await asyncio.to_thread(rank_passages, claim, [p for _, p in candidates])
+
+    best: Dict[int, list] = {}
+    for (i, passage), score in zip(candidates, scores):
+        best.setdefault(i, []).append((float(score), passage))
+    enriched = []
+    for i, e in enumerate(evidence):
+        if i not in best:
+            enriched.append(e)
+            continue
+        for score, passage in sorted(best[i], reverse=True)[:PASSAGES_PER_PAGE]:
+            enriched.append(Evidence(text=passage, source=e.source, url=e.url, confidence=round(max(0.0, score), 4)))
+    return enriched
+
+def get_page_cache_stats() -> dict:
+    return _page_cache.stats()